@@ -1,15 +1,17 @@
 import os
 import asyncio
 import json
-import re
 import sys
 import io
+import time
+import uuid
 from datetime import datetime
-from typing import AsyncGenerator, Dict, Any
-import pandas as pd
-from openai import AsyncOpenAI
+from typing import TYPE_CHECKING, AsyncGenerator, Dict, Any
 from dotenv import load_dotenv
 
+if TYPE_CHECKING:
+    from openai import AsyncOpenAI
+
 # Load environment variables
 load_dotenv()
 
@@ -17,13 +19,39 @@ load_dotenv()
 from databaseManager import DatabaseManager
 from rag_manager import RAGManager
 from kernel_manager import KernelManager
+from data_loader import DatasetLoader
+from output_capture import truncate_middle
+from notebook_generator import NotebookWriter
+from code_stream import CodeFenceParser, interleave
+from fast_path import FastPathEngine
+from preflight import PreflightChecker
+from fix_memory import FixMemory
+from file_catalog import FileCatalog
+import tracing
+
+# Execution output forwarded to the LLM (the UI gets the larger capture budget)
+LLM_OUTPUT_BYTES = 4000
 
 
 class AutoDSAgent:
-    def __init__(self):
+    def __init__(
+        self,
+        rag: RAGManager = None,
+        client: "AsyncOpenAI" = None,
+        fix_memory: FixMemory = None,
+        catalog: FileCatalog = None,
+    ):
+        # The RAG store, LLM client, fix memory and file catalog can be shared across
+        # sessions (see SessionManager), RAG documents are namespaced by session_id.
         self.db_manager = DatabaseManager()
-        self.rag = RAGManager()
+        self.rag = rag or RAGManager()
+        self.fix_memory = fix_memory or FixMemory()
+        self.catalog = catalog or FileCatalog()
         self.kernel = KernelManager()
+        self.loader = DatasetLoader()
+        self.load_timeout = self.kernel.load_timeout
+        self.fast_path = FastPathEngine()
+        self.preflight = PreflightChecker()
 
         # Load System Prompt from prompt.md
         base_dir = os.path.dirname(os.path.abspath(__file__))
@@ -52,79 +80,187 @@ class AutoDSAgent:
 
         # self.current_context = {} # Deprecated with Kernel
 
-        # Generate unique session ID based on timestamp
-        self.session_id = datetime.now().strftime("%Y%m%d_%H%M%S")
+        self._start_session()
+
+        # Initialize LLM Client (DeepInfra)
+        if client is None:
+            from openai import AsyncOpenAI
+
+            api_key = os.getenv("DEEPINFRA_API_KEY")
+            client = AsyncOpenAI(
+                api_key=api_key or "missing_key",
+                base_url=os.getenv(
+                    "AUTODS_LLM_BASE_URL", "https://api.deepinfra.com/v1/openai"
+                ),
+            )
+        self.client = client
+
+    def close(self):
+        """Releases the session's kernel and database connection."""
+        try:
+            self.kernel.shutdown()
+        except Exception as e:
+            print(f"Kernel shutdown error: {e}")
+        if self.db_manager.engine is not None:
+            self.db_manager.engine.dispose()
+        self.rag.clear_session(self.session_id)
+
+    # ...
+
+    def _start_session(self):
+        """Generates a new session ID and the per-session history/checkpoint/notebook paths."""
+        base_dir = os.path.dirname(os.path.abspath(__file__))
+
+        # Generate unique session ID based on timestamp (+ suffix, sessions can start together)
+        self.session_id = (
+            datetime.now().strftime("%Y%m%d_%H%M%S") + "_" + uuid.uuid4().hex[:6]
+        )
         self.history_file = os.path.join(
             base_dir, "cache", "history", f"session_{self.session_id}.json"
         )
         self.session_history = []  # Initialize history
-
-        # Initialize LLM Client (DeepInfra)
-        api_key = os.getenv("DEEPINFRA_API_KEY")
-        self.client = AsyncOpenAI(
-            api_key=api_key or "missing_key",
-            base_url="https://api.deepinfra.com/v1/openai",
+        self.defined_names = set()  # Variables/columns created by executed cells
+        self.indexed_hashes = set()  # Datasets whose schema is already in the RAG store
+        self.kernel.checkpoint_dir = os.path.join(
+            base_dir, "cache", "checkpoints", f"session_{self.session_id}"
+        )
+        # Notebook export is maintained incrementally as turns complete
+        self.notebook = NotebookWriter(
+            os.path.join(
+                base_dir, "cache", "notebooks", f"session_{self.session_id}.ipynb"
+            )
         )
-
-    # ...
 
     def _save_history(self):
         """Saves current session history to JSON."""
         os.makedirs(os.path.dirname(self.history_file), exist_ok=True)
         try:
-            with open(self.history_file, "w", encoding="utf-8") as f:
-                json.dump(self.session_history, f, indent=2)
+            with tracing.span("history.save", messages=len(self.session_history)):
+                with open(self.history_file, "w", encoding="utf-8") as f:
+                    json.dump(self.session_history, f, indent=2)
         except Exception as e:
             print(f"Error saving history: {e}")
+        # New messages become searchable right away (incremental, see HistoryIndex)
+        try:
+            self.rag.index_history(
+                self.history_file, self.session_id, self.session_history
+            )
+        except Exception as e:
+            print(f"History Indexing Error: {e}")
+
+    async def _stream_completion(
+        self, messages, phase: str
+    ) -> AsyncGenerator[str, None]:
+        """Streams LLM content chunks, recording time-to-first-token and tokens/sec."""
+        start = time.perf_counter()
+        first_token = None
+        chunks = 0
+        error = None
+        try:
+            chat_completion = await self.client.chat.completions.create(
+                model="zai-org/GLM-4.7",
+                messages=messages,
+                stream=True,
+            )
+            async for event in chat_completion:
+                if event.choices[0].delta.content:
+                    if first_token is None:
+                        first_token = time.perf_counter() - start
+                        tracing.observe(
+                            "autods_llm_ttft_seconds", first_token, phase=phase
+                        )
+                    chunks += 1
+                    yield event.choices[0].delta.content
+        except Exception as e:
+            error = type(e).__name__
+            raise
+        finally:
+            duration = time.perf_counter() - start
+            if first_token is not None and duration > first_token:
+                tracing.observe(
+                    "autods_llm_tokens_per_second",
+                    chunks / (duration - first_token),
+                    buckets=tracing.RATE_BUCKETS,
+                    phase=phase,
+                )
+            attrs = {"phase": phase, "chunks": chunks}
+            if first_token is not None:
+                attrs["ttft_ms"] = round(first_token * 1000, 3)
+            if error:
+                attrs["error"] = error
+            tracing.record("llm.completion", duration, **attrs)
 
     async def analyze_file(self, file_path: str) -> Dict[str, Any]:
         """Performs initial analysis of the uploaded file."""
         try:
-            # We still read it here to get summary for LLM context
-            if file_path.endswith(".csv"):
-                df = pd.read_csv(file_path)
-                load_cmd = f"import pandas as pd\ndf = pd.read_csv(r'{file_path}')"
-            elif file_path.endswith(".xlsx"):
-                df = pd.read_excel(file_path)
-                load_cmd = f"import pandas as pd\ndf = pd.read_excel(r'{file_path}')"
-            else:
-                return {"error": "Unsupported file format"}
+            # Identical content analyzed before (any name, any session) is not re-read.
+            # Hashing and reading run off the event loop (shared by all sessions).
+            digest = await asyncio.to_thread(self.catalog.content_hash, file_path)
+            settings = self.loader.settings_key()
+            cached = self.catalog.analysis(digest, settings)
+            loaded = cached and self.loader.rebase(cached, file_path)
+            if not loaded:
+                # We still read (or scan) it here to get summary for LLM context
+                loaded = await asyncio.to_thread(self.loader.load, file_path, digest)
+                if "error" in loaded:
+                    return loaded
+                self.catalog.save_analysis(digest, settings, file_path, loaded)
 
             # EXECUTE LOAD IN KERNEL
-            print(f"Loading data into Kernel: {file_path}")
-            self.kernel.execute(load_cmd)
-
-            head_df = df.head(5).astype(object).where(pd.notnull(df.head(5)), None)
+            print(f"Loading data into Kernel ({loaded['mode']}): {file_path}")
+            # The kernel lock may be held by a cell streaming on a worker thread
+            result = await asyncio.to_thread(
+                self.kernel.execute,
+                loaded["load_cmd"],
+                timeout=self.load_timeout,
+                record=False,
+            )
+            if result["error"]:
+                return {"error": f"Loading into the kernel failed: {result['error']}"}
+            self.active_load_cmd = loaded["load_cmd"]
+            self.kernel.load_cmd = loaded["load_cmd"]
 
             summary = {
-                "columns": list(df.columns),
-                "shape": df.shape,
-                "head": head_df.to_dict(orient="records"),
-                "missing_values": df.isnull().sum().to_dict(),
+                "columns": loaded["columns"],
+                "shape": loaded["shape"],
+                "head": loaded["head"],
+                "missing_values": loaded["missing_values"],
+                "mode": loaded["mode"],
+                "memory": loaded["memory"],
+                "sheets": loaded.get("sheets"),
             }
 
             # Update Context String
-            # self.current_context["df"] = df # No longer needed in memory
             # But we need to track that 'df' is available for the LLM prompt context
             self.active_df_path = file_path
-            self.active_df_columns = list(df.columns)
-            self.active_df_shape = df.shape
+            self.active_df_columns = loaded["columns"]
+            self.active_df_shape = loaded["shape"]
+            self.active_df_mode = loaded["mode"]
+            self.active_df_dtypes = loaded["dtypes"]
+            self.active_df_missing = loaded["missing_values"]
+            self.active_df_sheets = loaded.get("sheets")
+            # Cached schema answers stay valid until generated code runs
+            self.df_modified = False
             # ...
             # --- INDEXING FOR RAG ---
 
             # --- INDEXING FOR RAG ---
             # Create a text representation of columns and types
             schema_text = f"Dataset Columns:\n"
-            for col in df.columns:
-                dtype = str(df[col].dtype)
-                sample = str(df[col].iloc[0]) if not df.empty else "N/A"
+            first_row = loaded["head"][0] if loaded["head"] else {}
+            for col in loaded["columns"]:
+                dtype = loaded["dtypes"].get(col, "unknown")
+                sample = str(first_row.get(col, "N/A"))
                 schema_text += f"- {col} (Type: {dtype}, Sample: {sample})\n"
 
             try:
-                # Async call
-                await self.rag.add_document(
-                    schema_text, {"source": "schema", "session_id": self.session_id}
-                )
+                # Async call (once per content hash and session)
+                if digest not in self.indexed_hashes:
+                    await self.rag.add_document(
+                        schema_text,
+                        {"source": "schema", "session_id": self.session_id},
+                    )
+                    self.indexed_hashes.add(digest)
             except Exception as e:
                 print(f"RAG Indexing Error: {e}")
 
@@ -132,6 +268,62 @@ class AutoDSAgent:
         except Exception as e:
             return {"error": str(e)}
 
+    def reset(self, restore: bool = False) -> Dict[str, Any]:
+        """
+        Restarts the kernel.
+        restore=False: starts a brand new session (history, data and variables are dropped).
+        restore=True: keeps the session and reloads DataFrames/models from a fresh checkpoint,
+        reporting restore time vs. the time a full replay of all cells would take.
+        """
+        try:
+            if not restore:
+                self.kernel.restart()
+                self.kernel.load_cmd = None
+                for attr in (
+                    "active_df_path",
+                    "active_df_columns",
+                    "active_df_shape",
+                    "active_df_mode",
+                    "active_df_dtypes",
+                    "active_df_missing",
+                    "active_df_sheets",
+                    "active_load_cmd",
+                ):
+                    if hasattr(self, attr):
+                        delattr(self, attr)
+
+                # The old session's schema documents go with its data
+                self.rag.clear_session(self.session_id)
+                self._start_session()
+                return {"status": "success", "session_id": self.session_id}
+
+            replay_seconds = self.kernel.replay_seconds
+            if self.kernel.is_alive():
+                self.kernel.checkpoint(self.kernel.checkpoint_dir)
+
+            self.kernel.restart()
+            start = time.time()
+            restored = self.kernel.restore(self.kernel.checkpoint_dir)
+            # Lazy frames are not snapshotted, they are cheap to re-open
+            if hasattr(self, "active_load_cmd") and "df" not in restored.get(
+                "variables", []
+            ):
+                self.kernel.execute(
+                    self.active_load_cmd, timeout=self.load_timeout, record=False
+                )
+            restore_seconds = time.time() - start
+            self.kernel.replay_seconds = replay_seconds
+
+            return {
+                "status": "success",
+                "session_id": self.session_id,
+                "restored": restored,
+                "restore_seconds": round(restore_seconds, 3),
+                "replay_seconds": round(replay_seconds, 3),
+            }
+        except Exception as e:
+            return {"error": str(e)}
+
     # ... generate_eda, execute_sql remain unchanged ...
 
     def execute_code(self, code: str) -> Dict[str, Any]:
@@ -141,6 +333,250 @@ class AutoDSAgent:
         # We delegate entirely to the kernel
         return self.kernel.execute(code)
 
+    async def _fast_path_answer(self, prompt: str) -> Dict[str, Any]:
+        """
+        Answers a simple data question (see fast_path.py) from the cached schema or
+        one kernel template. Returns None when the LLM should handle the prompt.
+        """
+        if not hasattr(self, "active_df_path"):
+            return None
+        intent = self.fast_path.match(prompt, self.active_df_columns)
+        if intent is None:
+            return None
+
+        code = self.fast_path.code(intent, lazy=self.active_df_mode == "lazy")
+        source = "the cached schema"
+        answer = None
+        if not self.df_modified:
+            answer = self.fast_path.from_schema(
+                intent,
+                {
+                    "shape": self.active_df_shape,
+                    "columns": self.active_df_columns,
+                    "dtypes": self.active_df_dtypes,
+                    "missing_values": self.active_df_missing,
+                },
+            )
+        if answer is not None:
+            exec_result = {"output": answer, "plot": None, "error": None}
+        else:
+            source = "a kernel template"
+            exec_result = await asyncio.to_thread(self.execute_code, code)
+            if self._failed(exec_result):
+                return None  # e.g. `df` was reshaped, let the LLM deal with it
+
+        self.fast_path.count(intent)
+        content = (
+            f"**{self.fast_path.describe(intent)}** (answered directly)\n\n"
+            f"```python\n{code}\n```"
+            f"\n\n**Execution Result:**\n```\n{exec_result['output']}\n```"
+        )
+        return {
+            "intent": intent["intent"],
+            "source": source,
+            "content": content,
+            "results": {code: exec_result},
+        }
+
+    # --- STREAMED EXECUTION ---
+    # An "attempt" is one LLM answer. Its code blocks are dispatched to the kernel as
+    # soon as their closing fence streams in, and run one after another in a worker
+    # thread while the model keeps writing. Results are inserted after their block.
+
+    def _new_attempt(self, prefix: str) -> Dict[str, Any]:
+        return {
+            "prefix": prefix,  # Response text before this answer
+            "parser": CodeFenceParser(),
+            "tasks": [],  # One per code block, in order
+            "preflight": [],  # Pre-flight report of each block
+            "timings": [],  # (start, end) of each kernel run
+            "outputs": [],  # Rendered results of the handled blocks
+            "execution_output": "",
+            "failed": None,  # Output of the failed block, if any
+            "error": None,  # Kernel error of the failed block (fix memory signature)
+            "failed_code": None,
+            "stream_end": None,
+        }
+
+    @staticmethod
+    def _failed(exec_result: Dict[str, Any]) -> bool:
+        return bool(exec_result.get("error")) or (
+            "Execution Error:" in exec_result["output"]
+        )
+
+    def _preflight(self, attempt: Dict[str, Any], code: str) -> Dict[str, Any]:
+        """Checks (and fixes) a block before it runs; fixes go back into the answer."""
+        start = time.perf_counter()
+        report = self.preflight.check(
+            code,
+            getattr(self, "active_df_columns", []),
+            getattr(self, "active_df_dtypes", {}),
+            self.defined_names,
+        )
+        tracing.record(
+            "preflight",
+            time.perf_counter() - start,
+            fixes=len(report["fixes"]),
+            blocked=report["error"] is not None,
+        )
+        if report["fixes"]:
+            attempt["parser"].replace_block(len(attempt["tasks"]), report["code"])
+        self.defined_names |= report["defined"]
+        return report
+
+    def _dispatch(self, attempt: Dict[str, Any], code: str) -> asyncio.Task:
+        """Queues `code` behind the previous block; skipped if that block failed."""
+        previous = attempt["tasks"][-1] if attempt["tasks"] else None
+        report = self._preflight(attempt, code)
+        code = report["code"]
+
+        async def run():
+            if previous is not None:
+                prior = await previous
+                if prior is None or self._failed(prior):
+                    return None
+            if report["error"]:
+                # Would fail in the kernel as well, go straight to self-correction
+                return {
+                    "output": f"{report['error']} (pre-flight check, not executed)",
+                    "plot": None,
+                    "error": report["error"],
+                    "usage": {},
+                }
+            start = time.perf_counter()
+            self.df_modified = True
+            try:
+                return await asyncio.to_thread(self.execute_code, code)
+            except Exception as e:
+                return {
+                    "output": f"Execution Error: {e}",
+                    "plot": None,
+                    "error": str(e),
+                    "usage": {},
+                }
+            finally:
+                attempt["timings"].append((start, time.perf_counter()))
+
+        task = asyncio.create_task(run())
+        attempt["tasks"].append(task)
+        attempt["preflight"].append(report)
+        return task
+
+    def _render(self, attempt: Dict[str, Any]) -> str:
+        parser = attempt["parser"]
+        return attempt["prefix"] + interleave(
+            parser.text, parser.ends, attempt["outputs"]
+        )
+
+    def _overlapped_seconds(self, attempt: Dict[str, Any]) -> float:
+        """Kernel time that ran while the LLM was still streaming."""
+        stream_end = attempt["stream_end"]
+        return sum(
+            max(0.0, min(end, stream_end) - start)
+            for start, end in attempt["timings"]
+        )
+
+    async def _stream_attempt(
+        self,
+        attempt: Dict[str, Any],
+        messages,
+        phase: str,
+        turn_results: Dict[str, Dict[str, Any]],
+    ) -> AsyncGenerator[Dict[str, Any], None]:
+        """Streams an LLM answer, dispatching its code blocks as they complete."""
+        async for chunk in self._stream_completion(messages, phase):
+            for code in attempt["parser"].feed(chunk):
+                self._dispatch(attempt, code)
+                report = attempt["preflight"][-1]
+                if report["fixes"] or report["warnings"]:
+                    notes = report["fixes"] + [
+                        f"warning: {w}" for w in report["warnings"]
+                    ]
+                    yield {
+                        "type": "thinking",
+                        "content": "Pre-flight: " + "; ".join(notes),
+                    }
+                code = attempt["parser"].blocks[-1]
+                yield {"type": "thinking", "content": f"Executing:\n{code[:50]}..."}
+            async for update in self._collect_results(
+                attempt, turn_results, wait=False
+            ):
+                yield update
+            yield {"type": "response", "content": self._render(attempt)}
+            await asyncio.sleep(0.01)  # Yield to event loop for WebSocket sends
+        attempt["stream_end"] = time.perf_counter()
+
+    async def _collect_results(
+        self,
+        attempt: Dict[str, Any],
+        turn_results: Dict[str, Dict[str, Any]],
+        wait: bool,
+    ) -> AsyncGenerator[Dict[str, Any], None]:
+        """
+        Handles finished blocks in order (plots, resources, inlined result).
+        wait=False only takes blocks that are already done. Stops at the first failure.
+        """
+        while attempt["failed"] is None and len(attempt["outputs"]) < len(
+            attempt["tasks"]
+        ):
+            index = len(attempt["outputs"])
+            task = attempt["tasks"][index]
+            if not wait and not task.done():
+                return
+            # Long cells (e.g. train_model) report progress while they run
+            last_progress = None
+            while not task.done():
+                await asyncio.wait({task}, timeout=0.5)
+                progress = self.kernel.progress
+                if progress and progress != last_progress:
+                    last_progress = progress
+                    yield {
+                        "type": "status",
+                        "content": f"{progress['message']} "
+                        f"({progress['fraction']:.0%})",
+                    }
+            exec_result = await task
+            code = attempt["parser"].blocks[index]
+            turn_results[code] = exec_result
+            result = exec_result["output"]
+
+            usage = exec_result.get("usage", {})
+            yield {
+                "type": "thinking",
+                "content": f"Resources: {usage.get('cpu_seconds')}s CPU, "
+                f"{usage.get('peak_rss_mb')} MB peak RSS, "
+                f"{usage.get('output_bytes')} bytes output"
+                + (" (cached result replayed)" if exec_result.get("cached") else ""),
+            }
+            if exec_result["plot"]:
+                yield {"type": "plot", "content": exec_result["plot"]}
+
+            output_text = f"\n\n**Execution Result:**\n```\n{result}\n```"
+            attempt["outputs"].append(output_text)
+            attempt["execution_output"] += output_text
+            yield {"type": "response", "content": self._render(attempt)}
+
+            if attempt["preflight"][index]["would_fail"] and not self._failed(
+                exec_result
+            ):
+                self.preflight.stats["avoided_retries"] += 1
+
+            if self._failed(exec_result):
+                attempt["failed"] = result
+                attempt["error"] = exec_result.get("error") or result
+                attempt["failed_code"] = code
+                yield {"type": "thinking", "content": f"Error detected: {result}"}
+            else:
+                yield {"type": "thinking", "content": f"Output: {result[:50]}..."}
+
+    def _known_fix_attempt(self, prefix: str, code: str) -> Dict[str, Any]:
+        """An attempt that runs a fix from the fix memory instead of asking the LLM."""
+        attempt = self._new_attempt(prefix)
+        for block in attempt["parser"].feed(f"```python\n{code}\n```\n"):
+            self._dispatch(attempt, block)
+        attempt["stream_end"] = time.perf_counter()
+        return attempt
+
     async def process_prompt_stream(
         self, prompt: str
     ) -> AsyncGenerator[Dict[str, Any], None]:
@@ -148,10 +584,41 @@ class AutoDSAgent:
         Calls DeepInfra LLM, streams response, and executes code if found.
         """
 
+        # Every span of this turn (RAG, LLM, kernel, DB, history) shares one trace id
+        tracing.start_trace()
+        turn_start = time.perf_counter()
+
         # 1. IMMEDIATE HISTORY SAVE (User Prompt)
         self.session_history.append({"role": "user", "content": prompt})
         self._save_history()
 
+        # FAST PATH: simple data questions are answered without the LLM
+        self.fast_path.stats["turns"] += 1
+        fast = await self._fast_path_answer(prompt)
+        if fast:
+            yield {
+                "type": "thinking",
+                "content": f"Fast path: '{fast['intent']}' answered from "
+                f"{fast['source']} (no LLM call).",
+            }
+            yield {"type": "response", "content": fast["content"]}
+            self.session_history.append(
+                {"role": "assistant", "content": fast["content"]}
+            )
+            self._save_history()
+            try:
+                self.notebook.append_turn(fast["content"], fast["results"])
+            except Exception as e:
+                print(f"Notebook Export Error: {e}")
+            tracing.record(
+                "agent.fast_path",
+                time.perf_counter() - turn_start,
+                intent=fast["intent"],
+                source=fast["source"],
+            )
+            yield {"type": "done", "content": "Task Complete"}
+            return
+
         # 1. THINKING & RETRIEVAL
         yield {
             "type": "thinking",
@@ -176,6 +643,21 @@ class AutoDSAgent:
         context_msg = "No data loaded."
         if hasattr(self, "active_df_path"):
             context_msg = f"Data Loaded (in Kernel). Columns: {self.active_df_columns}. Shape: {self.active_df_shape}"
+            if self.active_df_mode == "lazy":
+                context_msg += (
+                    "\nOUT-OF-CORE MODE: `df` is a Polars LazyFrame (too large for RAM). "
+                    "Follow the Out-of-Core rules: filter/aggregate lazily, then `.collect()`."
+                )
+            if len(getattr(self, "active_df_sheets", None) or []) > 1:
+                loaded_sheets = ", ".join(
+                    f"`{s['variable']}` ('{s['name']}', shape {s['shape']}, "
+                    f"columns {s['columns']})"
+                    for s in self.active_df_sheets
+                )
+                context_msg += (
+                    f"\nEXCEL WORKBOOK: every sheet is its own DataFrame: {loaded_sheets}. "
+                    "`df` is the first sheet; all are in the dict `sheets`."
+                )
 
         # Combine Contexts
         full_context_msg = f"{context_msg}\nRelevant Past Info:\n{rag_context}"
@@ -185,6 +667,8 @@ class AutoDSAgent:
 
         # 3. LLM INFERENCE
         full_response = ""
+        turn_results = {}  # Executed code -> kernel result (notebook outputs)
+        overlapped = 0.0  # Kernel time hidden behind LLM streaming
         try:
             messages = [
                 {"role": "system", "content": self.system_prompt},
@@ -194,193 +678,171 @@ class AutoDSAgent:
                 },
             ]
 
-            chat_completion = await self.client.chat.completions.create(
-                model="zai-org/GLM-4.7",
-                messages=messages,
-                stream=True,
-            )
-
-            response_buffer = ""
-            async for event in chat_completion:
-                if event.choices[0].delta.content:
-                    chunk = event.choices[0].delta.content
-                    response_buffer += chunk
-                    full_response += chunk
-                    yield {
-                        "type": "response",
-                        "content": response_buffer,
-                    }
-                    await asyncio.sleep(0.01)  # Yield to event loop for WebSocket sends
+            # Code blocks run as soon as their fence closes (see _stream_attempt)
+            attempt = self._new_attempt("")
+            async for update in self._stream_attempt(
+                attempt, messages, "answer", turn_results
+            ):
+                yield update
+            overlapped += self._overlapped_seconds(attempt)
+            full_response = self._render(attempt)
 
             # 4. CODE EXECUTION & SELF-CORRECTION LOOP
             MAX_RETRIES = 3
             retry_count = 0
+            healing = None  # The error being fixed by the current attempt
 
-            # Initial extraction
-            code_blocks = re.findall(
-                r"```python\s*(.*?)\s*```", full_response, re.DOTALL
-            )
-
-            while code_blocks and retry_count < MAX_RETRIES:
+            while attempt["tasks"] and retry_count < MAX_RETRIES:
                 yield {
                     "type": "status",
                     "content": f"Executing Code (Attempt {retry_count+1})...",
                 }
 
-                execution_success = True
-                current_execution_output = ""
-
-                for code in code_blocks:
-                    yield {"type": "thinking", "content": f"Executing:\n{code[:50]}..."}
-
-                    # 2. EXECUTE
-                    exec_result = self.execute_code(code)
-                    result = exec_result["output"]
-                    plot_json = exec_result["plot"]
-
-                    # 3. IF PLOT, SEND IT
-                    if plot_json:
-                        yield {"type": "plot", "content": plot_json}
-
-                    # 4. APPEND RESULT (Simulate Streaming)
-                    output_text = f"\n\n**Execution Result:**\n```\n{result}\n```"
-
-                    # Fake stream output...
-                    for i in range(0, len(output_text), 4):
-                        chunk = output_text[i : i + 4]
-                        full_response += chunk
-                        yield {
-                            "type": "response",
-                            "content": full_response,
-                        }
-                        await asyncio.sleep(0.005)
-
-                    current_execution_output += output_text
-
-                    if "Execution Error:" in result:
-                        execution_success = False
-                        yield {
-                            "type": "thinking",
-                            "content": f"Error detected: {result}",
-                        }
+                async for update in self._collect_results(
+                    attempt, turn_results, wait=True
+                ):
+                    yield update
+                full_response = self._render(attempt)
+
+                if attempt["failed"] is not None:
+                    if healing is not None and healing["local"]:
+                        # The known fix did not carry over to this code
+                        self.fix_memory.reject(healing["signature"])
+                    retry_count += 1
+                    if retry_count == MAX_RETRIES:
+                        break  # No attempt left to run a fix
+
+                    result = attempt["failed"]
+
+                    # --- FIX MEMORY ---
+                    # A fix that worked for the same error before is re-applied
+                    # without an LLM call; otherwise it guides the reflection.
+                    known = self.fix_memory.lookup(attempt["error"])
+                    known_code = known and self.fix_memory.apply(
+                        known, attempt["failed_code"]
+                    )
+                    healing = {
+                        "error": attempt["error"],
+                        "failed_code": attempt["failed_code"],
+                        "local": bool(known_code),
+                        "signature": known and known["signature"],
+                    }
+                    if known_code:
                         yield {
                             "type": "status",
-                            "content": "Error detected. Performing Deep Reflection...",
-                        }
-
-                        # --- ENHANCED SELF-HEALING ---
-                        # 1. RAG Query for Error
-                        error_context = ""
-                        try:
-                            docs = await self.rag.query(
-                                f"Fix python error: {result}", self.session_id
-                            )
-                            error_context = "\n".join(docs)
-                        except:
-                            pass
-
-                        # 2. Reflection Prompt
-                        reflection_prompt = f"""
-                        STOP. The code failed.
-                        Error: {result}
-                        
-                        Context from Memory: {error_context}
-                        
-                        Analyze WHY it failed. Is the column name wrong? Syntax error?
-                        Explain the mistake briefly, THEN provide the corrected code block.
-                        """
-
-                        messages.append({"role": "assistant", "content": full_response})
-                        messages.append({"role": "user", "content": reflection_prompt})
-
-                        # Call LLM again for fix
-                        chat_completion = await self.client.chat.completions.create(
-                            model="zai-org/GLM-4.7",
-                            messages=messages,
-                            stream=True,
-                        )
-
-                        fix_buffer = "\n\n**Self-correction:**\n"
-                        full_response += fix_buffer
-                        current_execution_output = ""  # Reset for new attempt
-
-                        yield {
-                            "type": "response",
-                            "content": full_response,
+                            "content": "Error detected. Applying a known fix...",
                         }
-
-                        async for event in chat_completion:
-                            if event.choices[0].delta.content:
-                                chunk = event.choices[0].delta.content
-                                full_response += chunk
-                                yield {"type": "response", "content": full_response}
-                                await asyncio.sleep(0.01)
-
-                        # Update code_blocks for next iteration check
-                        code_blocks = re.findall(
-                            r"```python\s*(.*?)\s*```", full_response, re.DOTALL
+                        attempt = self._known_fix_attempt(
+                            full_response + "\n\n**Self-correction (known fix):**\n",
+                            known_code,
                         )
+                        full_response = self._render(attempt)
+                        yield {"type": "response", "content": full_response}
+                        continue
 
-                        break  # Break inner loop to retry outer loop with new blocks
-
-                    else:
-                        yield {
-                            "type": "thinking",
-                            "content": f"Output: {result[:50]}...",
-                        }
-
-                if execution_success:
-                    # POST-EXECUTION ANALYSIS
-                    yield {"type": "status", "content": "Interpreting Results..."}
                     yield {
-                        "type": "thinking",
-                        "content": "Code executed. Generating final explanation...",
+                        "type": "status",
+                        "content": "Error detected. Performing Deep Reflection...",
                     }
 
-                    analysis_prompt = f"""
-                    The code executed successfully. 
-                    Here is the output:
-                    {current_execution_output}
+                    # --- ENHANCED SELF-HEALING ---
+                    # 1. RAG Query for Error
+                    error_context = ""
+                    if known:
+                        error_context = self.fix_memory.context(known) + "\n"
+                    try:
+                        docs = await self.rag.query(
+                            f"Fix python error: {result}", self.session_id
+                        )
+                        error_context += "\n".join(docs)
+                    except:
+                        pass
+                    # Indexed after the lookup, later turns can find this failure
+                    try:
+                        self.rag.index_error(
+                            self.session_id, attempt["error"], attempt["failed_code"]
+                        )
+                    except Exception as e:
+                        print(f"Error Indexing Error: {e}")
+
+                    # 2. Reflection Prompt
+                    reflection_prompt = f"""
+                    STOP. The code failed.
+                    Error: {truncate_middle(result, LLM_OUTPUT_BYTES)}
+                    
+                    Context from Memory: {error_context}
                     
-                    Please provide a clear, concise explanation of what this result means for the user's data.
+                    Analyze WHY it failed. Is the column name wrong? Syntax error?
+                    Explain the mistake briefly, THEN provide the corrected code block.
                     """
 
-                    messages.append(
-                        {
-                            "role": "assistant",
-                            "content": full_response,
-                        }
-                    )
-                    messages.append({"role": "user", "content": analysis_prompt})
+                    messages.append({"role": "assistant", "content": full_response})
+                    messages.append({"role": "user", "content": reflection_prompt})
 
-                    try:
-                        chat_completion = await self.client.chat.completions.create(
-                            model="zai-org/GLM-4.7",
-                            messages=messages,
-                            stream=True,
+                    # Call LLM again for fix (only the new blocks run next attempt)
+                    attempt = self._new_attempt(
+                        full_response + "\n\n**Self-correction:**\n"
+                    )
+                    yield {"type": "response", "content": attempt["prefix"]}
+                    async for update in self._stream_attempt(
+                        attempt, messages, "self_correction", turn_results
+                    ):
+                        yield update
+                    overlapped += self._overlapped_seconds(attempt)
+                    full_response = self._render(attempt)
+                    continue
+
+                # The retry worked: remember the fix for the next time
+                if healing is not None:
+                    if healing["local"]:
+                        self.fix_memory.confirm()
+                    else:
+                        self.fix_memory.record(
+                            healing["error"],
+                            healing["failed_code"],
+                            "\n\n".join(attempt["parser"].blocks),
                         )
 
-                        full_response += "\n\n**Analysis:**\n"
-                        current_execution_output = ""
+                # POST-EXECUTION ANALYSIS
+                yield {"type": "status", "content": "Interpreting Results..."}
+                yield {
+                    "type": "thinking",
+                    "content": "Code executed. Generating final explanation...",
+                }
 
-                        yield {"type": "response", "content": full_response}
+                analysis_prompt = f"""
+                The code executed successfully. 
+                Here is the output:
+                {truncate_middle(attempt["execution_output"], LLM_OUTPUT_BYTES)}
+                
+                Please provide a clear, concise explanation of what this result means for the user's data.
+                """
+
+                messages.append(
+                    {
+                        "role": "assistant",
+                        "content": full_response,
+                    }
+                )
+                messages.append({"role": "user", "content": analysis_prompt})
 
-                        async for event in chat_completion:
-                            if event.choices[0].delta.content:
-                                chunk = event.choices[0].delta.content
-                                full_response += chunk
-                                yield {"type": "response", "content": full_response}
-                                await asyncio.sleep(0.01)
+                try:
+                    full_response += "\n\n**Analysis:**\n"
 
-                    except Exception as e:
-                        yield {
-                            "type": "thinking",
-                            "content": f"Error generating summary: {e}",
-                        }
+                    yield {"type": "response", "content": full_response}
 
-                    break  # Exit loop
+                    async for chunk in self._stream_completion(messages, "analysis"):
+                        full_response += chunk
+                        yield {"type": "response", "content": full_response}
+                        await asyncio.sleep(0.01)
 
-                retry_count += 1
+                except Exception as e:
+                    yield {
+                        "type": "thinking",
+                        "content": f"Error generating summary: {e}",
+                    }
+
+                break  # Exit loop
 
             if retry_count == MAX_RETRIES:
                 yield {
@@ -392,9 +854,27 @@ class AutoDSAgent:
                     "content": "\n\n**System:** Could not fix code after multiple attempts.",
                 }
 
+            # Periodic kernel snapshot (cheap no-op until the interval elapses).
+            # A due snapshot can take minutes, so it runs off the event loop.
+            try:
+                await asyncio.to_thread(self.kernel.maybe_checkpoint)
+            except Exception as e:
+                print(f"Checkpoint Error: {e}")
+
             # 5. SAVE SESSION HISTORY (Assistant Response)
             self.session_history.append({"role": "assistant", "content": full_response})
             self._save_history()
+            try:
+                self.notebook.append_turn(full_response, turn_results)
+            except Exception as e:
+                print(f"Notebook Export Error: {e}")
+
+            tracing.record(
+                "agent.turn",
+                time.perf_counter() - turn_start,
+                retries=retry_count,
+                overlapped_kernel_s=round(overlapped, 3),
+            )
 
             # Done
             yield {"type": "done", "content": "Task Complete"}
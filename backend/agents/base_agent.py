@@ -2,6 +2,8 @@ import os
 from openai import AsyncOpenAI
 from dotenv import load_dotenv
 
+import tracing
+
 load_dotenv()
 
 
@@ -15,7 +17,9 @@ class BaseAgent:
 
             self.client = AsyncOpenAI(
                 api_key=api_key or "missing_key",
-                base_url="https://api.deepinfra.com/v1/openai",
+                base_url=os.getenv(
+                    "AUTODS_LLM_BASE_URL", "https://api.deepinfra.com/v1/openai"
+                ),
             )
         except Exception as e:
             print(f"Error initializing OpenAI client: {e}")
@@ -23,11 +27,13 @@ class BaseAgent:
 
     async def call_llm(self, messages, model="zai-org/GLM-4.7", stream=False):
         try:
-            return await self.client.chat.completions.create(
-                model=model,
-                messages=messages,
-                stream=stream,
-            )
+            # For streamed calls this times the request up to the first response
+            with tracing.span("llm.call", role=self.role, stream=stream):
+                return await self.client.chat.completions.create(
+                    model=model,
+                    messages=messages,
+                    stream=stream,
+                )
         except Exception as e:
             print(f"LLM Call Error ({self.role}): {e}")
             raise e
@@ -35,6 +35,9 @@ class OrchestratorAgent:
         context_msg = ""
         if hasattr(self.coder, "active_df_path"):
             context_msg = f"Data Loaded: Columns: {self.coder.active_df_columns}"
+            # Simple data questions go to the coder's fast path, never to the Planner
+            if self.coder.fast_path.match(prompt, self.coder.active_df_columns):
+                is_complex = False
 
         if not is_complex:
             # Fast path: Just forward to Coder
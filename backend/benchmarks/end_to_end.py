@@ -0,0 +1,363 @@
+"""
+End-to-end load benchmark, fully offline.
+
+Starts the mock LLM/embedding server (benchmarks.mock_llm) and a backend pointed at
+it, then drives N concurrent WebSocket clients through
+upload -> prompt -> code execution -> plot, and reports p50/p95/p99 latencies,
+throughput and peak memory (backend + kernels).
+
+Usage (from backend/):
+    python -m benchmarks.end_to_end --clients 8 --turns 3
+    python -m benchmarks.end_to_end --baseline benchmarks/results/<previous>.json
+
+Results are written as JSON to benchmarks/results/ (or --output). With --baseline,
+p95 regressions beyond --tolerance are reported and the exit code is 1.
+"""
+
+import os
+import sys
+import json
+import math
+import time
+import uuid
+import asyncio
+import argparse
+import subprocess
+from typing import Dict, Any, List
+
+import httpx
+import psutil
+import websockets
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(BASE_DIR, "benchmarks", "results")
+
+PROMPTS = [
+    "Show me the distribution of the main numeric column",
+    "Plot a histogram of the first column",
+    "Describe the data and visualize it",
+]
+
+
+def make_csv(rows: int) -> bytes:
+    lines = ["id,amount,category,score"]
+    for i in range(rows):
+        lines.append(f"{i},{(i * 37) % 1000 / 10},{'abc'[i % 3]},{(i * 13) % 100}")
+    return ("\n".join(lines) + "\n").encode("utf-8")
+
+
+def percentiles(values: List[float]) -> Dict[str, float]:
+    if not values:
+        return {"count": 0}
+    ordered = sorted(values)
+
+    def pick(q):
+        # Nearest-rank percentile
+        index = max(0, math.ceil(q * len(ordered)) - 1)
+        return round(ordered[index], 4)
+
+    return {
+        "count": len(ordered),
+        "mean": round(sum(ordered) / len(ordered), 4),
+        "p50": pick(0.50),
+        "p95": pick(0.95),
+        "p99": pick(0.99),
+        "max": round(ordered[-1], 4),
+    }
+
+
+# --- PROCESSES ---
+
+
+def start_process(args: List[str], env: Dict[str, str]) -> subprocess.Popen:
+    return subprocess.Popen(
+        [sys.executable, *args],
+        cwd=BASE_DIR,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+
+
+def stop_process(proc: subprocess.Popen):
+    if proc is None or proc.poll() is not None:
+        return
+    proc.terminate()
+    try:
+        proc.wait(timeout=15)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+
+
+async def wait_ready(url: str, timeout: float = 180):
+    deadline = time.time() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.time() < deadline:
+            try:
+                if (await client.get(url, timeout=2)).status_code < 500:
+                    return
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(0.5)
+    raise RuntimeError(f"{url} did not become ready within {timeout}s")
+
+
+class MemorySampler:
+    """Peak RSS of a process and its children (the kernels), sampled periodically."""
+
+    def __init__(self, pid: int, interval: float = 0.5):
+        self.process = psutil.Process(pid)
+        self.interval = interval
+        self.peak_mb = 0.0
+
+    def sample(self) -> float:
+        total = 0
+        try:
+            for proc in [self.process, *self.process.children(recursive=True)]:
+                try:
+                    total += proc.memory_info().rss
+                except psutil.Error:
+                    pass
+        except psutil.Error:
+            return 0.0
+        self.peak_mb = max(self.peak_mb, total / 1024 / 1024)
+        return total / 1024 / 1024
+
+    async def run(self):
+        while True:
+            self.sample()
+            await asyncio.sleep(self.interval)
+
+
+# --- CLIENT ---
+
+
+async def run_client(
+    index: int, http_url: str, ws_url: str, turns: int, rows: int, timeout: float
+) -> Dict[str, Any]:
+    session_id = f"bench-{index}-{uuid.uuid4().hex[:6]}"
+    result = {"upload_s": None, "turns": [], "errors": []}
+
+    async with httpx.AsyncClient(base_url=http_url, timeout=timeout) as client:
+        start = time.perf_counter()
+        response = await client.post(
+            "/upload",
+            params={"session_id": session_id},
+            files={"file": (f"{session_id}.csv", make_csv(rows), "text/csv")},
+        )
+        result["upload_s"] = time.perf_counter() - start
+        summary = response.json().get("summary", {}) if response.is_success else {}
+        if not response.is_success or "error" in summary:
+            result["errors"].append(f"upload: {response.text[:200]}")
+            return result
+
+    async with websockets.connect(
+        f"{ws_url}/ws/chat?session_id={session_id}", max_size=None
+    ) as ws:
+        await ws.recv()  # {"type": "session"}
+        for turn in range(turns):
+            prompt = PROMPTS[(index + turn) % len(PROMPTS)]
+            timings = {"first_response_s": None, "plot_s": None, "turn_s": None}
+            start = time.perf_counter()
+            await ws.send(json.dumps({"prompt": prompt}))
+            try:
+                while True:
+                    message = json.loads(await asyncio.wait_for(ws.recv(), timeout))
+                    elapsed = time.perf_counter() - start
+                    kind = message.get("type")
+                    if kind == "response" and timings["first_response_s"] is None:
+                        timings["first_response_s"] = elapsed
+                    elif kind == "plot" and timings["plot_s"] is None:
+                        timings["plot_s"] = elapsed
+                    elif kind == "error":
+                        result["errors"].append(message.get("content"))
+                        break
+                    elif kind == "done":
+                        timings["turn_s"] = elapsed
+                        break
+            except asyncio.TimeoutError:
+                result["errors"].append(f"turn {turn}: timed out after {timeout}s")
+                break
+            result["turns"].append(timings)
+    return result
+
+
+# --- REPORT ---
+
+
+def summarize(
+    clients: List[Dict[str, Any]], wall_seconds: float, config: Dict[str, Any]
+) -> Dict[str, Any]:
+    turns = [t for c in clients for t in c["turns"]]
+    completed = [t for t in turns if t["turn_s"] is not None]
+
+    def values(key):
+        return [t[key] for t in turns if t[key] is not None]
+
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "config": config,
+        "wall_seconds": round(wall_seconds, 3),
+        "turns_completed": len(completed),
+        "throughput_turns_per_s": round(len(completed) / wall_seconds, 4),
+        "errors": [e for c in clients for e in c["errors"]],
+        "latency": {
+            "upload_s": percentiles([c["upload_s"] for c in clients if c["upload_s"]]),
+            "first_response_s": percentiles(values("first_response_s")),
+            "plot_s": percentiles(values("plot_s")),
+            "turn_s": percentiles(values("turn_s")),
+        },
+    }
+
+
+def compare(report: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> bool:
+    """Prints p95 deltas vs. the baseline; returns False on a regression."""
+    ok = True
+    print(f"\nComparison with baseline from {baseline.get('timestamp')}:")
+    for metric, stats in report["latency"].items():
+        old = baseline.get("latency", {}).get(metric, {}).get("p95")
+        new = stats.get("p95")
+        if not old or new is None:
+            continue
+        change = (new - old) / old
+        flag = ""
+        if change > tolerance:
+            flag = "  REGRESSION"
+            ok = False
+        print(f"  {metric:18s} p95 {old:8.3f}s -> {new:8.3f}s ({change:+.1%}){flag}")
+
+    old_tp = baseline.get("throughput_turns_per_s")
+    if old_tp:
+        new_tp = report["throughput_turns_per_s"]
+        change = (new_tp - old_tp) / old_tp
+        flag = "  REGRESSION" if change < -tolerance else ""
+        ok = ok and not flag
+        print(
+            f"  throughput {old_tp:.3f} -> {new_tp:.3f} turns/s ({change:+.1%}){flag}"
+        )
+    return ok
+
+
+async def main_async(args) -> int:
+    env = dict(os.environ)
+    mock_url = f"http://127.0.0.1:{args.mock_port}"
+    env["AUTODS_LLM_BASE_URL"] = f"{mock_url}/v1/openai"
+    env.pop("AUTODS_EMBEDDING_BASE_URL", None)
+    env.setdefault("DEEPINFRA_API_KEY", "benchmark")
+    env["AUTODS_MAX_SESSIONS"] = str(max(args.clients + 1, 2))
+
+    mock = backend = None
+    sampler_task = None
+    try:
+        mock = start_process(
+            [
+                "-m",
+                "benchmarks.mock_llm",
+                "--port",
+                str(args.mock_port),
+                "--ttft",
+                str(args.ttft),
+                "--tokens-per-second",
+                str(args.tokens_per_second),
+                "--embedding-latency",
+                str(args.embedding_latency),
+                *(["--script", args.script] if args.script else []),
+            ],
+            env,
+        )
+        await wait_ready(f"{mock_url}/stats")
+
+        if args.backend_url:
+            http_url = args.backend_url.rstrip("/")
+            sampler = None
+        else:
+            backend = start_process(
+                ["-m", "uvicorn", "main:app", "--port", str(args.backend_port)], env
+            )
+            http_url = f"http://127.0.0.1:{args.backend_port}"
+            sampler = MemorySampler(backend.pid)
+        await wait_ready(f"{http_url}/ready")  # 503 until the warm-up is done
+        ws_url = "ws" + http_url[len("http") :]
+
+        if sampler:
+            idle_mb = sampler.sample()
+            sampler_task = asyncio.create_task(sampler.run())
+
+        start = time.perf_counter()
+        clients = await asyncio.gather(
+            *[
+                run_client(i, http_url, ws_url, args.turns, args.rows, args.timeout)
+                for i in range(args.clients)
+            ]
+        )
+        wall_seconds = time.perf_counter() - start
+
+        config = {
+            k: getattr(args, k)
+            for k in (
+                "clients",
+                "turns",
+                "rows",
+                "ttft",
+                "tokens_per_second",
+                "embedding_latency",
+            )
+        }
+        report = summarize(clients, wall_seconds, config)
+        if sampler:
+            sampler.sample()
+            report["memory"] = {
+                "idle_rss_mb": round(idle_mb, 1),
+                "peak_rss_mb": round(sampler.peak_mb, 1),
+            }
+        async with httpx.AsyncClient() as client:
+            report["mock_llm"] = (await client.get(f"{mock_url}/stats")).json()
+    finally:
+        if sampler_task:
+            sampler_task.cancel()
+        stop_process(backend)
+        stop_process(mock)
+
+    output = args.output or os.path.join(
+        RESULTS_DIR, f"end_to_end_{time.strftime('%Y%m%d_%H%M%S')}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+
+    print(json.dumps(report, indent=2))
+    print(f"\nSaved to {output}")
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            if not compare(report, json.load(f), args.tolerance):
+                return 1
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline end-to-end benchmark")
+    parser.add_argument("--clients", type=int, default=4)
+    parser.add_argument("--turns", type=int, default=2, help="Prompts per client")
+    parser.add_argument("--rows", type=int, default=10_000, help="Rows of the upload")
+    parser.add_argument("--ttft", type=float, default=0.3)
+    parser.add_argument("--tokens-per-second", type=float, default=80.0)
+    parser.add_argument("--embedding-latency", type=float, default=0.05)
+    parser.add_argument("--script", help="Scripted answers for the mock LLM")
+    parser.add_argument("--timeout", type=float, default=300)
+    parser.add_argument("--mock-port", type=int, default=8900)
+    parser.add_argument("--backend-port", type=int, default=8765)
+    parser.add_argument(
+        "--backend-url",
+        help="Use a running backend (e.g. the coordinator) instead; it must have "
+        "been started with AUTODS_LLM_BASE_URL pointing at the mock",
+    )
+    parser.add_argument("--output", help="Result file (default: benchmarks/results/)")
+    parser.add_argument("--baseline", help="Previous result file to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.10)
+    args = parser.parse_args()
+    sys.exit(asyncio.run(main_async(args)))
+
+
+if __name__ == "__main__":
+    main()
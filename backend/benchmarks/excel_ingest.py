@@ -0,0 +1,86 @@
+"""
+Excel ingestion: the previous openpyxl path (first sheet only, whole workbook parsed
+in-process) vs. the per-sheet process pool + Parquet cache of DatasetLoader.
+
+Usage (from backend/):
+    python -m benchmarks.excel_ingest --sheets 4 --rows 50000
+"""
+
+import os
+import json
+import time
+import shutil
+import argparse
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from data_loader import DatasetLoader, excel_engine
+
+
+def make_workbook(path: str, n_sheets: int, n_rows: int):
+    rng = np.random.default_rng(0)
+    with pd.ExcelWriter(path, engine="openpyxl") as writer:
+        for i in range(n_sheets):
+            pd.DataFrame(
+                {
+                    "id": np.arange(n_rows),
+                    "amount": rng.normal(100, 25, n_rows).round(2),
+                    "region": rng.choice(["north", "south", "east", "west"], n_rows),
+                    "date": pd.date_range("2024-01-01", periods=n_rows, freq="min"),
+                }
+            ).to_excel(writer, sheet_name=f"Sheet {i + 1}", index=False)
+
+
+def timed(fn) -> float:
+    start = time.perf_counter()
+    fn()
+    return round(time.perf_counter() - start, 3)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Excel ingestion benchmark")
+    parser.add_argument("--sheets", type=int, default=4)
+    parser.add_argument("--rows", type=int, default=50_000)
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix="autods_excel_")
+    try:
+        path = os.path.join(work_dir, "bench.xlsx")
+        make_workbook(path, args.sheets, args.rows)
+
+        loader = DatasetLoader()
+        loader.parquet_dir = os.path.join(work_dir, "parquet")
+        loaded = {}
+
+        results = {
+            "workbook_mb": round(os.path.getsize(path) / 1024**2, 2),
+            "sheets": args.sheets,
+            "rows_per_sheet": args.rows,
+            "engine": excel_engine(),
+            "workers": min(args.sheets, loader.excel_workers),
+            "openpyxl": {
+                "first_sheet_s": timed(lambda: pd.read_excel(path, engine="openpyxl")),
+                "all_sheets_s": timed(
+                    lambda: pd.read_excel(path, sheet_name=None, engine="openpyxl")
+                ),
+                "preview_100_rows_s": timed(
+                    lambda: pd.read_excel(path, nrows=100, engine="openpyxl")
+                ),
+            },
+            "loader": {
+                "all_sheets_cold_s": timed(lambda: loaded.update(loader.load(path))),
+                "all_sheets_cached_s": timed(lambda: loader.load(path)),
+                "preview_100_rows_s": timed(lambda: loader.preview_excel(path, 100)),
+                # What the kernel runs for every (re)load of the workbook
+                "kernel_load_cmd_s": timed(lambda: exec(loaded["load_cmd"], {})),
+            },
+        }
+        print(json.dumps(results, indent=2))
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
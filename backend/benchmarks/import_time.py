@@ -0,0 +1,135 @@
+"""
+Backend startup benchmark: `import main` in a fresh interpreter (what every reload
+and worker start pays), the heavy libraries that import pulls in, and optionally
+how long a real server takes to accept connections vs. to be ready (/ready).
+
+Usage (from backend/):
+    python -m benchmarks.import_time --runs 5
+    python -m benchmarks.import_time --server
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import subprocess
+import urllib.error
+import urllib.request
+from typing import Dict, Any, List
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Libraries that should only be imported on first use (or by the warm-up)
+HEAVY_MODULES = [
+    "pandas",
+    "numpy",
+    "polars",
+    "openai",
+    "jupyter_client",
+    "sqlalchemy",
+]
+
+PROBE = (
+    "import sys, time, json\n"
+    "start = time.perf_counter()\n"
+    "import main\n"
+    "seconds = time.perf_counter() - start\n"
+    f"heavy = [m for m in {HEAVY_MODULES!r} if m in sys.modules]\n"
+    "print(json.dumps({'seconds': seconds, 'heavy': heavy}))"
+)
+
+
+def run_probe(importtime: bool = False) -> subprocess.CompletedProcess:
+    flags = ["-X", "importtime"] if importtime else []
+    return subprocess.run(
+        [sys.executable, *flags, "-c", PROBE],
+        cwd=BASE_DIR,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+
+def top_imports(importtime_log: str, n: int = 15) -> List[Dict[str, Any]]:
+    """Slowest top-level packages from `python -X importtime` output."""
+    packages = {}
+    for line in importtime_log.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:") :].split("|")
+        if name.startswith("  "):
+            continue  # Nested import, already counted by its parent
+        package = name.strip().split(".")[0]
+        packages[package] = packages.get(package, 0) + int(cumulative)
+    ranked = sorted(packages.items(), key=lambda item: item[1], reverse=True)
+    return [{"package": p, "seconds": round(us / 1e6, 3)} for p, us in ranked[:n]]
+
+
+def bench_import(runs: int) -> Dict[str, Any]:
+    results = [json.loads(run_probe().stdout.splitlines()[-1]) for _ in range(runs)]
+    seconds = sorted(r["seconds"] for r in results)
+    profile = run_probe(importtime=True)
+    return {
+        "runs": runs,
+        "min_s": round(seconds[0], 3),
+        "median_s": round(seconds[len(seconds) // 2], 3),
+        "max_s": round(seconds[-1], 3),
+        "heavy_modules_imported": results[-1]["heavy"],
+        "top_imports": top_imports(profile.stderr),
+    }
+
+
+def wait_for(url: str, ok_status: int, timeout: float) -> float:
+    """Seconds until `url` answers with `ok_status`."""
+    start = time.perf_counter()
+    while time.perf_counter() - start < timeout:
+        try:
+            with urllib.request.urlopen(url, timeout=2) as response:
+                if response.status == ok_status:
+                    return time.perf_counter() - start
+        except (urllib.error.URLError, ConnectionError):
+            pass
+        time.sleep(0.05)
+    raise RuntimeError(f"{url} did not answer {ok_status} within {timeout}s")
+
+
+def bench_server(port: int, timeout: float) -> Dict[str, Any]:
+    """Process start -> accepting connections (/) -> warm-up done (/ready)."""
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port)],
+        cwd=BASE_DIR,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        url = f"http://127.0.0.1:{port}"
+        accepting = wait_for(f"{url}/", 200, timeout)
+        ready = accepting + wait_for(f"{url}/ready", 200, timeout)
+    finally:
+        proc.terminate()
+        proc.wait(timeout=30)
+    return {
+        "spawn_to_accepting_s": round(accepting, 3),
+        "spawn_to_ready_s": round(ready, 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backend import/startup benchmark")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument(
+        "--server", action="store_true", help="Also time a real uvicorn startup"
+    )
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--timeout", type=float, default=300)
+    args = parser.parse_args()
+
+    results = {"import": bench_import(args.runs)}
+    if args.server:
+        results["server"] = bench_server(args.port, args.timeout)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
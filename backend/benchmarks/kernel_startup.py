@@ -0,0 +1,67 @@
+"""
+Kernel startup benchmark: cold kernel vs. warm pool kernel.
+
+Usage (from backend/):
+    python -m benchmarks.kernel_startup
+"""
+
+import json
+import time
+from jupyter_client import KernelManager as JKManager
+
+from kernel_manager import KernelManager
+
+# A typical first cell: pandas + plotting + a model
+FIRST_CELL = """
+import pandas as pd
+import plotly.express as px
+from sklearn.ensemble import RandomForestClassifier
+df_bench = pd.DataFrame({'x': range(100), 'y': [i % 2 for i in range(100)]})
+fig = px.scatter(df_bench, x='x', y='y')
+"""
+
+
+def bench_cold() -> dict:
+    start = time.time()
+    km = JKManager(kernel_name="python3")
+    km.start_kernel()
+    kc = km.client()
+    kc.start_channels()
+    kc.wait_for_ready(timeout=60)
+    ready = time.time()
+
+    kc.execute_interactive(FIRST_CELL, timeout=300, output_hook=lambda msg: None)
+    first_cell = time.time()
+
+    kc.stop_channels()
+    km.shutdown_kernel(now=True)
+    return {
+        "session_start_s": round(ready - start, 3),
+        "first_cell_s": round(first_cell - ready, 3),
+    }
+
+
+def bench_warm() -> dict:
+    kernel = KernelManager()
+    # Wait until the replacement spare is warm, as it would be between sessions
+    while kernel.pool._ready.empty():
+        time.sleep(0.1)
+
+    start = time.time()
+    kernel.restart()
+    ready = time.time()
+
+    kernel.execute(FIRST_CELL, timeout=300, record=False)
+    first_cell = time.time()
+
+    kernel.shutdown()
+    KernelManager.shutdown_pool()
+    return {
+        "session_start_s": round(ready - start, 3),
+        "first_cell_s": round(first_cell - ready, 3),
+    }
+
+
+if __name__ == "__main__":
+    results = {"cold": bench_cold(), "warm": bench_warm()}
+    print(json.dumps(results, indent=2))
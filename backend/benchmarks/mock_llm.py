@@ -0,0 +1,204 @@
+"""
+Local OpenAI-compatible stub for offline benchmarks (chat completions + embeddings).
+
+Usage (from backend/):
+    python -m benchmarks.mock_llm --port 8900 --ttft 0.3 --tokens-per-second 80
+
+Point the backend at it with
+    AUTODS_LLM_BASE_URL=http://127.0.0.1:8900/v1/openai
+
+Answers are scripted: the first match of a `--script` JSON file
+([{"match": "<substring of the last user message>", "response": "..."}]) wins,
+otherwise the built-in answers are used (a plotting code block for a new prompt,
+a corrected block after a failure, a short analysis after a successful run).
+"""
+
+import json
+import time
+import uuid
+import asyncio
+import hashlib
+import argparse
+from typing import List, Dict, Any
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+
+ANSWER = """I'll look at the distribution of the first numeric column.
+
+```python
+numeric = df.select_dtypes("number").columns
+col = numeric[0] if len(numeric) else df.columns[0]
+print(df[col].describe())
+fig = px.histogram(df, x=col, title=f"Distribution of {col}")
+```
+"""
+
+FIX = """The column reference was wrong, using the first column instead.
+
+```python
+col = df.columns[0]
+print(df[col].value_counts().head())
+fig = px.histogram(df, x=col)
+```
+"""
+
+ANALYSIS = (
+    "The summary above shows the spread of the column: the mean sits close to the "
+    "median, so the distribution is roughly symmetric with a few outliers in the tail."
+)
+
+DEFAULT_SCRIPT = [
+    {"match": "STOP. The code failed", "response": FIX},
+    {"match": "The code executed successfully", "response": ANALYSIS},
+    {"match": "", "response": ANSWER},
+]
+
+
+def _tokens(text: str) -> List[str]:
+    """Roughly 4 characters per token, like the real tokenizer on English/code."""
+    return [text[i : i + 4] for i in range(0, len(text), 4)]
+
+
+def _embedding(text: str, dimensions: int) -> List[float]:
+    """Deterministic pseudo-embedding (same text -> same vector)."""
+    seed = hashlib.sha256(text.encode("utf-8")).digest()
+    return [(seed[i % len(seed)] - 128) / 128.0 for i in range(dimensions)]
+
+
+def create_app(
+    ttft: float = 0.3,
+    tokens_per_second: float = 80.0,
+    embedding_latency: float = 0.05,
+    dimensions: int = 2560,
+    script: List[Dict[str, str]] = None,
+) -> FastAPI:
+    app = FastAPI(title="AutoDS mock LLM")
+    script = (script or []) + DEFAULT_SCRIPT
+    stats = {"chat_requests": 0, "embedding_requests": 0, "tokens": 0}
+
+    def pick_answer(messages: List[Dict[str, Any]]) -> str:
+        last_user = next(
+            (m["content"] for m in reversed(messages) if m["role"] == "user"), ""
+        )
+        for entry in script:
+            if entry["match"] in last_user:
+                return entry["response"]
+        return ANSWER
+
+    async def stream(answer: str, model: str):
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+        created = int(time.time())
+        await asyncio.sleep(ttft)
+        for token in _tokens(answer):
+            chunk = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model,
+                "choices": [
+                    {"index": 0, "delta": {"content": token}, "finish_reason": None}
+                ],
+            }
+            yield f"data: {json.dumps(chunk)}\n\n"
+            stats["tokens"] += 1
+            if tokens_per_second > 0:
+                await asyncio.sleep(1.0 / tokens_per_second)
+        final = {
+            "id": completion_id,
+            "object": "chat.completion.chunk",
+            "created": created,
+            "model": model,
+            "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}],
+        }
+        yield f"data: {json.dumps(final)}\n\n"
+        yield "data: [DONE]\n\n"
+
+    @app.post("/v1/openai/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        stats["chat_requests"] += 1
+        answer = pick_answer(body.get("messages", []))
+        model = body.get("model", "mock")
+
+        if body.get("stream"):
+            return StreamingResponse(
+                stream(answer, model), media_type="text/event-stream"
+            )
+
+        await asyncio.sleep(ttft + len(_tokens(answer)) / max(tokens_per_second, 1e-9))
+        return {
+            "id": f"chatcmpl-{uuid.uuid4().hex[:12]}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [
+                {
+                    "index": 0,
+                    "message": {"role": "assistant", "content": answer},
+                    "finish_reason": "stop",
+                }
+            ],
+            "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+        }
+
+    @app.post("/v1/openai/embeddings")
+    async def embeddings(request: Request):
+        body = await request.json()
+        stats["embedding_requests"] += 1
+        inputs = body.get("input", "")
+        if isinstance(inputs, str):
+            inputs = [inputs]
+        await asyncio.sleep(embedding_latency)
+        return {
+            "object": "list",
+            "data": [
+                {
+                    "object": "embedding",
+                    "index": i,
+                    "embedding": _embedding(text, dimensions),
+                }
+                for i, text in enumerate(inputs)
+            ],
+            "model": body.get("model", "mock"),
+            "usage": {"prompt_tokens": 0, "total_tokens": 0},
+        }
+
+    @app.get("/stats")
+    def get_stats():
+        return stats
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="OpenAI-compatible mock server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument(
+        "--ttft", type=float, default=0.3, help="Seconds to first token"
+    )
+    parser.add_argument("--tokens-per-second", type=float, default=80.0)
+    parser.add_argument("--embedding-latency", type=float, default=0.05)
+    parser.add_argument("--dimensions", type=int, default=2560)
+    parser.add_argument("--script", help="JSON file of scripted answers")
+    args = parser.parse_args()
+
+    script = None
+    if args.script:
+        with open(args.script, "r", encoding="utf-8") as f:
+            script = json.load(f)
+
+    app = create_app(
+        ttft=args.ttft,
+        tokens_per_second=args.tokens_per_second,
+        embedding_latency=args.embedding_latency,
+        dimensions=args.dimensions,
+        script=script,
+    )
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
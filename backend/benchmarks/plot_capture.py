@@ -0,0 +1,68 @@
+"""
+Per-cell overhead of plot capture: legacy appended source vs. post_run_cell hook.
+
+Usage (from backend/):
+    python -m benchmarks.plot_capture [n_cells]
+"""
+
+import sys
+import json
+import time
+
+from kernel_manager import KernelManager
+
+# The capture source that used to be appended to every cell
+LEGACY_PLOT_CATCHER = """
+import json
+import base64
+import io
+import matplotlib.pyplot as plt
+
+# Check for Plotly 'fig'
+if 'fig' in locals() and hasattr(fig, 'to_json'):
+    print("PLOT_JSON_START")
+    print(fig.to_json())
+    print("PLOT_JSON_END")
+
+# Check for Matplotlib
+elif plt.get_fignums():
+    try:
+        buf = io.BytesIO()
+        plt.savefig(buf, format='png', bbox_inches='tight')
+        buf.seek(0)
+        img_str = base64.b64encode(buf.read()).decode('utf-8')
+        print("PLOT_IMG_START")
+        print(img_str)
+        print("PLOT_IMG_END")
+        plt.clf()
+    except Exception as e:
+        print(f"Plot Save Error: {e}")
+"""
+
+# A figure left over from an earlier cell (legacy re-emits it every time)
+SETUP = "import plotly.express as px\nfig = px.scatter(x=list(range(1000)), y=list(range(1000)))"
+CELL = "x = 1"
+
+
+def bench(kernel: KernelManager, code: str, n_cells: int) -> dict:
+    start = time.time()
+    plots = 0
+    for _ in range(n_cells):
+        result = kernel.execute(code, record=False)
+        plots += result["plot"] is not None
+    elapsed = time.time() - start
+    return {"ms_per_cell": round(elapsed / n_cells * 1000, 2), "plots_emitted": plots}
+
+
+if __name__ == "__main__":
+    n_cells = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    kernel = KernelManager()
+    kernel.execute(SETUP, record=False)
+
+    results = {
+        "legacy": bench(kernel, CELL + "\n" + LEGACY_PLOT_CATCHER, n_cells),
+        "hook": bench(kernel, CELL, n_cells),
+    }
+    kernel.shutdown()
+    KernelManager.shutdown_pool()
+    print(json.dumps(results, indent=2))
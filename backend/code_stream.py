@@ -0,0 +1,69 @@
+from typing import List
+
+OPEN_FENCE = "```python"
+CLOSE_FENCE = "```"
+
+
+class CodeFenceParser:
+    """
+    Incremental parser for ```python blocks in a streamed LLM response.
+    feed() returns every block whose closing fence has arrived, so it can run while
+    the model keeps writing. Over the whole text it finds exactly what
+    re.findall(r"```python\\s*(.*?)\\s*```", text, re.DOTALL) finds.
+    """
+
+    def __init__(self):
+        self.text = ""
+        self.blocks: List[str] = []
+        self.starts: List[int] = []  # Offset just after each block's opening fence
+        self.ends: List[int] = []  # Offset just after each block's closing fence
+        self._pos = 0
+
+    def feed(self, chunk: str) -> List[str]:
+        self.text += chunk
+        new_blocks = []
+        while True:
+            start = self.text.find(OPEN_FENCE, self._pos)
+            if start == -1:
+                # The opening fence may still be arriving, re-scan its possible start
+                self._pos = max(self._pos, len(self.text) - len(OPEN_FENCE) + 1)
+                break
+            body = start + len(OPEN_FENCE)
+            end = self.text.find(CLOSE_FENCE, body)
+            if end == -1:
+                self._pos = start
+                break
+
+            code = self.text[body:end].strip()
+            self._pos = end + len(CLOSE_FENCE)
+            self.blocks.append(code)
+            self.starts.append(body)
+            self.ends.append(self._pos)
+            new_blocks.append(code)
+        return new_blocks
+
+    def replace_block(self, index: int, code: str):
+        """Rewrites the code of a completed block (e.g. after a pre-flight fix)."""
+        body = self.starts[index]
+        close = self.ends[index] - len(CLOSE_FENCE)
+        new_body = f"\n{code}\n"
+        self.text = self.text[:body] + new_body + self.text[close:]
+        shift = len(new_body) - (close - body)
+        self.blocks[index] = code
+        self.ends[index] += shift
+        for i in range(index + 1, len(self.blocks)):
+            self.starts[i] += shift
+            self.ends[i] += shift
+        self._pos += shift
+
+
+def interleave(text: str, ends: List[int], outputs: List[str]) -> str:
+    """Inserts outputs[i] right after the i-th code block of `text`."""
+    parts = []
+    last = 0
+    for end, output in zip(ends, outputs):
+        parts.append(text[last:end])
+        parts.append(output)
+        last = end
+    parts.append(text[last:])
+    return "".join(parts)
@@ -0,0 +1,214 @@
+"""
+Production serving mode: N uvicorn worker processes behind a sticky session router.
+
+Usage (from backend/):
+    python coordinator.py --workers 4 --port 8000
+
+Every request carrying a session id (query `session_id`, header `X-Session-Id`) is
+routed to the worker owning that session (crc32(session_id) % N), so a session's
+kernel, DB connections and history always live in one process. The mapping is a
+pure function of the session id: no shared store, and a crashed worker is restarted
+on the same port so its sessions keep routing there. A WebSocket without a session
+id is given a new one here, before routing. Worker 0 also runs the job dispatcher;
+the other workers follow job changes in the job database.
+"""
+
+import os
+import sys
+import zlib
+import uuid
+import asyncio
+import argparse
+import subprocess
+from typing import List
+from urllib.parse import urlencode
+
+import httpx
+import uvicorn
+import websockets
+from fastapi import FastAPI, Request, WebSocket
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
+from starlette.websockets import WebSocketState
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_SESSION = "default"
+
+# Hop-by-hop headers are not forwarded
+HOP_HEADERS = {"connection", "keep-alive", "transfer-encoding", "upgrade", "host"}
+# Close codes that cannot be sent in a close frame, and what is forwarded instead
+RESERVED_CLOSE_CODES = {1005: 1000, 1006: 1011, 1015: 1011}
+
+
+class WorkerPool:
+    """Spawns and supervises the uvicorn worker processes."""
+
+    def __init__(self, n_workers: int, base_port: int):
+        self.ports = [base_port + i for i in range(n_workers)]
+        self.processes: List[subprocess.Popen] = [None] * n_workers
+
+    def _spawn(self, index: int):
+        env = dict(os.environ)
+        env["AUTODS_WORKER_ID"] = str(index)
+        env["AUTODS_RUN_JOBS"] = "1" if index == 0 else "0"
+        owner = self.route(DEFAULT_SESSION) == self.ports[index]
+        env["AUTODS_OWNS_DEFAULT_SESSION"] = "1" if owner else "0"
+        self.processes[index] = subprocess.Popen(
+            [
+                sys.executable,
+                "-m",
+                "uvicorn",
+                "main:app",
+                "--host",
+                "127.0.0.1",
+                "--port",
+                str(self.ports[index]),
+            ],
+            cwd=BASE_DIR,
+            env=env,
+        )
+
+    def start(self):
+        for i in range(len(self.ports)):
+            self._spawn(i)
+
+    async def supervise(self, interval: float = 2.0):
+        while True:
+            await asyncio.sleep(interval)
+            for i, proc in enumerate(self.processes):
+                if proc is not None and proc.poll() is not None:
+                    print(f"Worker {i} exited ({proc.returncode}). Restarting...")
+                    self._spawn(i)
+
+    def stop(self):
+        for proc in self.processes:
+            if proc is not None and proc.poll() is None:
+                proc.terminate()
+        for proc in self.processes:
+            if proc is not None:
+                proc.wait(timeout=10)
+
+    def route(self, session_id: str) -> int:
+        return self.ports[zlib.crc32(session_id.encode("utf-8")) % len(self.ports)]
+
+
+def create_app(workers: WorkerPool) -> FastAPI:
+    app = FastAPI(title="AutoDS Coordinator")
+    client = httpx.AsyncClient(timeout=None)
+
+    def session_id_of(conn) -> str:
+        return (
+            conn.query_params.get("session_id")
+            or conn.headers.get("x-session-id")
+            or DEFAULT_SESSION
+        )
+
+    @app.on_event("startup")
+    async def startup():
+        workers.start()
+        app.state.supervisor = asyncio.create_task(workers.supervise())
+
+    @app.on_event("shutdown")
+    async def shutdown():
+        app.state.supervisor.cancel()
+        await client.aclose()
+        workers.stop()
+
+    @app.websocket("/{path:path}")
+    async def proxy_websocket(websocket: WebSocket, path: str):
+        # A WebSocket without session_id gets a fresh session. Its id is minted here,
+        # so later requests carrying it are routed to the worker that holds it.
+        params = dict(websocket.query_params)
+        params["session_id"] = params.get("session_id") or uuid.uuid4().hex
+        port = workers.route(params["session_id"])
+        url = f"ws://127.0.0.1:{port}/{path}?{urlencode(params)}"
+
+        await websocket.accept()
+        async with websockets.connect(url, max_size=None) as upstream:
+
+            async def client_to_worker():
+                while True:
+                    message = await websocket.receive()
+                    if message["type"] == "websocket.disconnect":
+                        code = message.get("code", 1000)
+                        await upstream.close(code=RESERVED_CLOSE_CODES.get(code, code))
+                        return
+                    if message.get("bytes") is not None:
+                        await upstream.send(message["bytes"])
+                    else:
+                        await upstream.send(message["text"])
+
+            async def worker_to_client():
+                try:
+                    async for message in upstream:
+                        if isinstance(message, bytes):
+                            await websocket.send_bytes(message)
+                        else:
+                            await websocket.send_text(message)
+                except websockets.ConnectionClosed:
+                    pass
+                if websocket.client_state == WebSocketState.DISCONNECTED:
+                    return  # The client closed first
+                # The worker's close code (e.g. 1013 at the session limit) is kept
+                code = upstream.close_code or 1000
+                await websocket.close(
+                    code=RESERVED_CLOSE_CODES.get(code, code),
+                    reason=upstream.close_reason or "",
+                )
+
+            tasks = [
+                asyncio.create_task(client_to_worker()),
+                asyncio.create_task(worker_to_client()),
+            ]
+            # Either side closing ends the session proxy
+            _, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+            for task in pending:
+                task.cancel()
+
+    @app.api_route(
+        "/{path:path}",
+        methods=["GET", "POST", "PUT", "PATCH", "DELETE", "OPTIONS", "HEAD"],
+    )
+    async def proxy_http(request: Request, path: str):
+        port = workers.route(session_id_of(request))
+        upstream_request = client.build_request(
+            request.method,
+            f"http://127.0.0.1:{port}{request.url.path}",
+            params=request.query_params,
+            headers=[
+                (k, v)
+                for k, v in request.headers.items()
+                if k.lower() not in HOP_HEADERS
+            ],
+            content=request.stream(),
+        )
+        response = await client.send(upstream_request, stream=True)
+        return StreamingResponse(
+            response.aiter_raw(),
+            status_code=response.status_code,
+            headers={
+                k: v
+                for k, v in response.headers.items()
+                if k.lower() not in HOP_HEADERS
+            },
+            background=BackgroundTask(response.aclose),
+        )
+
+    return app
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="AutoDS multi-worker server")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument(
+        "--worker-base-port",
+        type=int,
+        default=8100,
+        help="Workers listen on base, base+1, ... (localhost only)",
+    )
+    args = parser.parse_args()
+
+    pool = WorkerPool(args.workers, args.worker_base_port)
+    uvicorn.run(create_app(pool), host=args.host, port=args.port)
@@ -0,0 +1,480 @@
+import os
+import re
+import json
+import warnings
+import importlib.util
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import TYPE_CHECKING, Dict, Any, List, Tuple
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+# pandas/numpy/polars are imported on first use, this module is on the startup path.
+
+# Rows read up-front to infer compact dtypes for string columns.
+SAMPLE_ROWS = 10_000
+# Object columns with at most this share of unique values become categoricals.
+CATEGORY_MAX_UNIQUE_RATIO = 0.5
+
+
+def excel_engine() -> str:
+    """Fastest installed Excel reader: calamine (Rust) if available, else openpyxl."""
+    engine = os.getenv("AUTODS_EXCEL_ENGINE")
+    if engine:
+        return engine
+    return "calamine" if importlib.util.find_spec("python_calamine") else "openpyxl"
+
+
+def _parse_sheet(
+    file_path: str, sheet: str, engine: str, parquet_path: str, optimize: bool
+) -> Dict[str, Any]:
+    """
+    Parses one worksheet into a Parquet file and returns its summary.
+    Runs in a worker process (see DatasetLoader._parse_workbook).
+    """
+    import pandas as pd
+
+    df = pd.read_excel(file_path, sheet_name=sheet, engine=engine)
+    df.columns = [str(col) for col in df.columns]
+    before = int(df.memory_usage(deep=True).sum())
+
+    if optimize:
+        loader = DatasetLoader()
+        string_dtypes, parse_dates = loader._infer_string_dtypes(df.head(SAMPLE_ROWS))
+        df = df.astype(string_dtypes)
+        for col in parse_dates:
+            df[col] = pd.to_datetime(df[col], errors="coerce")
+        df = df.astype(loader._downcast_numeric(df))
+
+    try:
+        df.to_parquet(parquet_path, index=False)
+    except (ValueError, TypeError):
+        # Mixed-type object columns have no Parquet type, store them as strings
+        for col in df.select_dtypes(include="object").columns:
+            df[col] = df[col].astype("string")
+        df.to_parquet(parquet_path, index=False)
+
+    after = int(df.memory_usage(deep=True).sum())
+    head_df = df.head(5).astype(object).where(pd.notnull(df.head(5)), None)
+    return {
+        "sheet": sheet,
+        "path": parquet_path,
+        "columns": list(df.columns),
+        "dtypes": {col: str(dtype) for col, dtype in df.dtypes.items()},
+        "shape": df.shape,
+        "head": head_df.to_dict(orient="records"),
+        "missing_values": {k: int(v) for k, v in df.isnull().sum().items()},
+        "memory": {
+            "before_mb": round(before / 1024**2, 2),
+            "after_mb": round(after / 1024**2, 2),
+            "reduction": round(before / after, 2) if after else None,
+        },
+    }
+
+
+class DatasetLoader:
+    """
+    Decides how an uploaded dataset is loaded into the kernel and builds the
+    host-side summary used for the LLM context.
+    Small files are loaded eagerly as a pandas DataFrame, large CSVs are converted
+    to Parquet once and exposed to the kernel as a Polars LazyFrame (out-of-core).
+    Excel workbooks are parsed sheet by sheet on a process pool into Parquet, and
+    every sheet becomes its own kernel DataFrame.
+    """
+
+    def __init__(self):
+        base_dir = os.path.dirname(os.path.abspath(__file__))
+        self.parquet_dir = os.path.join(base_dir, "cache", "parquet")
+
+        # Size (MB) above which CSV uploads are handled out-of-core.
+        threshold_mb = float(os.getenv("AUTODS_OUT_OF_CORE_MB", "1024"))
+        self.out_of_core_threshold = int(threshold_mb * 1024 * 1024)
+        self.optimize_dtypes = os.getenv("AUTODS_OPTIMIZE_DTYPES", "1") == "1"
+
+        # Workbooks from this size (MB) are parsed on a process pool, one sheet per
+        # worker (smaller ones are not worth the worker start-up).
+        parallel_mb = float(os.getenv("AUTODS_EXCEL_PARALLEL_MB", "2"))
+        self.excel_parallel_threshold = int(parallel_mb * 1024 * 1024)
+        self.excel_workers = int(os.getenv("AUTODS_EXCEL_WORKERS", os.cpu_count() or 1))
+
+    def is_out_of_core(self, file_path: str) -> bool:
+        """Returns True if the file should be loaded as a lazy frame."""
+        if not file_path.endswith(".csv"):
+            return False
+        return os.path.getsize(file_path) >= self.out_of_core_threshold
+
+    def load(self, file_path: str, digest: str = None) -> Dict[str, Any]:
+        """
+        Returns the kernel load command plus a summary of the dataset.
+        Keys: mode, load_cmd, columns, dtypes, shape, head, missing_values, memory.
+        `digest` is the sha256 of the file (computed when needed if omitted); the
+        Parquet copies the kernel reads are named after it.
+        """
+        if self.is_out_of_core(file_path):
+            return self._load_lazy(file_path, digest)
+        if file_path.endswith(".xlsx"):
+            return self._load_excel(file_path, digest)
+        return self._load_eager(file_path)
+
+    def settings_key(self) -> str:
+        """Settings that change what load() returns; stored analyses are keyed by it."""
+        return (
+            f"optimize_dtypes={self.optimize_dtypes};"
+            f"out_of_core={self.out_of_core_threshold}"
+        )
+
+    def _digest(self, file_path: str, digest: str = None) -> str:
+        if digest:
+            return digest
+        from file_catalog import file_hash
+
+        return file_hash(file_path)
+
+    def rebase(self, loaded: Dict[str, Any], file_path: str) -> Dict[str, Any]:
+        """
+        Reuses a stored load() result (plus the "path" it was made for) of identical
+        content for another path. None when it no longer applies (Parquet removed).
+        """
+        loaded = {**loaded, "shape": tuple(loaded["shape"])}
+        # Lazy frames and workbook sheets are read from Parquet copies named after
+        # the content hash, so they can be shared by every copy of the content
+        parquet_paths = re.findall(r"r'([^']*\.parquet)'", loaded["load_cmd"])
+        if not all(os.path.exists(path) for path in parquet_paths):
+            return None
+        if parquet_paths:
+            return loaded
+        loaded["load_cmd"] = loaded["load_cmd"].replace(
+            f"r'{loaded['path']}'", f"r'{file_path}'"
+        )
+        return loaded
+
+    def _load_eager(self, file_path: str) -> Dict[str, Any]:
+        import pandas as pd
+
+        if not file_path.endswith(".csv"):
+            return {"error": "Unsupported file format"}
+
+        memory = None
+        if self.optimize_dtypes:
+            df, load_cmd, memory = self._load_optimized(file_path)
+        else:
+            df = pd.read_csv(file_path)
+            load_cmd = f"import pandas as pd\ndf = pd.read_csv(r'{file_path}')"
+
+        head_df = df.head(5).astype(object).where(pd.notnull(df.head(5)), None)
+
+        return {
+            "mode": "eager",
+            "load_cmd": load_cmd,
+            "columns": list(df.columns),
+            "dtypes": {col: str(dtype) for col, dtype in df.dtypes.items()},
+            "shape": df.shape,
+            "head": head_df.to_dict(orient="records"),
+            "missing_values": df.isnull().sum().to_dict(),
+            "memory": memory,
+        }
+
+    # --- DTYPE OPTIMIZATION ---
+
+    def _load_optimized(self, file_path: str):
+        """
+        Loads the CSV with compact dtypes and returns (df, load_cmd, memory report).
+        String dtypes are inferred from a sample and applied at read time,
+        numeric widths are downcast losslessly from the full data.
+        """
+        import pandas as pd
+
+        sample = pd.read_csv(file_path, nrows=SAMPLE_ROWS)
+        string_dtypes, parse_dates = self._infer_string_dtypes(sample)
+
+        df = pd.read_csv(file_path, dtype=string_dtypes, parse_dates=parse_dates)
+
+        # Drop date candidates that the full file could not parse
+        parse_dates = [
+            col for col in parse_dates if pd.api.types.is_datetime64_any_dtype(df[col])
+        ]
+
+        numeric_dtypes = self._downcast_numeric(df)
+        df = df.astype(numeric_dtypes)
+        dtypes = {**string_dtypes, **numeric_dtypes}
+
+        load_cmd = (
+            "import pandas as pd\n"
+            f"df = pd.read_csv(r'{file_path}', dtype={dtypes!r}, parse_dates={parse_dates!r})"
+        )
+
+        # Default-dtype footprint is extrapolated from the sample (never fully loaded)
+        sample_bytes = sample.memory_usage(deep=True).sum()
+        before = int(sample_bytes / max(len(sample), 1) * len(df))
+        after = int(df.memory_usage(deep=True).sum())
+        memory = {
+            "before_mb": round(before / 1024**2, 2),
+            "after_mb": round(after / 1024**2, 2),
+            "reduction": round(before / after, 2) if after else None,
+        }
+        print(
+            f"Dtype optimization: {memory['before_mb']} MB -> {memory['after_mb']} MB"
+        )
+
+        return df, load_cmd, memory
+
+    def _infer_string_dtypes(
+        self, sample: "pd.DataFrame"
+    ) -> Tuple[Dict[str, str], List[str]]:
+        """Classifies object columns as datetime, categorical or (Arrow) string."""
+        string_dtype = (
+            "string[pyarrow]" if importlib.util.find_spec("pyarrow") else "string"
+        )
+        dtypes, parse_dates = {}, []
+
+        for col in sample.columns:
+            if sample[col].dtype != object:
+                continue
+            values = sample[col].dropna()
+            if values.empty:
+                continue
+
+            if self._looks_like_datetime(values):
+                parse_dates.append(col)
+            elif values.nunique() <= len(values) * CATEGORY_MAX_UNIQUE_RATIO:
+                dtypes[col] = "category"
+            else:
+                dtypes[col] = string_dtype
+
+        return dtypes, parse_dates
+
+    def _looks_like_datetime(self, values: "pd.Series") -> bool:
+        import pandas as pd
+
+        as_str = values.astype(str)
+        # Plain numbers parse as dates too, so require a date/time separator
+        if not as_str.str.contains(r"[-/:]").all():
+            return False
+        try:
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore")
+                pd.to_datetime(as_str.head(1000), errors="raise")
+            return True
+        except (ValueError, TypeError, OverflowError):
+            return False
+
+    def _downcast_numeric(self, df: "pd.DataFrame") -> Dict[str, str]:
+        """Returns the smallest lossless dtype for each numeric column."""
+        import numpy as np
+        import pandas as pd
+
+        dtypes = {}
+
+        for col in df.select_dtypes(include="integer").columns:
+            downcast = pd.to_numeric(df[col], downcast="integer")
+            if downcast.dtype != df[col].dtype:
+                dtypes[col] = str(downcast.dtype)
+
+        for col in df.select_dtypes(include="float64").columns:
+            as_float32 = df[col].to_numpy().astype("float32")
+            # Only downcast when no precision is lost
+            if np.array_equal(
+                as_float32.astype("float64"), df[col].to_numpy(), equal_nan=True
+            ):
+                dtypes[col] = "float32"
+
+        return dtypes
+
+    def _load_lazy(self, file_path: str, digest: str = None) -> Dict[str, Any]:
+        import pandas as pd
+        import polars as pl
+
+        parquet_path = self._to_parquet(file_path, self._digest(file_path, digest))
+        lf = pl.scan_parquet(parquet_path)
+
+        schema = lf.collect_schema()
+        columns = list(schema.names())
+        # Row count comes from Parquet metadata, no data is scanned.
+        n_rows = lf.select(pl.len()).collect().item()
+        head_df = lf.head(5).collect().to_pandas()
+        head_df = head_df.astype(object).where(pd.notnull(head_df), None)
+        missing = lf.null_count().collect().row(0, named=True)
+
+        load_cmd = (
+            "import pandas as pd\n"
+            "import polars as pl\n"
+            f"df = pl.scan_parquet(r'{parquet_path}')"
+        )
+
+        return {
+            "mode": "lazy",
+            "load_cmd": load_cmd,
+            "columns": columns,
+            "dtypes": {col: str(dtype) for col, dtype in schema.items()},
+            "shape": (n_rows, len(columns)),
+            "head": head_df.to_dict(orient="records"),
+            "missing_values": missing,
+            "memory": None,
+        }
+
+    def _to_parquet(self, file_path: str, digest: str) -> str:
+        """
+        Streams a CSV into a Parquet file without loading it in memory. The copy is
+        named after the content hash, so each content is converted once.
+        """
+        import polars as pl
+
+        os.makedirs(self.parquet_dir, exist_ok=True)
+        parquet_path = os.path.join(self.parquet_dir, f"{digest}.parquet")
+
+        if not os.path.exists(parquet_path):
+            print(f"Converting {file_path} to Parquet (out-of-core mode)...")
+            # Written aside first: a partial file must never look converted
+            tmp_path = f"{parquet_path}.{os.getpid()}.tmp"
+            pl.scan_csv(file_path).sink_parquet(tmp_path)
+            os.replace(tmp_path, parquet_path)
+
+        return parquet_path
+
+    # --- EXCEL WORKBOOKS ---
+
+    def _load_excel(self, file_path: str, digest: str = None) -> Dict[str, Any]:
+        """
+        Loads every sheet of a workbook: `df` is the first sheet, each sheet is also
+        `df_<sheet>` and `sheets[<name>]`. The kernel reads the Parquet copies.
+        """
+        digest = self._digest(file_path, digest)
+        parsed = self._cached_sheets(digest)
+        if parsed is None:
+            parsed = self._parse_workbook(file_path, digest)
+            if "error" in parsed:
+                return parsed
+        sheets = parsed["sheets"]
+
+        taken = {"df", "sheets"}
+        lines = ["import pandas as pd", "sheets = {"]
+        for sheet in sheets:
+            lines.append(f"    {sheet['sheet']!r}: pd.read_parquet(r'{sheet['path']}'),")
+        lines.append("}")
+        for sheet in sheets:
+            sheet["variable"] = _variable_name(sheet["sheet"], taken)
+            lines.append(f"{sheet['variable']} = sheets[{sheet['sheet']!r}]")
+        lines.append(f"df = {sheets[0]['variable']}")
+
+        first = sheets[0]
+        return {
+            "mode": "eager",
+            "load_cmd": "\n".join(lines),
+            "columns": first["columns"],
+            "dtypes": first["dtypes"],
+            "shape": tuple(first["shape"]),
+            "head": first["head"],
+            "missing_values": first["missing_values"],
+            "memory": first["memory"] if self.optimize_dtypes else None,
+            "sheets": [
+                {
+                    "name": s["sheet"],
+                    "variable": s["variable"],
+                    "shape": tuple(s["shape"]),
+                    "columns": s["columns"],
+                }
+                for s in sheets
+            ],
+        }
+
+    def _sheets_dir(self, digest: str) -> str:
+        """Parquet cache of a workbook, named after its content hash."""
+        return os.path.join(self.parquet_dir, "sheets", digest)
+
+    def _cached_sheets(self, digest: str) -> Dict[str, Any]:
+        """The manifest of a complete Parquet cache of the workbook, or None."""
+        manifest_path = os.path.join(self._sheets_dir(digest), "manifest.json")
+        try:
+            with open(manifest_path, "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if manifest.get("optimize_dtypes") != self.optimize_dtypes:
+            return None
+        if not all(os.path.exists(s["path"]) for s in manifest["sheets"]):
+            return None
+        return manifest
+
+    def _parse_workbook(self, file_path: str, digest: str) -> Dict[str, Any]:
+        """Parses all sheets into Parquet (in parallel for large workbooks)."""
+        import pandas as pd
+
+        engine = excel_engine()
+        with pd.ExcelFile(file_path, engine=engine) as book:
+            sheet_names = list(book.sheet_names)
+        if not sheet_names:
+            return {"error": "Workbook has no sheets"}
+
+        # Shared by every copy of the content (stored analyses point here too)
+        sheets_dir = self._sheets_dir(digest)
+        os.makedirs(sheets_dir, exist_ok=True)
+
+        jobs = [
+            (
+                file_path,
+                sheet,
+                engine,
+                os.path.join(sheets_dir, f"{i}.parquet"),
+                self.optimize_dtypes,
+            )
+            for i, sheet in enumerate(sheet_names)
+        ]
+        workers = min(len(jobs), self.excel_workers)
+        if os.path.getsize(file_path) < self.excel_parallel_threshold:
+            workers = 1
+
+        print(f"Parsing {len(jobs)} sheet(s) of {file_path} ({engine}, {workers} proc)")
+        if workers > 1:
+            # spawn: forking a threaded server process is not safe
+            with ProcessPoolExecutor(
+                max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+            ) as pool:
+                sheets = list(pool.map(_parse_sheet, *zip(*jobs)))
+        else:
+            sheets = [_parse_sheet(*job) for job in jobs]
+
+        manifest = {"optimize_dtypes": self.optimize_dtypes, "sheets": sheets}
+        manifest_path = os.path.join(sheets_dir, "manifest.json")
+        with open(manifest_path + ".tmp", "w") as f:
+            json.dump(manifest, f, default=str)
+        os.replace(manifest_path + ".tmp", manifest_path)
+        return json.loads(json.dumps(manifest, default=str))
+
+    def preview_excel(
+        self, file_path: str, rows: int = 100, sheet: str = None, digest: str = None
+    ) -> Tuple["pd.DataFrame", List[str]]:
+        """
+        First rows of a sheet plus the sheet names. Served from the Parquet cache
+        when the workbook was loaded, otherwise only `rows` rows are parsed.
+        """
+        import pandas as pd
+
+        manifest = self._cached_sheets(self._digest(file_path, digest))
+        if manifest is not None:
+            import pyarrow.parquet as pq
+
+            names = [s["sheet"] for s in manifest["sheets"]]
+            index = names.index(sheet) if sheet in names else 0
+            path = manifest["sheets"][index]["path"]
+            batch = next(pq.ParquetFile(path).iter_batches(batch_size=rows), None)
+            df = batch.to_pandas() if batch is not None else pd.read_parquet(path)
+            return df, names
+
+        engine = excel_engine()
+        with pd.ExcelFile(file_path, engine=engine) as book:
+            names = list(book.sheet_names)
+            df = book.parse(sheet if sheet in names else 0, nrows=rows)
+        return df, names
+
+
+def _variable_name(sheet: str, taken: set) -> str:
+    """A unique kernel variable name for a sheet: 'Q1 Sales' -> df_q1_sales."""
+    slug = re.sub(r"\W+", "_", sheet.lower()).strip("_") or "sheet"
+    name = f"df_{slug}"
+    suffix = 2
+    while name in taken:
+        name = f"df_{slug}_{suffix}"
+        suffix += 1
+    taken.add(name)
+    return name
@@ -1,6 +1,8 @@
-from sqlalchemy import create_engine, text, inspect
 from typing import Dict, List, Any
-import pandas as pd
+
+import tracing
+
+# sqlalchemy and pandas are imported on first use (not needed until a DB is connected)
 
 
 class DatabaseManager:
@@ -33,11 +35,14 @@ class DatabaseManager:
                 return {"error": f"Unsupported database type: {db_type}"}
 
             # Create Engine
+            from sqlalchemy import create_engine, text
+
             self.engine = create_engine(uri)
 
             # Test Connection
-            with self.engine.connect() as conn:
-                conn.execute(text("SELECT 1"))
+            with tracing.span("db.connect", db_type=db_type):
+                with self.engine.connect() as conn:
+                    conn.execute(text("SELECT 1"))
 
             self.active_connection_str = f"{db_type}://{host}/{database}"
             return {"status": "success", "message": f"Connected to {database}"}
@@ -54,11 +59,14 @@ class DatabaseManager:
             return {"error": "No active database connection"}
 
         try:
-            inspector = inspect(self.engine)
-            schema_info = {}
-            for table_name in inspector.get_table_names():
-                columns = [col["name"] for col in inspector.get_columns(table_name)]
-                schema_info[table_name] = columns
+            from sqlalchemy import inspect
+
+            with tracing.span("db.schema"):
+                inspector = inspect(self.engine)
+                schema_info = {}
+                for table_name in inspector.get_table_names():
+                    columns = [col["name"] for col in inspector.get_columns(table_name)]
+                    schema_info[table_name] = columns
             return schema_info
         except Exception as e:
             return {"error": str(e)}
@@ -76,8 +84,12 @@ class DatabaseManager:
             return {"error": "Safety Restriction: Only SELECT queries are allowed."}
 
         try:
+            import pandas as pd
+
             # Use pandas for easy reading
-            df = pd.read_sql(query, self.engine)
+            with tracing.span("db.query") as span:
+                df = pd.read_sql(query, self.engine)
+                span["rows"] = len(df)
 
             # Sanitize for JSON
             df = df.where(pd.notnull(df), None)
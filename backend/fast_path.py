@@ -0,0 +1,257 @@
+"""
+Deterministic fast path for simple data questions ("how many rows", "show columns",
+"null counts per column", "mean of price", ...).
+
+A prompt that matches one of the intents below in full is answered without the LLM:
+from the cached upload schema while `df` is unchanged, otherwise by one vectorized
+template run in the kernel (pandas, or Polars expressions in out-of-core mode).
+Anything else, including longer prompts that merely mention these words, goes to
+the LLM.
+"""
+
+import re
+from typing import Dict, Any, List, Optional
+
+MAX_PREVIEW_ROWS = 100
+
+_PREFIX = (
+    r"(?:(?:please|pls|hey|ok|so|can you|could you|would you|show(?: me)?|tell me|"
+    r"give me|list|display|print|get|find|what(?:'s| is| are)|which are)\s+)*"
+)
+_SUFFIX = (
+    r"(?:\s+(?:in|of|for|from)\s+(?:the\s+|this\s+|my\s+)?"
+    r"(?:data(?:set|frame)?|df|table|file))?\s*(?:please)?\s*[?.!]*"
+)
+_COUNT = r"(?:how many|the number of|number of|count of|total number of|count)\s+"
+_AGGREGATES = {
+    "average": "mean",
+    "mean": "mean",
+    "median": "median",
+    "sum": "sum",
+    "total": "sum",
+    "max": "max",
+    "maximum": "max",
+    "min": "min",
+    "minimum": "min",
+    "std": "std",
+    "standard deviation": "std",
+}
+
+INTENTS = [
+    (
+        "row_count",
+        _COUNT + r"(?:rows|records|entries|observations|samples)"
+        r"(?: are there| do we have)?|(?:the\s+)?row count",
+    ),
+    (
+        "column_count",
+        _COUNT + r"(?:columns|features|fields|variables)(?: are there| do we have)?"
+        r"|(?:the\s+)?column count",
+    ),
+    ("shape", r"(?:the\s+)?(?:shape|dimensions|size)"),
+    (
+        "columns",
+        r"(?:the\s+|all\s+)?(?:columns|column names|features|fields)"
+        r"|what columns (?:are there|do we have|exist)",
+    ),
+    ("dtypes", r"(?:the\s+)?(?:data ?types|dtypes|column types|schema)"),
+    (
+        "null_counts",
+        r"(?:the\s+)?(?:" + _COUNT + r")?(?:null|missing|nan|na|empty)(?: values?)?"
+        r"(?: counts?)?(?: (?:per|by|in each|for each|in every) column)?",
+    ),
+    (
+        "head",
+        r"(?:the\s+)?(?:head|preview|sample rows|(?:first|top)(?: (?P<n>\d+))? rows)",
+    ),
+    ("tail", r"(?:the\s+)?(?:tail|(?:last|bottom)(?: (?P<n>\d+))? rows)"),
+    (
+        "describe",
+        r"describe(?: the)?(?: data(?:set)?)?"
+        r"|(?:the\s+)?(?:summary|descriptive|basic) (?:statistics|stats)",
+    ),
+    ("duplicates", r"(?:" + _COUNT + r")?duplicated? rows"),
+    (
+        "unique_count",
+        r"(?:" + _COUNT + r")?(?:unique|distinct) values (?:in|of|for) "
+        r"(?:the\s+)?(?:column\s+)?(?P<col>.+?)(?: column)?",
+    ),
+    (
+        "value_counts",
+        r"(?:the\s+)?(?:value counts|frequencies|frequency) (?:of|for|in) "
+        r"(?:the\s+)?(?:column\s+)?(?P<col>.+?)(?: column)?",
+    ),
+    (
+        "aggregate",
+        r"(?:the\s+)?(?P<agg>" + "|".join(sorted(_AGGREGATES, key=len, reverse=True))
+        + r")(?: value)?(?: of| for| in)? (?:the\s+)?(?:column\s+)?(?P<col>.+?)"
+        r"(?: column)?",
+    ),
+]
+
+_COMPILED = [
+    (name, re.compile(_PREFIX + r"(?:" + body + r")" + _SUFFIX, re.IGNORECASE))
+    for name, body in INTENTS
+]
+
+# Intents answerable from the upload schema as long as `df` was not modified
+SCHEMA_INTENTS = (
+    "row_count",
+    "column_count",
+    "shape",
+    "columns",
+    "dtypes",
+    "null_counts",
+)
+
+
+def _normalize(name: str) -> str:
+    return re.sub(r"[\s_\-]+", " ", str(name)).strip(" '\"`").lower()
+
+
+class FastPathEngine:
+    """Matches simple questions to templates and counts the turns it short-circuits."""
+
+    def __init__(self):
+        self.stats = {"turns": 0, "short_circuited": 0, "by_intent": {}}
+
+    def match(self, prompt: str, columns: List[str]) -> Optional[Dict[str, Any]]:
+        """Returns {"intent", "column", "agg", "n"} or None (the LLM handles it)."""
+        text = " ".join(prompt.strip().split())
+        if not text or len(text) > 120:
+            return None
+
+        for name, pattern in _COMPILED:
+            m = pattern.fullmatch(text)
+            if not m:
+                continue
+            groups = m.groupdict()
+            intent = {"intent": name, "column": None, "agg": None, "n": 5}
+
+            if groups.get("n"):
+                intent["n"] = max(1, min(int(groups["n"]), MAX_PREVIEW_ROWS))
+            if groups.get("agg"):
+                intent["agg"] = _AGGREGATES[groups["agg"].lower()]
+            if "col" in groups:
+                # Only exact (normalized) column names, fuzzy ones go to the LLM
+                wanted = _normalize(groups["col"])
+                intent["column"] = next(
+                    (c for c in columns if _normalize(c) == wanted), None
+                )
+                if intent["column"] is None:
+                    return None
+            return intent
+        return None
+
+    def count(self, intent: Dict[str, Any]):
+        self.stats["short_circuited"] += 1
+        by_intent = self.stats["by_intent"]
+        by_intent[intent["intent"]] = by_intent.get(intent["intent"], 0) + 1
+
+    # --- ANSWERS ---
+
+    def from_schema(
+        self, intent: Dict[str, Any], schema: Dict[str, Any]
+    ) -> Optional[str]:
+        """Answer from the cached upload schema, None if it needs the kernel."""
+        name = intent["intent"]
+        if name not in SCHEMA_INTENTS:
+            return None
+        rows, cols = schema["shape"]
+        if name == "row_count":
+            return f"{rows:,} rows"
+        if name == "column_count":
+            return f"{cols} columns"
+        if name == "shape":
+            return f"{rows:,} rows x {cols} columns"
+        if name == "columns":
+            return "\n".join(str(c) for c in schema["columns"])
+        if name == "dtypes":
+            width = max(len(str(c)) for c in schema["columns"]) if cols else 0
+            return "\n".join(
+                f"{str(c):<{width}}  {schema['dtypes'].get(c, 'unknown')}"
+                for c in schema["columns"]
+            )
+        if name == "null_counts":
+            missing = schema.get("missing_values")
+            if missing is None:
+                return None
+            width = max(len(str(c)) for c in schema["columns"]) if cols else 0
+            lines = [f"{'column':<{width}}  missing  percent"]
+            for c in schema["columns"]:
+                n = int(missing.get(c, 0) or 0)
+                percent = 100 * n / max(rows, 1)
+                lines.append(f"{str(c):<{width}}  {n:>7,}  {percent:6.2f}%")
+            return "\n".join(lines)
+        return None
+
+    def code(self, intent: Dict[str, Any], lazy: bool) -> str:
+        """Vectorized kernel template (`df`: pandas DataFrame or Polars LazyFrame)."""
+        name = intent["intent"]
+        col = intent["column"]
+        n = intent["n"]
+        agg = intent["agg"]
+
+        if lazy:
+            templates = {
+                "row_count": 'print(f"{df.select(pl.len()).collect().item():,} rows")',
+                "column_count": 'print(f"{len(df.collect_schema())} columns")',
+                "shape": 'print(f"{df.select(pl.len()).collect().item():,} rows x '
+                '{len(df.collect_schema())} columns")',
+                "columns": 'print("\\n".join(df.collect_schema().names()))',
+                "dtypes": 'print("\\n".join(f"{k}: {v}" for k, v in '
+                "df.collect_schema().items()))",
+                "null_counts": "print(df.null_count().collect().transpose("
+                'include_header=True, header_name="column", column_names=["missing"]))',
+                "head": f"print(df.head({n}).collect())",
+                "tail": f"print(df.tail({n}).collect())",
+                "describe": "print(df.describe())",
+                "duplicates": 'print(f"{df.select(pl.len()).collect().item() - '
+                'df.unique().select(pl.len()).collect().item():,} duplicate rows")',
+                "unique_count": f"print(df.select(pl.col({col!r}).n_unique())"
+                ".collect().item())",
+                "value_counts": f"print(df.group_by({col!r}).len()"
+                '.sort("len", descending=True).head(50).collect())',
+                "aggregate": f"print(df.select(pl.col({col!r}).{agg}())"
+                ".collect().item())",
+            }
+        else:
+            templates = {
+                "row_count": 'print(f"{len(df):,} rows")',
+                "column_count": 'print(f"{df.shape[1]} columns")',
+                "shape": 'print(f"{df.shape[0]:,} rows x {df.shape[1]} columns")',
+                "columns": 'print("\\n".join(map(str, df.columns)))',
+                "dtypes": "print(df.dtypes.to_string())",
+                "null_counts": 'print(df.isna().sum().to_frame("missing").assign('
+                'percent=lambda t: (100 * t["missing"] / max(len(df), 1)).round(2))'
+                ".to_string())",
+                "head": f"print(df.head({n}).to_string())",
+                "tail": f"print(df.tail({n}).to_string())",
+                "describe": 'print(df.describe(include="all").T.to_string())',
+                "duplicates": 'print(f"{int(df.duplicated().sum()):,} duplicate rows")',
+                "unique_count": f"print(df[{col!r}].nunique())",
+                "value_counts": f"print(df[{col!r}].value_counts(dropna=False)"
+                ".head(50).to_string())",
+                "aggregate": f"print(df[{col!r}].{agg}())",
+            }
+        return templates[name]
+
+    def describe(self, intent: Dict[str, Any]) -> str:
+        """One-line heading for the answer."""
+        name = intent["intent"]
+        col = intent["column"]
+        return {
+            "row_count": "Row count",
+            "column_count": "Column count",
+            "shape": "Dataset shape",
+            "columns": "Columns",
+            "dtypes": "Column data types",
+            "null_counts": "Missing values per column",
+            "head": f"First {intent['n']} rows",
+            "tail": f"Last {intent['n']} rows",
+            "describe": "Summary statistics",
+            "duplicates": "Duplicate rows",
+            "unique_count": f"Unique values in `{col}`",
+            "value_counts": f"Value counts of `{col}`",
+            "aggregate": f"{(intent['agg'] or '').capitalize()} of `{col}`",
+        }[name]
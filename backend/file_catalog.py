@@ -0,0 +1,365 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import tempfile
+import threading
+from contextlib import closing
+from typing import Dict, Any, List, Optional, Tuple
+
+from model_registry import MODELS_DIR, INDEX_FILE
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+CATALOG_PATH = os.path.join(BASE_DIR, "cache", "catalog.db")
+UPLOADS_DIR = os.path.join(BASE_DIR, "uploads")
+
+# Listing order, and the order in which a download name is resolved
+CATEGORIES = ("dataset", "model", "notebook", "eda")
+
+# Directories mirrored into the index: category -> (directory, extensions or None)
+SCANNED_DIRS = {
+    "dataset": (UPLOADS_DIR, None),
+    "model": (MODELS_DIR, (".pkl",)),  # Legacy pickles saved before the registry
+    "notebook": (BASE_DIR, (".ipynb",)),
+    "eda": (os.path.join(BASE_DIR, "cache", "eda"), None),
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    category TEXT NOT NULL,
+    name TEXT NOT NULL,
+    type TEXT NOT NULL,
+    path TEXT NOT NULL,
+    hash TEXT,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    meta TEXT,
+    created REAL NOT NULL,
+    UNIQUE (category, name)
+);
+CREATE INDEX IF NOT EXISTS idx_files_hash ON files (hash);
+CREATE INDEX IF NOT EXISTS idx_files_name ON files (name);
+CREATE INDEX IF NOT EXISTS idx_files_path ON files (path);
+CREATE TABLE IF NOT EXISTS analyses (
+    hash TEXT NOT NULL,
+    settings TEXT NOT NULL,
+    path TEXT NOT NULL,
+    result TEXT NOT NULL,
+    created REAL NOT NULL,
+    PRIMARY KEY (hash, settings)
+);
+"""
+
+CHUNK_BYTES = 1024 * 1024
+
+
+def _json_default(value):
+    """numpy scalars (from pandas summaries) as Python values, anything else as str."""
+    return value.item() if hasattr(value, "item") else str(value)
+
+
+def file_hash(path: str) -> str:
+    sha = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(CHUNK_BYTES), b""):
+            sha.update(block)
+    return sha.hexdigest()
+
+
+class FileCatalog:
+    """
+    SQLite index of uploads, models, notebooks and EDA reports, keyed by content hash.
+    Identical uploads are stored once (hard links under their own names) and the
+    dataset analysis of a hash is reused. Listings and downloads are served from the
+    index; directories are only rescanned when their mtime changes.
+    """
+
+    def __init__(self, db_path: str = CATALOG_PATH):
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        with closing(self._connect()) as conn:
+            conn.executescript(SCHEMA)
+        self._scanned = {}  # source -> mtime_ns at the last scan
+        self._scan_lock = threading.Lock()
+        self.stats = {
+            "uploads": 0,
+            "deduplicated": 0,
+            "bytes_saved": 0,
+            "analysis_hits": 0,
+        }
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def _to_dict(self, row: sqlite3.Row) -> Dict[str, Any]:
+        entry = dict(row)
+        entry["meta"] = json.loads(entry["meta"]) if entry["meta"] else {}
+        return entry
+
+    def _upsert(self, conn, category: str, name: str, path: str, **fields):
+        stat = os.stat(path)
+        conn.execute(
+            "INSERT INTO files (category, name, type, path, hash, size, mtime_ns, "
+            "meta, created) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT (category, name) DO UPDATE SET type = excluded.type, "
+            "path = excluded.path, hash = excluded.hash, size = excluded.size, "
+            "mtime_ns = excluded.mtime_ns, meta = excluded.meta",
+            (
+                category,
+                name,
+                fields.get("type") or os.path.splitext(name)[1].lstrip(".").lower(),
+                path,
+                fields.get("hash"),
+                stat.st_size,
+                stat.st_mtime_ns,
+                json.dumps(fields["meta"]) if fields.get("meta") else None,
+                time.time(),
+            ),
+        )
+
+    # --- UPLOADS ---
+
+    def store_upload(self, fileobj, filename: str) -> Dict[str, Any]:
+        """
+        Streams an upload into uploads/ while hashing it. Content that is already
+        stored is hard-linked instead of written again.
+        """
+        name = os.path.basename(filename)
+        if not name:
+            return {"error": "Invalid filename"}
+        os.makedirs(UPLOADS_DIR, exist_ok=True)
+        target = os.path.join(UPLOADS_DIR, name)
+
+        fd, tmp_path = tempfile.mkstemp(dir=UPLOADS_DIR, suffix=".part")
+        sha = hashlib.sha256()
+        size = 0
+        try:
+            with os.fdopen(fd, "wb") as out:
+                for block in iter(lambda: fileobj.read(CHUNK_BYTES), b""):
+                    sha.update(block)
+                    out.write(block)
+                    size += len(block)
+            digest = sha.hexdigest()
+
+            existing = self._stored_copy(digest, size)
+            deduplicated = existing is not None
+            if existing == target:
+                os.remove(tmp_path)
+            elif existing:
+                os.remove(tmp_path)
+                try:
+                    os.link(existing, tmp_path)
+                except OSError:
+                    # No hard links here (e.g. another filesystem): plain copy
+                    deduplicated = False
+                    with open(existing, "rb") as src, open(tmp_path, "wb") as dst:
+                        for block in iter(lambda: src.read(CHUNK_BYTES), b""):
+                            dst.write(block)
+                os.replace(tmp_path, target)
+            else:
+                # Replaces only this name, other links to the old content survive
+                os.replace(tmp_path, target)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+        with closing(self._connect()) as conn:
+            self._upsert(conn, "dataset", name, target, hash=digest)
+        self.stats["uploads"] += 1
+        if deduplicated:
+            self.stats["deduplicated"] += 1
+            self.stats["bytes_saved"] += size
+        return {**self.find(target), "deduplicated": deduplicated}
+
+    def _stored_copy(self, digest: str, size: int) -> Optional[str]:
+        """Path of an unchanged file with this content, if any."""
+        with closing(self._connect()) as conn:
+            rows = conn.execute(
+                "SELECT path, size, mtime_ns FROM files WHERE hash = ? AND size = ?",
+                (digest, size),
+            ).fetchall()
+        for row in rows:
+            try:
+                stat = os.stat(row["path"])
+            except OSError:
+                continue
+            if stat.st_size == row["size"] and stat.st_mtime_ns == row["mtime_ns"]:
+                return row["path"]
+        return None
+
+    def find(self, path: str) -> Optional[Dict[str, Any]]:
+        """Index entry of `path`, if the file is unchanged since it was indexed."""
+        path = os.path.abspath(path)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        with closing(self._connect()) as conn:
+            row = conn.execute(
+                "SELECT * FROM files WHERE path = ? AND size = ? AND mtime_ns = ? "
+                "AND hash IS NOT NULL",
+                (path, stat.st_size, stat.st_mtime_ns),
+            ).fetchone()
+        return self._to_dict(row) if row else None
+
+    def content_hash(self, path: str) -> str:
+        """sha256 of a file, from the index when it is unchanged since indexed."""
+        path = os.path.abspath(path)
+        entry = self.find(path)
+        if entry is not None:
+            return entry["hash"]
+        digest = file_hash(path)
+        if os.path.dirname(path) == UPLOADS_DIR:
+            with closing(self._connect()) as conn:
+                self._upsert(
+                    conn, "dataset", os.path.basename(path), path, hash=digest
+                )
+        return digest
+
+    # --- ANALYSIS CACHE ---
+
+    def analysis(self, digest: str, settings: str) -> Optional[Dict[str, Any]]:
+        """Stored dataset analysis of this content (same loader settings), or None."""
+        with closing(self._connect()) as conn:
+            row = conn.execute(
+                "SELECT path, result FROM analyses WHERE hash = ? AND settings = ?",
+                (digest, settings),
+            ).fetchone()
+        if row is None:
+            return None
+        self.stats["analysis_hits"] += 1
+        return {"path": row["path"], **json.loads(row["result"])}
+
+    def save_analysis(
+        self, digest: str, settings: str, path: str, result: Dict[str, Any]
+    ):
+        with closing(self._connect()) as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO analyses (hash, settings, path, result, "
+                "created) VALUES (?, ?, ?, ?, ?)",
+                (
+                    digest,
+                    settings,
+                    path,
+                    json.dumps(result, default=_json_default),
+                    time.time(),
+                ),
+            )
+
+    # --- LISTING ---
+
+    def refresh(self):
+        """Re-indexes the directories (and the model registry) that changed."""
+        with self._scan_lock:
+            for category, (directory, extensions) in SCANNED_DIRS.items():
+                mtime = self._mtime(directory)
+                if self._scanned.get(directory) != mtime:
+                    self._scan(category, directory, extensions)
+                    self._scanned[directory] = mtime
+
+            registry_index = os.path.join(MODELS_DIR, INDEX_FILE)
+            mtime = self._mtime(registry_index)
+            if self._scanned.get(registry_index) != mtime:
+                self._sync_registry()
+                self._scanned[registry_index] = mtime
+
+    @staticmethod
+    def _mtime(path: str) -> Optional[int]:
+        try:
+            return os.stat(path).st_mtime_ns
+        except OSError:
+            return None
+
+    def _scan(self, category: str, directory: str, extensions: Tuple[str]):
+        present = {}
+        if os.path.isdir(directory):
+            for entry in os.scandir(directory):
+                if not entry.is_file() or entry.name.endswith(".part"):
+                    continue
+                if extensions and not entry.name.endswith(extensions):
+                    continue
+                present[entry.name] = entry.stat()
+
+        with closing(self._connect()) as conn:
+            rows = conn.execute(
+                "SELECT name, path, size, mtime_ns FROM files WHERE category = ?",
+                (category,),
+            ).fetchall()
+            known = {r["name"]: r for r in rows}
+            for row in rows:
+                in_directory = os.path.dirname(row["path"]) == directory
+                if in_directory and row["name"] not in present:
+                    conn.execute(
+                        "DELETE FROM files WHERE category = ? AND name = ?",
+                        (category, row["name"]),
+                    )
+            for name, stat in present.items():
+                row = known.get(name)
+                if row is not None and (row["size"], row["mtime_ns"]) == (
+                    stat.st_size,
+                    stat.st_mtime_ns,
+                ):
+                    continue
+                # Hashed lazily (register/find), listings do not need it
+                self._upsert(conn, category, name, os.path.join(directory, name))
+
+    def _sync_registry(self):
+        from model_registry import ModelRegistry
+
+        models = ModelRegistry().list()
+        with closing(self._connect()) as conn:
+            for model in models:
+                path = os.path.join(MODELS_DIR, model["file"])
+                if not os.path.exists(path):
+                    continue
+                self._upsert(
+                    conn,
+                    "model",
+                    model["name"],
+                    path,
+                    type="joblib",
+                    hash=model["hash"],
+                    meta={"version": model["version"], "class": model["class"]},
+                )
+
+    def list(
+        self, category: str = None, offset: int = 0, limit: int = 1000
+    ) -> Tuple[List[Dict[str, Any]], int]:
+        """One page of the index (datasets, models, notebooks, reports), total count."""
+        self.refresh()
+        where, params = "", []
+        if category:
+            where, params = " WHERE category = ?", [category]
+        order = " ".join(f"WHEN '{c}' THEN {i}" for i, c in enumerate(CATEGORIES))
+        with closing(self._connect()) as conn:
+            total = conn.execute(f"SELECT COUNT(*) FROM files{where}", params)
+            total = total.fetchone()[0]
+            rows = conn.execute(
+                f"SELECT * FROM files{where} ORDER BY CASE category {order} END, name "
+                "LIMIT ? OFFSET ?",
+                params + [limit, offset],
+            ).fetchall()
+        return [self._to_dict(r) for r in rows], total
+
+    def resolve(self, name: str, category: str = None) -> Optional[Dict[str, Any]]:
+        """Entry for a download name; registry models win, as in the legacy lookup."""
+        self.refresh()
+        with closing(self._connect()) as conn:
+            rows = conn.execute("SELECT * FROM files WHERE name = ?", (name,))
+            rows = [r for r in rows if category in (None, r["category"])]
+        rows.sort(
+            key=lambda r: (r["type"] != "joblib", CATEGORIES.index(r["category"]))
+        )
+        for row in rows:
+            if os.path.exists(row["path"]):
+                entry = self._to_dict(row)
+                entry["download_name"] = (
+                    f"{name}.joblib" if entry["type"] == "joblib" else name
+                )
+                return entry
+        return None
@@ -0,0 +1,322 @@
+"""
+Error-to-fix memory for self-healing.
+
+After a failed cell is repaired by a successful retry, the normalized error signature
+is stored with the failing code, the corrected code and their diff. When the same
+error shows up again, a small token-level fix is re-applied locally (no LLM call);
+otherwise the known fix is injected into the reflection prompt as context. A fix
+that fails when re-applied is not applied locally again.
+"""
+
+import io
+import os
+import re
+import json
+import time
+import sqlite3
+import difflib
+import threading
+import tokenize
+from contextlib import closing
+from typing import Dict, Any, List, Optional, Tuple
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+FIX_MEMORY_PATH = os.path.join(BASE_DIR, "cache", "fix_memory.db")
+# Store of earlier versions, imported once into an empty database
+LEGACY_JSON_PATH = os.path.join(BASE_DIR, "cache", "fix_memory.json")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS fixes (
+    signature TEXT PRIMARY KEY,
+    generic TEXT NOT NULL,
+    failed_code TEXT NOT NULL,
+    fixed_code TEXT NOT NULL,
+    diff TEXT NOT NULL,
+    edits TEXT,
+    hits INTEGER NOT NULL DEFAULT 0,
+    failures INTEGER NOT NULL DEFAULT 0,
+    created REAL NOT NULL,
+    used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_fixes_generic ON fixes (generic, used);
+CREATE INDEX IF NOT EXISTS idx_fixes_used ON fixes (used);
+"""
+
+# A fix is re-applied locally only if it is this small
+MAX_LOCAL_OPS = 3
+MAX_LOCAL_TOKENS = 12
+
+_SKIP_TOKENS = (
+    tokenize.NL,
+    tokenize.NEWLINE,
+    tokenize.INDENT,
+    tokenize.DEDENT,
+    tokenize.COMMENT,
+    tokenize.ENDMARKER,
+    tokenize.ENCODING,
+)
+
+
+def _error_line(error: str) -> str:
+    """The 'ErrorType: message' line of a kernel error output."""
+    lines = [line.strip() for line in error.strip().splitlines() if line.strip()]
+    for line in reversed(lines):
+        if re.match(r"^[A-Za-z_][\w.]*(Error|Exception|Exceeded)\b", line):
+            return line
+    return lines[-1] if lines else ""
+
+
+def signature(error: str) -> str:
+    """Exact signature: the error line without addresses and extra whitespace."""
+    line = re.sub(r"0x[0-9a-fA-F]+", "0x", _error_line(error))
+    return " ".join(line.split())[:300]
+
+
+def generic_signature(error: str) -> str:
+    """Signature with literals removed: KeyError: 'Sales' -> KeyError: <str>."""
+    line = signature(error)
+    line = re.sub(r"'[^']*'|\"[^\"]*\"", "<str>", line)
+    return re.sub(r"\b\d+(\.\d+)?\b", "<n>", line)
+
+
+def _tokens(code: str) -> Optional[List[Tuple[str, int, int]]]:
+    """(text, start, end) of each significant token; offsets into `code`."""
+    line_starts = [0]
+    for line in code.splitlines(keepends=True):
+        line_starts.append(line_starts[-1] + len(line))
+    try:
+        tokens = []
+        for tok in tokenize.generate_tokens(io.StringIO(code).readline):
+            if tok.type in _SKIP_TOKENS:
+                continue
+            start = line_starts[tok.start[0] - 1] + tok.start[1]
+            end = line_starts[tok.end[0] - 1] + tok.end[1]
+            tokens.append((tok.string, start, end))
+        return tokens
+    except (tokenize.TokenError, IndentationError, SyntaxError):
+        return None
+
+
+def token_edits(failed: str, fixed: str) -> Optional[List[Dict[str, str]]]:
+    """
+    Small token-level edits turning `failed` into `fixed`, each with one token of
+    context on both sides: [{"old": "...", "new": "..."}]. None if the fix is a rewrite.
+    """
+    old, new = _tokens(failed), _tokens(fixed)
+    if not old or not new:
+        return None
+    matcher = difflib.SequenceMatcher(
+        None, [t[0] for t in old], [t[0] for t in new], autojunk=False
+    )
+    ops = [op for op in matcher.get_opcodes() if op[0] != "equal"]
+    changed = sum(max(i2 - i1, j2 - j1) for _, i1, i2, j1, j2 in ops)
+    if not ops or len(ops) > MAX_LOCAL_OPS or changed > MAX_LOCAL_TOKENS:
+        return None
+
+    edits = []
+    for _, i1, i2, j1, j2 in ops:
+        i1, j1 = max(i1 - 1, 0), max(j1 - 1, 0)
+        i2, j2 = min(i2 + 1, len(old)), min(j2 + 1, len(new))
+        if i1 == i2 or j1 == j2:
+            return None
+        edits.append(
+            {
+                "old": failed[old[i1][1] : old[i2 - 1][2]],
+                "new": fixed[new[j1][1] : new[j2 - 1][2]],
+                "old_tokens": [t[0] for t in old[i1:i2]],
+            }
+        )
+    return edits
+
+
+def apply_edits(code: str, edits: List[Dict[str, Any]]) -> Optional[str]:
+    """Applies token edits to `code`; None unless every edit finds its tokens."""
+    for edit in edits:
+        tokens = _tokens(code)
+        if tokens is None:
+            return None
+        pattern = edit["old_tokens"]
+        texts = [t[0] for t in tokens]
+        for i in range(len(texts) - len(pattern) + 1):
+            if texts[i : i + len(pattern)] == pattern:
+                start, end = tokens[i][1], tokens[i + len(pattern) - 1][2]
+                code = code[:start] + edit["new"] + code[end:]
+                break
+        else:
+            return None
+    return code
+
+
+class FixMemory:
+    """
+    LRU store of error fixes (least recently used evicted first), in SQLite so
+    every backend worker process reads and adds to the same entries. Shared by all
+    sessions of a process (see SessionManager).
+    """
+
+    def __init__(self, db_path: str = FIX_MEMORY_PATH, max_entries: int = None):
+        self.db_path = db_path
+        self.max_entries = max_entries or int(
+            os.getenv("AUTODS_FIX_MEMORY_SIZE", "500")
+        )
+        self.lock = threading.Lock()  # Guards the per-process stats
+        self.stats = {
+            "lookups": 0,
+            "hits": 0,
+            "applied_locally": 0,
+            "local_successes": 0,
+            "local_failures": 0,
+            "injected": 0,
+            "recorded": 0,
+        }
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        with closing(self._connect()) as conn:
+            conn.executescript(SCHEMA)
+        self._import_legacy()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def _to_dict(self, row: sqlite3.Row) -> Dict[str, Any]:
+        entry = dict(row)
+        entry["edits"] = json.loads(entry["edits"]) if entry["edits"] else None
+        return entry
+
+    def _import_legacy(self):
+        if self.db_path != FIX_MEMORY_PATH or not os.path.exists(LEGACY_JSON_PATH):
+            return
+        try:
+            with open(LEGACY_JSON_PATH, "r", encoding="utf-8") as f:
+                entries = json.load(f)
+            with closing(self._connect()) as conn:
+                conn.execute("BEGIN IMMEDIATE")
+                if conn.execute("SELECT COUNT(*) FROM fixes").fetchone()[0] == 0:
+                    for i, entry in enumerate(entries):  # Oldest first
+                        self._insert(conn, {**entry, "used": entry["created"] + i})
+                conn.execute("COMMIT")
+            os.replace(LEGACY_JSON_PATH, LEGACY_JSON_PATH + ".imported")
+        except (OSError, ValueError, KeyError, sqlite3.Error) as e:
+            print(f"Fix memory import skipped: {e}")
+
+    def _insert(self, conn: sqlite3.Connection, entry: Dict[str, Any]):
+        conn.execute(
+            "INSERT OR REPLACE INTO fixes (signature, generic, failed_code, "
+            "fixed_code, diff, edits, hits, failures, created, used) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                entry["signature"],
+                entry["generic"],
+                entry["failed_code"],
+                entry["fixed_code"],
+                entry["diff"],
+                json.dumps(entry["edits"]) if entry.get("edits") else None,
+                entry.get("hits", 0),
+                entry.get("failures", 0),
+                entry["created"],
+                entry["used"],
+            ),
+        )
+
+    def record(self, error: str, failed_code: str, fixed_code: str):
+        """Stores the fix that made a failing cell work (called after a good retry)."""
+        if not failed_code.strip() or failed_code.strip() == fixed_code.strip():
+            return
+        diff = "\n".join(
+            difflib.unified_diff(
+                failed_code.splitlines(),
+                fixed_code.splitlines(),
+                "failed",
+                "fixed",
+                lineterm="",
+            )
+        )
+        now = time.time()
+        entry = {
+            "signature": signature(error),
+            "generic": generic_signature(error),
+            "failed_code": failed_code,
+            "fixed_code": fixed_code,
+            "diff": diff,
+            "edits": token_edits(failed_code, fixed_code),
+            "created": now,
+            "used": now,
+        }
+        with closing(self._connect()) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            self._insert(conn, entry)  # Replaces an older (or failed) fix
+            conn.execute(
+                "DELETE FROM fixes WHERE signature NOT IN "
+                "(SELECT signature FROM fixes ORDER BY used DESC LIMIT ?)",
+                (self.max_entries,),
+            )
+            conn.execute("COMMIT")
+        with self.lock:
+            self.stats["recorded"] += 1
+
+    def lookup(self, error: str) -> Optional[Dict[str, Any]]:
+        """Known fix for this error: exact signature first, then the generic one."""
+        sig = signature(error)
+        with self.lock:
+            self.stats["lookups"] += 1
+        with closing(self._connect()) as conn:
+            row = conn.execute(
+                "SELECT * FROM fixes WHERE signature = ?", (sig,)
+            ).fetchone()
+            exact = row is not None
+            if row is None:
+                row = conn.execute(
+                    "SELECT * FROM fixes WHERE generic = ? ORDER BY used DESC LIMIT 1",
+                    (generic_signature(error),),
+                ).fetchone()
+            if row is None:
+                return None
+            conn.execute(
+                "UPDATE fixes SET hits = hits + 1, used = ? WHERE signature = ?",
+                (time.time(), row["signature"]),
+            )
+        with self.lock:
+            self.stats["hits"] += 1
+        return {**self._to_dict(row), "exact": exact}
+
+    def apply(self, entry: Dict[str, Any], failed_code: str) -> Optional[str]:
+        """The locally repaired code, or None if the stored fix does not carry over."""
+        if not entry.get("exact") or not entry.get("edits") or entry["failures"]:
+            return None
+        fixed = apply_edits(failed_code, entry["edits"])
+        if fixed is None or fixed.strip() == failed_code.strip():
+            return None
+        with self.lock:
+            self.stats["applied_locally"] += 1
+        return fixed
+
+    def confirm(self):
+        """Counts a locally applied fix that ran without error."""
+        with self.lock:
+            self.stats["local_successes"] += 1
+
+    def reject(self, sig: str):
+        """A locally applied fix failed: it is not applied locally again."""
+        with closing(self._connect()) as conn:
+            conn.execute(
+                "UPDATE fixes SET failures = failures + 1 WHERE signature = ?", (sig,)
+            )
+        with self.lock:
+            self.stats["local_failures"] += 1
+
+    def context(self, entry: Dict[str, Any]) -> str:
+        """The known fix as reflection-prompt context."""
+        with self.lock:
+            self.stats["injected"] += 1
+        return (
+            f"A previous occurrence of this error ({entry['signature']}) "
+            f"was fixed like this:\n{entry['diff']}"
+        )
+
+    def summary(self) -> Dict[str, Any]:
+        with closing(self._connect()) as conn:
+            entries = conn.execute("SELECT COUNT(*) FROM fixes").fetchone()[0]
+        with self.lock:
+            return {**self.stats, "entries": entries}
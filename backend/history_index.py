@@ -0,0 +1,290 @@
+import os
+import re
+import json
+import time
+import sqlite3
+from array import array
+from contextlib import closing
+from typing import Dict, Any, List, Optional, Tuple
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+INDEX_PATH = os.path.join(BASE_DIR, "cache", "history_index.db")
+HISTORY_DIR = os.path.join(BASE_DIR, "cache", "history")
+
+# Kinds of indexed documents
+KINDS = ("user", "assistant", "code", "error", "schema")
+
+# Longer documents are truncated before indexing
+MAX_DOC_CHARS = 4000
+# Vector search only scores the newest embedded documents
+MAX_VECTOR_SCAN = 5000
+# Reciprocal rank fusion constant (score = sum of 1 / (RRF_K + rank))
+RRF_K = 60
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS docs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    session_id TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    text TEXT NOT NULL,
+    embedding BLOB,
+    created REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_docs_session ON docs (session_id, kind);
+CREATE VIRTUAL TABLE IF NOT EXISTS docs_fts USING fts5 (
+    text, content='docs', content_rowid='id', tokenize='porter unicode61'
+);
+CREATE TRIGGER IF NOT EXISTS docs_ai AFTER INSERT ON docs BEGIN
+    INSERT INTO docs_fts (rowid, text) VALUES (new.id, new.text);
+END;
+CREATE TRIGGER IF NOT EXISTS docs_ad AFTER DELETE ON docs BEGIN
+    INSERT INTO docs_fts (docs_fts, rowid, text) VALUES ('delete', old.id, old.text);
+END;
+CREATE TABLE IF NOT EXISTS sources (
+    path TEXT PRIMARY KEY,
+    session_id TEXT NOT NULL,
+    messages INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL
+);
+"""
+
+CODE_BLOCK_RE = re.compile(r"```python\n(.*?)```", re.DOTALL)
+TERM_RE = re.compile(r"\w+")
+
+# fmt: off
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "can", "do", "for", "from",
+    "how", "i", "in", "is", "it", "me", "my", "of", "on", "or", "show", "that",
+    "the", "this", "to", "was", "what", "which", "with", "you",
+}
+# fmt: on
+
+
+def terms(text: str) -> List[str]:
+    """Distinct lowercase query terms without stopwords, in order."""
+    seen = []
+    for term in TERM_RE.findall(text.lower()):
+        if term not in STOPWORDS and term not in seen:
+            seen.append(term)
+    return seen
+
+
+def _pack(embedding: List[float]) -> bytes:
+    return array("f", embedding).tobytes()
+
+
+class HistoryIndex:
+    """
+    Local hybrid retrieval index over session history (SQLite FTS5/BM25 + vectors).
+    Past turns, code cells, errors and dataset schemas are indexed incrementally;
+    queries fuse the lexical and vector rankings (reciprocal rank fusion).
+    Embeddings are optional per document and are filled in on demand.
+    """
+
+    def __init__(self, db_path: str = INDEX_PATH):
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        with closing(self._connect()) as conn:
+            conn.executescript(SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    # --- INDEXING ---
+
+    def add(
+        self,
+        session_id: str,
+        kind: str,
+        text: str,
+        embedding: List[float] = None,
+        conn: sqlite3.Connection = None,
+    ) -> Optional[int]:
+        """Indexes one document; returns its id (None for empty text)."""
+        text = text.strip()[:MAX_DOC_CHARS]
+        if not text:
+            return None
+        if conn is None:
+            with closing(self._connect()) as conn:
+                return self.add(session_id, kind, text, embedding, conn)
+        cur = conn.execute(
+            "INSERT INTO docs (session_id, kind, text, embedding, created) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (
+                session_id,
+                kind,
+                text,
+                _pack(embedding) if embedding else None,
+                time.time(),
+            ),
+        )
+        return cur.lastrowid
+
+    def add_messages(
+        self, path: str, session_id: str, messages: List[Dict[str, Any]]
+    ) -> int:
+        """
+        Indexes the messages of a history file that are not indexed yet (the file
+        only grows). Assistant code blocks are also indexed on their own.
+        """
+        with closing(self._connect()) as conn:
+            # Serializes concurrent indexing of the same file (live session vs. sync)
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                "SELECT messages FROM sources WHERE path = ?", (path,)
+            ).fetchone()
+            start = row["messages"] if row else 0
+            if start > len(messages):
+                start = 0  # Rewritten, index it again
+            for message in messages[start:]:
+                content = message.get("content") or ""
+                if message.get("role") == "user":
+                    self.add(session_id, "user", content, conn=conn)
+                    continue
+                self.add(session_id, "assistant", content, conn=conn)
+                for code in CODE_BLOCK_RE.findall(content):
+                    self.add(session_id, "code", code, conn=conn)
+            try:
+                mtime_ns = os.stat(path).st_mtime_ns
+            except OSError:
+                mtime_ns = 0
+            conn.execute(
+                "INSERT OR REPLACE INTO sources (path, session_id, messages, mtime_ns) "
+                "VALUES (?, ?, ?, ?)",
+                (path, session_id, len(messages), mtime_ns),
+            )
+            conn.execute("COMMIT")
+        return len(messages) - start
+
+    def sync(self, history_dir: str = HISTORY_DIR) -> int:
+        """Indexes history files written since the last sync (mtime based)."""
+        if not os.path.isdir(history_dir):
+            return 0
+        with closing(self._connect()) as conn:
+            known = {
+                r["path"]: r["mtime_ns"]
+                for r in conn.execute("SELECT path, mtime_ns FROM sources")
+            }
+        added = 0
+        for entry in os.scandir(history_dir):
+            name = entry.name
+            if not (name.startswith("session_") and name.endswith(".json")):
+                continue
+            if known.get(entry.path) == entry.stat().st_mtime_ns:
+                continue
+            try:
+                with open(entry.path, "r", encoding="utf-8") as f:
+                    messages = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"History index: skipping {name}: {e}")
+                continue
+            session_id = name[len("session_") : -len(".json")]
+            added += self.add_messages(entry.path, session_id, messages)
+        return added
+
+    def set_embeddings(self, embeddings: Dict[int, List[float]]):
+        with closing(self._connect()) as conn:
+            conn.executemany(
+                "UPDATE docs SET embedding = ? WHERE id = ?",
+                [(_pack(vector), doc_id) for doc_id, vector in embeddings.items()],
+            )
+
+    def missing_embeddings(
+        self, session_id: str, limit: int
+    ) -> List[Tuple[int, str]]:
+        """Newest documents of the session without an embedding."""
+        with closing(self._connect()) as conn:
+            rows = conn.execute(
+                "SELECT id, text FROM docs WHERE session_id = ? AND embedding IS NULL "
+                "ORDER BY id DESC LIMIT ?",
+                (session_id, limit),
+            ).fetchall()
+        return [(r["id"], r["text"]) for r in rows]
+
+    def clear(self, session_id: str, kinds: Tuple[str] = KINDS):
+        with closing(self._connect()) as conn:
+            conn.execute(
+                f"DELETE FROM docs WHERE session_id = ? AND kind IN "
+                f"({', '.join('?' * len(kinds))})",
+                (session_id, *kinds),
+            )
+
+    # --- SEARCH ---
+
+    def lexical(
+        self, query: str, session_id: str = None, limit: int = 20
+    ) -> List[Dict[str, Any]]:
+        """BM25 ranking; `coverage` is the share of query terms each document has."""
+        query_terms = terms(query)[:32]
+        if not query_terms:
+            return []
+        match = " OR ".join('"' + term.replace('"', "") + '"' for term in query_terms)
+        where = "docs_fts MATCH ?"
+        params = [match]
+        if session_id:
+            where += " AND docs.session_id = ?"
+            params.append(session_id)
+        with closing(self._connect()) as conn:
+            rows = conn.execute(
+                "SELECT docs.id, docs.session_id, docs.kind, docs.text, "
+                "bm25(docs_fts) AS score FROM docs_fts "
+                f"JOIN docs ON docs.id = docs_fts.rowid WHERE {where} "
+                "ORDER BY score LIMIT ?",
+                params + [limit],
+            ).fetchall()
+        hits = []
+        for row in rows:
+            doc_terms = set(terms(row["text"]))
+            coverage = sum(t in doc_terms for t in query_terms) / len(query_terms)
+            hits.append({**dict(row), "coverage": coverage})
+        return hits
+
+    def vector(
+        self, embedding: List[float], session_id: str = None, limit: int = 20
+    ) -> List[Dict[str, Any]]:
+        """Cosine similarity ranking over the newest documents with an embedding."""
+        import numpy as np
+
+        where, params = "embedding IS NOT NULL", []
+        if session_id:
+            where += " AND session_id = ?"
+            params.append(session_id)
+        with closing(self._connect()) as conn:
+            rows = conn.execute(
+                "SELECT id, session_id, kind, text, embedding FROM docs "
+                f"WHERE {where} ORDER BY id DESC LIMIT ?",
+                params + [MAX_VECTOR_SCAN],
+            ).fetchall()
+        query = np.asarray(embedding, dtype=np.float32)
+        rows = [r for r in rows if len(r["embedding"]) == query.nbytes]
+        if not rows:
+            return []
+        matrix = np.frombuffer(
+            b"".join(r["embedding"] for r in rows), dtype=np.float32
+        ).reshape(len(rows), -1)
+        norms = np.linalg.norm(matrix, axis=1) * (np.linalg.norm(query) or 1.0)
+        scores = matrix @ query / np.where(norms == 0, 1.0, norms)
+        top = np.argsort(-scores)[:limit]
+        return [
+            {
+                "id": rows[i]["id"],
+                "session_id": rows[i]["session_id"],
+                "kind": rows[i]["kind"],
+                "text": rows[i]["text"],
+                "score": float(scores[i]),
+            }
+            for i in top
+        ]
+
+
+def fuse(*rankings: List[Dict[str, Any]], limit: int = 3) -> List[Dict[str, Any]]:
+    """Reciprocal rank fusion of several rankings of documents (by id)."""
+    fused = {}
+    for ranking in rankings:
+        for rank, doc in enumerate(ranking):
+            entry = fused.setdefault(doc["id"], {**doc, "rrf": 0.0})
+            entry["rrf"] += 1.0 / (RRF_K + rank + 1)
+    return sorted(fused.values(), key=lambda d: d["rrf"], reverse=True)[:limit]
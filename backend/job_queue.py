@@ -0,0 +1,375 @@
+import os
+import sys
+import json
+import time
+import sqlite3
+import asyncio
+from contextlib import closing
+from typing import Dict, Any, List, Optional, Callable, Awaitable
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DB_PATH = os.path.join(BASE_DIR, "cache", "jobs.db")
+JOBS_DIR = os.path.join(BASE_DIR, "cache", "jobs")
+
+JOB_KINDS = ("python", "eda", "score")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    priority INTEGER NOT NULL DEFAULT 0,
+    status TEXT NOT NULL DEFAULT 'queued',
+    progress REAL NOT NULL DEFAULT 0,
+    message TEXT,
+    result TEXT,
+    error TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    session_id TEXT,
+    created REAL NOT NULL,
+    started REAL,
+    finished REAL,
+    updated REAL
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_queue ON jobs (status, priority DESC, id);
+"""
+
+
+class JobQueue:
+    """
+    SQLite-backed queue of long-running tasks (training, EDA, batch scoring).
+    Safe to use from several processes: the backend workers, the kernel (to submit
+    jobs) and the job workers (to read their payload). Every change stamps
+    `updated`, which is how backend workers follow jobs they do not run.
+    """
+
+    def __init__(self, db_path: str = DB_PATH):
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        with closing(self._connect()) as conn:
+            conn.executescript(SCHEMA)
+            columns = {r["name"] for r in conn.execute("PRAGMA table_info(jobs)")}
+            if "updated" not in columns:
+                try:
+                    conn.execute("ALTER TABLE jobs ADD COLUMN updated REAL")
+                except sqlite3.OperationalError:
+                    pass  # Added by another process meanwhile
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_jobs_updated ON jobs (updated)"
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def _to_dict(self, row: sqlite3.Row) -> Dict[str, Any]:
+        job = dict(row)
+        job["payload"] = json.loads(job["payload"])
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        return job
+
+    def submit(
+        self,
+        kind: str,
+        payload: Dict[str, Any],
+        priority: int = 0,
+        session_id: str = None,
+    ) -> Dict[str, Any]:
+        """Queues a job. Higher priority runs first; ties run in submission order."""
+        if kind not in JOB_KINDS:
+            return {"error": f"Unknown job kind: {kind}"}
+        with closing(self._connect()) as conn:
+            now = time.time()
+            cur = conn.execute(
+                "INSERT INTO jobs (kind, payload, priority, session_id, created, "
+                "updated) VALUES (?, ?, ?, ?, ?, ?)",
+                (kind, json.dumps(payload), priority, session_id, now, now),
+            )
+            return self.get(cur.lastrowid)
+
+    def get(self, job_id: int) -> Optional[Dict[str, Any]]:
+        with closing(self._connect()) as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._to_dict(row) if row else None
+
+    def list(
+        self, status: str = None, limit: int = 50, session_id: str = None
+    ) -> List[Dict[str, Any]]:
+        conditions, params = [], []
+        if status:
+            conditions.append("status = ?")
+            params.append(status)
+        if session_id:
+            conditions.append("session_id = ?")
+            params.append(session_id)
+        query = "SELECT * FROM jobs"
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        query += " ORDER BY id DESC LIMIT ?"
+        params.append(limit)
+        with closing(self._connect()) as conn:
+            return [self._to_dict(r) for r in conn.execute(query, params).fetchall()]
+
+    def changed_since(self, since: float) -> List[Dict[str, Any]]:
+        """Jobs changed after `since` (a previous `updated` value), oldest first."""
+        with closing(self._connect()) as conn:
+            rows = conn.execute(
+                "SELECT * FROM jobs WHERE updated > ? ORDER BY updated", (since,)
+            ).fetchall()
+        return [self._to_dict(r) for r in rows]
+
+    def ids_with_status(self, status: str, ids) -> List[int]:
+        ids = list(ids)
+        if not ids:
+            return []
+        with closing(self._connect()) as conn:
+            rows = conn.execute(
+                f"SELECT id FROM jobs WHERE status = ? AND id IN "
+                f"({', '.join('?' * len(ids))})",
+                (status, *ids),
+            ).fetchall()
+        return [r["id"] for r in rows]
+
+    def claim_next(self) -> Optional[Dict[str, Any]]:
+        """Atomically moves the highest-priority queued job to 'running'."""
+        with closing(self._connect()) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                "SELECT id FROM jobs WHERE status = 'queued' "
+                "ORDER BY priority DESC, id LIMIT 1"
+            ).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+            now = time.time()
+            conn.execute(
+                "UPDATE jobs SET status = 'running', started = ?, attempts = attempts + 1, "
+                "progress = 0, error = NULL, updated = ? WHERE id = ?",
+                (now, now, row["id"]),
+            )
+            conn.execute("COMMIT")
+        return self.get(row["id"])
+
+    def update(self, job_id: int, **fields):
+        if "result" in fields:
+            fields["result"] = json.dumps(fields["result"])
+        fields["updated"] = time.time()
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        with closing(self._connect()) as conn:
+            conn.execute(
+                f"UPDATE jobs SET {assignments} WHERE id = ?",
+                (*fields.values(), job_id),
+            )
+
+    def retry(self, job_id: int) -> Dict[str, Any]:
+        job = self.get(job_id)
+        if not job:
+            return {"error": "Job not found"}
+        if job["status"] not in ("failed", "cancelled"):
+            return {"error": f"Job is {job['status']}, only failed/cancelled jobs retry"}
+        self.update(job_id, status="queued", progress=0, message=None, finished=None)
+        return self.get(job_id)
+
+    def requeue_interrupted(self) -> int:
+        """Jobs left 'running' by a previous server process are queued again."""
+        with closing(self._connect()) as conn:
+            cur = conn.execute(
+                "UPDATE jobs SET status = 'queued', updated = ? "
+                "WHERE status = 'running'",
+                (time.time(),),
+            )
+            return cur.rowcount
+
+
+class JobDispatcher:
+    """
+    Runs queued jobs in worker subprocesses (`python -m job_worker <id>`), at most
+    `max_workers` at a time. Worker stdout lines `PROGRESS <0..1> <msg>` and
+    `RESULT <json>` update the job, and every change is pushed to `on_update`.
+    Jobs cancelled from another backend worker (status set in the database) are
+    terminated on the next poll.
+    """
+
+    def __init__(
+        self,
+        queue: JobQueue,
+        on_update: Callable[[Dict[str, Any]], Awaitable[None]] = None,
+        max_workers: int = None,
+        poll_interval: float = 1.0,
+    ):
+        self.queue = queue
+        self.on_update = on_update
+        self.max_workers = max_workers or int(os.getenv("AUTODS_JOB_WORKERS", "2"))
+        self.poll_interval = poll_interval
+        self.processes: Dict[int, asyncio.subprocess.Process] = {}
+        self.cancelled = set()
+        self._tasks = set()
+
+    async def run(self):
+        requeued = self.queue.requeue_interrupted()
+        if requeued:
+            print(f"Re-queued {requeued} interrupted job(s).")
+
+        while True:
+            while len(self.processes) < self.max_workers:
+                job = self.queue.claim_next()
+                if job is None:
+                    break
+                # Reserve the slot before the subprocess starts
+                self.processes[job["id"]] = None
+                task = asyncio.create_task(self._run_job(job))
+                self._tasks.add(task)
+                task.add_done_callback(self._tasks.discard)
+            self._terminate_cancelled()
+            await asyncio.sleep(self.poll_interval)
+
+    def _terminate_cancelled(self):
+        try:
+            cancelled = self.queue.ids_with_status("cancelled", self.processes)
+        except sqlite3.Error as e:
+            print(f"Job cancel check error: {e}")
+            return
+        for job_id in cancelled:
+            proc = self.processes.get(job_id)
+            if proc is not None and job_id not in self.cancelled:
+                self.cancelled.add(job_id)
+                proc.terminate()
+
+    def _is_cancelled(self, job_id: int) -> bool:
+        job = self.queue.get(job_id)
+        return job is not None and job["status"] == "cancelled"
+
+    async def _notify(self, job_id: int):
+        if self.on_update:
+            try:
+                await self.on_update(self.queue.get(job_id))
+            except Exception as e:
+                print(f"Job notify error: {e}")
+
+    async def _run_job(self, job: Dict[str, Any]):
+        job_id = job["id"]
+        job_dir = os.path.join(JOBS_DIR, str(job_id))
+        os.makedirs(job_dir, exist_ok=True)
+        await self._notify(job_id)
+        if self._is_cancelled(job_id):
+            # Cancelled between claim and start, the slot is released unused
+            self.processes.pop(job_id, None)
+            return
+
+        result = None
+        try:
+            proc = await asyncio.create_subprocess_exec(
+                sys.executable,
+                "-m",
+                "job_worker",
+                str(job_id),
+                cwd=BASE_DIR,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.STDOUT,
+            )
+            self.processes[job_id] = proc
+
+            with open(os.path.join(job_dir, "log.txt"), "a", encoding="utf-8") as log:
+                async for raw in proc.stdout:
+                    line = raw.decode("utf-8", errors="replace")
+                    if line.startswith("PROGRESS "):
+                        _, fraction, *message = line.rstrip("\n").split(" ", 2)
+                        self.queue.update(
+                            job_id,
+                            progress=float(fraction),
+                            message=message[0] if message else None,
+                        )
+                        await self._notify(job_id)
+                    elif line.startswith("RESULT "):
+                        result = json.loads(line[len("RESULT ") :])
+                    else:
+                        log.write(line)
+
+            returncode = await proc.wait()
+            if job_id in self.cancelled or self._is_cancelled(job_id):
+                self.queue.update(job_id, status="cancelled", finished=time.time())
+            elif returncode == 0:
+                self.queue.update(
+                    job_id,
+                    status="succeeded",
+                    progress=1.0,
+                    result=result,
+                    finished=time.time(),
+                )
+            else:
+                self.queue.update(
+                    job_id,
+                    status="failed",
+                    error=self._log_tail(job_dir),
+                    finished=time.time(),
+                )
+        except Exception as e:
+            self.queue.update(job_id, status="failed", error=str(e), finished=time.time())
+        finally:
+            self.processes.pop(job_id, None)
+            self.cancelled.discard(job_id)
+
+        await self._notify(job_id)
+
+    def _log_tail(self, job_dir: str, n_bytes: int = 2000) -> str:
+        try:
+            with open(os.path.join(job_dir, "log.txt"), "rb") as f:
+                f.seek(0, os.SEEK_END)
+                f.seek(max(0, f.tell() - n_bytes))
+                return f.read().decode("utf-8", errors="replace")
+        except OSError:
+            return "Job failed (no log)."
+
+    async def cancel(self, job_id: int) -> Dict[str, Any]:
+        job = self.queue.get(job_id)
+        if not job:
+            return {"error": "Job not found"}
+        if job["status"] == "queued":
+            self.queue.update(job_id, status="cancelled", finished=time.time())
+        elif job["status"] == "running":
+            proc = self.processes.get(job_id)
+            if proc is not None:
+                self.cancelled.add(job_id)
+                proc.terminate()
+            else:
+                # Run by another backend worker, its dispatcher terminates it
+                self.queue.update(job_id, status="cancelled", finished=time.time())
+        else:
+            return {"error": f"Job already {job['status']}"}
+        await self._notify(job_id)
+        return self.queue.get(job_id)
+
+
+class JobWatcher:
+    """
+    Pushes changes of jobs run by another backend worker (see coordinator.py) to
+    `on_update`, by polling the `updated` column of the queue.
+    """
+
+    def __init__(
+        self,
+        queue: JobQueue,
+        on_update: Callable[[Dict[str, Any]], Awaitable[None]],
+        poll_interval: float = 1.0,
+    ):
+        self.queue = queue
+        self.on_update = on_update
+        self.poll_interval = poll_interval
+
+    async def run(self):
+        since = time.time()
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            try:
+                jobs = await asyncio.to_thread(self.queue.changed_since, since)
+            except sqlite3.Error as e:
+                print(f"Job watch error: {e}")
+                continue
+            for job in jobs:
+                since = max(since, job["updated"])
+                try:
+                    await self.on_update(job)
+                except Exception as e:
+                    print(f"Job notify error: {e}")
@@ -0,0 +1,104 @@
+"""
+Job worker process: `python -m job_worker <job_id>` (started by JobDispatcher).
+Protocol on stdout: `PROGRESS <0..1> <message>` lines and one final `RESULT <json>`.
+"""
+
+import os
+import sys
+import json
+import textwrap
+from typing import Dict, Any
+
+from job_queue import JobQueue, JOBS_DIR, BASE_DIR
+
+
+def report_progress(fraction: float, message: str = ""):
+    print(f"PROGRESS {max(0.0, min(1.0, fraction)):.4f} {message}", flush=True)
+
+
+def _artifacts(job_dir: str):
+    return sorted(f for f in os.listdir(job_dir) if f != "log.txt")
+
+
+def run_python(payload: Dict[str, Any], job_dir: str) -> Dict[str, Any]:
+    """Runs arbitrary training code. It can call report_progress() and write into JOB_DIR."""
+    namespace = {
+        "__name__": "__job__",
+        "report_progress": report_progress,
+        "JOB_DIR": job_dir,
+    }
+    code = textwrap.dedent(payload["code"])
+    exec(compile(code, "<job>", "exec"), namespace)
+
+    result = namespace.get("result")
+    try:
+        json.dumps(result)
+    except TypeError:
+        result = repr(result)
+    return {"result": result}
+
+
+def _read_dataset(path: str):
+    import pandas as pd
+
+    if path.endswith(".xlsx"):
+        return pd.read_excel(path)
+    return pd.read_csv(path)
+
+
+def run_eda(payload: Dict[str, Any], job_dir: str) -> Dict[str, Any]:
+    """Sweetviz report for an uploaded dataset."""
+    import sweetviz as sv
+
+    # Payloads come from clients: only names inside the uploads folder
+    filename = os.path.basename(payload["filename"])
+    report_progress(0.05, "Loading dataset")
+    df = _read_dataset(os.path.join(BASE_DIR, "uploads", filename))
+
+    report_progress(0.2, "Analyzing")
+    report = sv.analyze(df)
+
+    name = os.path.splitext(filename)[0] + "_eda.html"
+    report.show_html(os.path.join(job_dir, name), open_browser=False)
+    return {"report": name}
+
+
+def run_score(payload: Dict[str, Any], job_dir: str) -> Dict[str, Any]:
+    """Batch predictions of a registered model over a CSV, in chunks."""
+    import pandas as pd
+    from model_registry import ModelRegistry
+
+    model = ModelRegistry().load(payload["model"])
+    path = os.path.join(BASE_DIR, "uploads", os.path.basename(payload["filename"]))
+    features = payload.get("features")
+    chunksize = payload.get("chunksize", 100_000)
+
+    total = max(os.path.getsize(path), 1)
+    out_path = os.path.join(job_dir, "predictions.csv")
+    rows = 0
+    with open(path, "rb") as raw:
+        for i, chunk in enumerate(pd.read_csv(raw, chunksize=chunksize)):
+            X = chunk[features] if features else chunk
+            chunk["prediction"] = model.predict(X)
+            chunk.to_csv(out_path, mode="a", header=(i == 0), index=False)
+            rows += len(chunk)
+            report_progress(raw.tell() / total, f"{rows} rows scored")
+
+    return {"rows": rows, "predictions": "predictions.csv"}
+
+
+HANDLERS = {"python": run_python, "eda": run_eda, "score": run_score}
+
+
+def main(job_id: int):
+    job = JobQueue().get(job_id)
+    job_dir = os.path.join(JOBS_DIR, str(job_id))
+    os.makedirs(job_dir, exist_ok=True)
+
+    result = HANDLERS[job["kind"]](job["payload"], job_dir)
+    result["artifacts"] = _artifacts(job_dir)
+    print("RESULT " + json.dumps(result), flush=True)
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]))
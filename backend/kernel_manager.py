@@ -1,10 +1,22 @@
 import queue
 import time
+import threading
 import os
+import json
+import re
 import io
 import base64
 from typing import Dict, Any, List
-from jupyter_client import KernelManager as JKManager
+import psutil
+from kernel_pool import KernelPool
+from output_capture import OutputCapture, DEFAULT_BUDGET_BYTES, OUTPUTS_DIR
+import tracing
+
+MEMO_MARKER = "AUTODS_MEMO_HIT"
+MEMO_MARKER_RE = re.compile(MEMO_MARKER + r" ([\d.]+)\n?")
+# Progress reports of long cells (see kernel_runtime.training.report_progress)
+PROGRESS_MARKER = "AUTODS_PROGRESS"
+PROGRESS_RE = re.compile(PROGRESS_MARKER + r" ([\d.]+) ?([^\n]*)\n?")
 
 
 class KernelManager:
@@ -12,76 +24,327 @@ class KernelManager:
     Manages a persistent IPython kernel for stateful execution.
     """
 
-    def __init__(self):
-        self.km = JKManager(kernel_name="python3")
-        # This will launch the kernel subprocess
-        self.km.start_kernel()
-        self.kc = self.km.client()
-        self.kc.start_channels()
+    _shared_pool = None
+
+    def __init__(self, lease: bool = True):
+        base_dir = os.path.dirname(os.path.abspath(__file__))
+        self.runtime_path = base_dir  # Makes `kernel_runtime` importable in the kernel
+
+        # Checkpointing (set by the agent once a session exists)
+        self.checkpoint_dir = None
+        self.checkpoint_interval = float(os.getenv("AUTODS_CHECKPOINT_INTERVAL", "120"))
+        self.last_checkpoint = 0.0
+        # Cumulative execution time of successful cells = cost of a full replay
+        self.replay_seconds = 0.0
+
+        # Resource limits (0 disables a limit). Wall time is the `timeout` of execute().
+        self.memory_limit_mb = float(os.getenv("AUTODS_KERNEL_MEMORY_MB", "4096"))
+        self.cpu_limit_seconds = float(os.getenv("AUTODS_CELL_CPU_SECONDS", "120"))
+        # Output beyond the budget is spilled to disk, the hard limit stops the cell
+        self.output_limit_bytes = int(
+            os.getenv("AUTODS_CELL_OUTPUT_BYTES", str(50 * 1024 * 1024))
+        )
+        self.output_budget_bytes = int(
+            os.getenv("AUTODS_OUTPUT_BUDGET_BYTES", str(DEFAULT_BUDGET_BYTES))
+        )
+        self.outputs_dir = OUTPUTS_DIR
+        # Cell memoization (see kernel_runtime.memo), AUTODS_MEMO_MB=0 disables it
+        self.memo_mb = float(os.getenv("AUTODS_MEMO_MB", "512"))
+        self.memo_min_seconds = float(os.getenv("AUTODS_MEMO_MIN_SECONDS", "0.1"))
+        self.memo_stats = {"cells": 0, "hits": 0, "saved_seconds": 0.0}
+        # A cell that reports progress is not hung: each report extends its wall-time
+        # limit by `timeout` (up to this many seconds) and lifts the CPU limit.
+        self.progress_max_seconds = float(
+            os.getenv("AUTODS_PROGRESS_MAX_SECONDS", "1800")
+        )
+        self.progress = None  # Latest report of the running cell
+        # Cell that loads the active dataset (set by the agent), re-run after a crash.
+        # Loads are internal cells: no CPU limit, a longer wall-time limit.
+        self.load_cmd = None
+        self.load_timeout = float(os.getenv("AUTODS_LOAD_TIMEOUT_SECONDS", "600"))
+        # Session the kernel works for (tags the jobs it submits), see bind_session
+        self.session_id = None
+        # Cells can run from a worker thread while the agent streams (one at a time)
+        self._lock = threading.RLock()
+
+        # Warm spares: kernels boot with the scientific stack already imported.
+        # One pool per process, shared by every session's KernelManager.
+        if KernelManager._shared_pool is None:
+            KernelManager._shared_pool = KernelPool(
+                self._bootstrap_code(), size=int(os.getenv("AUTODS_WARM_KERNELS", "1"))
+            )
+        self.pool = KernelManager._shared_pool
+        # lease=False only starts the pool (warm-up of a worker with no session)
+        if lease:
+            self._start()
+
+    def _bootstrap_code(self) -> str:
+        """Runs once per kernel (in the pool): helpers + heavy imports."""
+        return (
+            "import sys\n"
+            f"sys.path.insert(0, r'{self.runtime_path}')\n"
+            "from kernel_runtime.prewarm import preload as _autods_preload\n"
+            "from kernel_runtime.plots import install as _autods_install_plots\n"
+            "from kernel_runtime.limits import apply_memory_limit as _autods_limit\n"
+            "_autods_preload(globals())\n"
+            "_autods_install_plots(get_ipython())\n"
+            "from model_registry import ModelRegistry as _ModelRegistry\n"
+            "model_registry = _ModelRegistry()\n"
+            "from kernel_runtime.explain import explain_model\n"
+            "from kernel_runtime.training import train_model, report_progress\n"
+            "from job_queue import JobQueue as _JobQueue\n"
+            "_autods_session_id = None\n"
+            "def submit_job(kind, payload, priority=0):\n"
+            "    return _JobQueue().submit(\n"
+            "        kind, payload, priority, session_id=_autods_session_id\n"
+            "    )\n"
+            "from kernel_runtime import memo as _autods_memo\n"
+            f"_autods_memo.configure({self.memo_mb}, {self.memo_min_seconds})\n"
+            "_autods_memo.install(get_ipython())\n"
+            f"_autods_limit({self.memory_limit_mb})"
+        )
 
-        # Ensure we can talk to it
+    def _start(self):
         try:
-            self.kc.wait_for_ready(timeout=60)
+            self.km, self.kc = self.pool.acquire()
             print("Jupyter Kernel Started.")
-        except RuntimeError:
-            print("Error parsing kernel connection, or timeout.")
-            # Fallback or retry logic could go here
+        except queue.Empty:
+            print("Error: no warm kernel became ready in time.")
+            raise
+        if self.session_id is not None:
+            self.bind_session(self.session_id)
+
+    def bind_session(self, session_id: str):
+        """
+        Tags jobs submitted from the kernel with the session. Pooled kernels boot
+        before they are leased, so this runs again after every restart.
+        """
+        self.session_id = session_id
+        self.execute(f"_autods_session_id = {session_id!r}", record=False)
+
+    def is_alive(self) -> bool:
+        return self.km.is_alive()
+
+    # --- RESOURCE ACCOUNTING ---
+
+    def _kernel_process(self):
+        """psutil handle on the kernel subprocess (None if unavailable)."""
+        try:
+            provisioner = getattr(self.km, "provisioner", None)
+            process = provisioner.process if provisioner else self.km.kernel
+            return psutil.Process(process.pid)
+        except Exception:
+            return None
+
+    def _cpu_seconds(self, proc) -> float:
+        try:
+            t = proc.cpu_times()
+            return t.user + t.system + t.children_user + t.children_system
+        except Exception:
+            return 0.0
+
+    def _sample_usage(self, proc, cpu_start: float, usage: Dict[str, Any]):
+        if proc is None:
+            return
+        usage["cpu_seconds"] = round(self._cpu_seconds(proc) - cpu_start, 3)
+        try:
+            rss_mb = proc.memory_info().rss / 1024**2
+            usage["peak_rss_mb"] = round(max(usage["peak_rss_mb"], rss_mb), 1)
+        except Exception:
+            pass
+
+    def _check_limits(
+        self, usage: Dict[str, Any], timeout: float, enforce_cpu: bool
+    ) -> str:
+        """Returns a description of the first exceeded limit, or None."""
+        if usage["wall_seconds"] > timeout:
+            return f"wall time > {timeout}s"
+        if enforce_cpu and self.cpu_limit_seconds and (
+            usage["cpu_seconds"] > self.cpu_limit_seconds
+        ):
+            return f"CPU time > {self.cpu_limit_seconds}s"
+        if self.memory_limit_mb and usage["peak_rss_mb"] > self.memory_limit_mb:
+            return f"memory > {self.memory_limit_mb} MB"
+        if self.output_limit_bytes and usage["output_bytes"] > self.output_limit_bytes:
+            return f"output > {self.output_limit_bytes} bytes"
+        return None
+
+    def _stop_execution(self, msg_id: str, limit: str):
+        """Interrupts the running cell; restarts (with restore) if it does not stop."""
+        if limit.startswith("memory"):
+            # Interrupting does not give the memory back
+            self._recover()
+            return
+
+        try:
+            self.km.interrupt_kernel()
+            deadline = time.time() + 5
+            while time.time() < deadline:
+                try:
+                    msg = self.kc.get_iopub_msg(timeout=0.5)
+                except queue.Empty:
+                    continue
+                if (
+                    msg.get("parent_header", {}).get("msg_id") == msg_id
+                    and msg["header"]["msg_type"] == "status"
+                    and msg["content"]["execution_state"] == "idle"
+                ):
+                    return
+        except Exception as e:
+            print(f"Kernel interrupt error: {e}")
+
+        self._recover()
+
+    def restart(self):
+        """Replaces the kernel with a fresh one (all namespace state is lost)."""
+        try:
+            self.kc.stop_channels()
+            self.km.shutdown_kernel(now=True)
+        except Exception as e:
+            print(f"Kernel shutdown error: {e}")
+        self.replay_seconds = 0.0
+        self._start()
+
+    def _recover(self):
+        """
+        Restarts a dead kernel and restores the last checkpoint, if any. Lazy frames
+        are not snapshotted, so the dataset is re-opened when `df` was not restored.
+        """
+        print("Kernel died. Restarting...")
+        self.restart()
+        restored = {}
+        if self.checkpoint_dir:
+            restored = self.restore(self.checkpoint_dir)
+            print(f"Kernel state restored: {restored}")
+        if self.load_cmd and "df" not in restored.get("variables", []):
+            result = self.execute(self.load_cmd, timeout=self.load_timeout, record=False)
+            if result["error"]:
+                print(f"Dataset reload error: {result['error']}")
+
+    # --- CHECKPOINTING ---
+
+    def _run_json(self, code: str) -> Dict[str, Any]:
+        """Executes helper code that prints a single JSON line as its result."""
+        result = self.execute(code, timeout=300, record=False)
+        if result["error"]:
+            return {"error": result["error"]}
+        try:
+            return json.loads(result["output"].splitlines()[-1])
+        except (ValueError, IndexError):
+            return {"error": f"Unexpected helper output: {result['output'][:200]}"}
+
+    def checkpoint(self, checkpoint_dir: str) -> Dict[str, Any]:
+        """Snapshots DataFrames and fitted models from the kernel namespace to disk."""
+        result = self._run_json(
+            "import json as _json\n"
+            "from kernel_runtime.checkpoint import save_checkpoint as _save_checkpoint\n"
+            f"print(_json.dumps(_save_checkpoint(globals(), r'{checkpoint_dir}')))"
+        )
+        self.last_checkpoint = time.time()
+        return result
+
+    def maybe_checkpoint(self) -> Dict[str, Any]:
+        """Checkpoints if the configured interval has elapsed since the last one."""
+        if not self.checkpoint_dir:
+            return None
+        if time.time() - self.last_checkpoint < self.checkpoint_interval:
+            return None
+        return self.checkpoint(self.checkpoint_dir)
 
-    def execute(self, code: str, timeout: int = 30) -> Dict[str, Any]:
+    def restore(self, checkpoint_dir: str) -> Dict[str, Any]:
+        """Loads a snapshot into the (fresh) kernel namespace."""
+        return self._run_json(
+            "import json as _json\n"
+            "from kernel_runtime.checkpoint import restore_checkpoint as _restore_checkpoint\n"
+            f"print(_json.dumps(_restore_checkpoint(globals(), r'{checkpoint_dir}')))"
+        )
+
+    def execute(
+        self, code: str, timeout: int = 30, record: bool = True
+    ) -> Dict[str, Any]:
         """
         Executes code in the kernel and captures output (stdout, stderr, plots).
-        Injected logic captures 'fig' (Plotly) or 'plt' (Matplotlib) automatically.
+        A post_run_cell hook in the kernel captures new 'fig' (Plotly) or 'plt' (Matplotlib) figures.
+        `record=False` is used for internal helper calls (not counted as replayable work,
+        no CPU limit). Cells exceeding a resource limit are interrupted (or the kernel is
+        restarted) and the result carries `usage`: cpu_seconds, peak_rss_mb, output_bytes.
+        Output is head/tail-truncated to the output budget, the full text is spilled to
+        disk and referenced by `output_url`.
         """
-        # Append Plot Capture Wrapper
-        plot_catcher = """
-import json
-import base64
-import io
-import matplotlib.pyplot as plt
-
-# Check for Plotly 'fig'
-if 'fig' in locals() and hasattr(fig, 'to_json'):
-    print("PLOT_JSON_START")
-    print(fig.to_json())
-    print("PLOT_JSON_END")
-
-# Check for Matplotlib
-elif plt.get_fignums():
-    try:
-        buf = io.BytesIO()
-        plt.savefig(buf, format='png', bbox_inches='tight')
-        buf.seek(0)
-        img_str = base64.b64encode(buf.read()).decode('utf-8')
-        print("PLOT_IMG_START")
-        print(img_str)
-        print("PLOT_IMG_END")
-        plt.clf()
-    except Exception as e:
-        print(f"Plot Save Error: {e}")
-"""
-        full_code = code + "\n" + plot_catcher
-
-        self.kc.execute(full_code)
-
-        output_text = ""
+        with self._lock:
+            return self._execute(code, timeout, record)
+
+    def _execute(self, code: str, timeout: int, record: bool) -> Dict[str, Any]:
+        if not self.is_alive():
+            with tracing.span("kernel.recover"):
+                self._recover()
+
+        memoized = record and self.memo_mb > 0 and self._parses(code)
+        if memoized:
+            # Replays the cached result if the code and the variables it reads are
+            # unchanged (see kernel_runtime.memo)
+            self.memo_stats["cells"] += 1
+            code = f"_autods_memo.run({code!r}, globals())"
+
+        # Plot capture runs as a kernel hook (see kernel_runtime.plots), nothing is appended
+        msg_id = self.kc.execute(code)
+        self.progress = None
+        cell_timeout = timeout
+
+        capture = OutputCapture(self.outputs_dir, self.output_budget_bytes)
         plot_data = None
         error = None
+        memo_hit = None
+
+        usage = {
+            "cpu_seconds": 0.0,
+            "peak_rss_mb": 0.0,
+            "output_bytes": 0,
+            "wall_seconds": 0.0,
+        }
+        proc = self._kernel_process()
+        cpu_start = self._cpu_seconds(proc) if proc else 0.0
+        limit = None
 
         # Loop until we get the 'idle' status message
         start_time = time.time()
         while True:
-            if time.time() - start_time > timeout:
-                error = "Execution timed out."
+            usage["wall_seconds"] = round(time.time() - start_time, 3)
+            self._sample_usage(proc, cpu_start, usage)
+            limit = self._check_limits(
+                usage, cell_timeout, enforce_cpu=record and self.progress is None
+            )
+            if limit:
                 break
 
             try:
-                msg = self.kc.get_iopub_msg(timeout=1)
+                msg = self.kc.get_iopub_msg(timeout=0.2)
+                # Ignore leftovers from earlier (e.g. timed-out) executions
+                if msg.get("parent_header", {}).get("msg_id") != msg_id:
+                    continue
                 msg_type = msg["header"]["msg_type"]
                 content = msg["content"]
 
                 if msg_type == "stream":
                     text = content["text"]
 
+                    if memoized and MEMO_MARKER in text:
+                        match = MEMO_MARKER_RE.search(text)
+                        if match:
+                            memo_hit = float(match.group(1))
+                            text = text[: match.start()] + text[match.end() :]
+
+                    if PROGRESS_MARKER in text:
+                        for match in PROGRESS_RE.finditer(text):
+                            self.progress = {
+                                "fraction": float(match.group(1)),
+                                "message": match.group(2).strip(),
+                            }
+                        text = PROGRESS_RE.sub("", text)
+                        cell_timeout = min(
+                            usage["wall_seconds"] + timeout, self.progress_max_seconds
+                        )
+
                     # Check for Plotly Marker
                     if "PLOT_JSON_START" in text:
                         start = text.find("PLOT_JSON_START") + len("PLOT_JSON_START")
@@ -125,18 +388,21 @@ elif plt.get_fignums():
                                 .replace(b64_str, "")
                             )
 
-                    output_text += text
+                    capture.write(text)
+                    usage["output_bytes"] = capture.total_bytes
 
                 elif msg_type == "execute_result":
                     data = content.get("data", {})
                     if "text/plain" in data:
-                        output_text += str(data["text/plain"]) + "\n"
+                        text = str(data["text/plain"]) + "\n"
+                        capture.write(text)
+                        usage["output_bytes"] = capture.total_bytes
 
                 elif msg_type == "error":
                     error_name = content.get("ename", "Error")
                     error_val = content.get("evalue", "")
                     error = f"{error_name}: {error_val}\n"
-                    output_text += error
+                    capture.write(error)
 
                 elif msg_type == "status":
                     if content["execution_state"] == "idle":
@@ -147,7 +413,62 @@ elif plt.get_fignums():
                 print(f"Kernel loop error: {e}")
                 break
 
-        return {"output": output_text.strip(), "plot": plot_data, "error": error}
+        if limit:
+            error = f"ResourceLimitExceeded: {limit}. Execution was stopped."
+            capture.write("\n" + error)
+            self._stop_execution(msg_id, limit)
+
+        self._sample_usage(proc, cpu_start, usage)
+        usage["wall_seconds"] = round(time.time() - start_time, 3)
+
+        if record and not error:
+            self.replay_seconds += usage["wall_seconds"]
+        if memo_hit is not None:
+            self.memo_stats["hits"] += 1
+            self.memo_stats["saved_seconds"] += memo_hit
+
+        captured = capture.finish()
+        progress, self.progress = self.progress, None
+
+        tracing.record(
+            "kernel.execute",
+            time.time() - start_time,
+            cpu_seconds=usage["cpu_seconds"],
+            output_bytes=usage["output_bytes"],
+            plot=plot_data is not None,
+            error=error.split(":")[0] if error else None,
+            internal=not record,
+            memo_hit=memo_hit is not None,
+        )
+
+        return {
+            "output": captured["text"].strip(),
+            "output_truncated": captured["truncated"],
+            "output_url": (
+                f"/outputs/{captured['output_id']}" if captured["output_id"] else None
+            ),
+            "plot": plot_data,
+            "error": error,
+            "usage": usage,
+            "cached": memo_hit is not None,
+            "progress": progress,
+        }
+
+    @staticmethod
+    def _parses(code: str) -> bool:
+        """Plain Python only; cells with magics or top-level await run unwrapped."""
+        try:
+            # compile (unlike ast.parse) rejects `await` outside a function
+            compile(code, "<cell>", "exec")
+            return True
+        except (SyntaxError, ValueError):
+            return False
 
     def shutdown(self):
         self.km.shutdown_kernel()
+
+    @classmethod
+    def shutdown_pool(cls):
+        if cls._shared_pool is not None:
+            cls._shared_pool.shutdown()
+            cls._shared_pool = None
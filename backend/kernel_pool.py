@@ -0,0 +1,99 @@
+import queue
+import threading
+import time
+from typing import Any, Optional, Tuple
+
+# Upper bound of the backoff between failed warm-ups (seconds)
+MAX_RETRY_DELAY = 60.0
+
+
+class KernelPool:
+    """
+    Keeps pre-warmed ("zygote") kernels ready in the background.
+    Each spare kernel is started, bootstrapped and has the scientific stack imported
+    before it is handed out, so acquiring one is a queue pop instead of a cold boot.
+    """
+
+    def __init__(self, bootstrap_code: str, size: int = 1):
+        self.bootstrap_code = bootstrap_code
+        self.size = size
+        self._ready = queue.Queue()
+        self._closed = False
+
+        for _ in range(max(size, 1)):
+            self._spawn_async()
+
+    def _spawn_async(self):
+        threading.Thread(target=self._spawn, daemon=True).start()
+
+    def _spawn(self):
+        """Warms one spare kernel, retrying with exponential backoff until it boots."""
+        delay = 1.0
+        while not self._closed:
+            start = time.time()
+            kernel = self._boot()
+            if kernel is not None:
+                break
+            print(f"Retrying kernel warm-up in {delay:.0f}s.")
+            time.sleep(delay)
+            delay = min(delay * 2, MAX_RETRY_DELAY)
+        else:
+            return
+
+        km, kc = kernel
+        if self._closed:
+            kc.stop_channels()
+            km.shutdown_kernel(now=True)
+            return
+
+        print(f"Warm kernel ready ({time.time() - start:.1f}s).")
+        self._ready.put((km, kc))
+
+    def _boot(self) -> Optional[Tuple[Any, Any]]:
+        """Starts and bootstraps a kernel; None (nothing left running) on failure."""
+        km = kc = None
+        try:
+            # Imported here: the first spare warms up after the server has started
+            from jupyter_client import KernelManager as JKManager
+
+            km = JKManager(kernel_name="python3")
+            # This will launch the kernel subprocess
+            km.start_kernel()
+            kc = km.client()
+            kc.start_channels()
+            kc.wait_for_ready(timeout=60)
+
+            # Blocks until the preload cell finishes (its output is not echoed)
+            reply = kc.execute_interactive(
+                self.bootstrap_code, timeout=300, output_hook=lambda msg: None
+            )
+            if reply["content"]["status"] != "ok":
+                print(f"Kernel bootstrap error: {reply['content'].get('evalue')}")
+            return km, kc
+        except Exception as e:
+            print(f"Error pre-warming kernel: {e}")
+            try:
+                if kc is not None:
+                    kc.stop_channels()
+                if km is not None and km.has_kernel:
+                    km.shutdown_kernel(now=True)
+            except Exception:
+                pass
+            return None
+
+    def acquire(self, timeout: float = 120) -> Tuple[Any, Any]:
+        """Returns a warm (km, kc) pair and starts warming its replacement."""
+        while True:
+            km, kc = self._ready.get(timeout=timeout)
+            self._spawn_async()
+            if km.is_alive():
+                return km, kc
+            # Spare died while idle, take the next one
+            kc.stop_channels()
+
+    def shutdown(self):
+        self._closed = True
+        while not self._ready.empty():
+            km, kc = self._ready.get_nowait()
+            kc.stop_channels()
+            km.shutdown_kernel(now=True)
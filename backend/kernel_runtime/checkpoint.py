@@ -0,0 +1,122 @@
+"""
+Kernel namespace snapshots.
+This module is imported INSIDE the Jupyter kernel (see KernelManager), not by the backend.
+"""
+
+import os
+import json
+import time
+import shutil
+import types
+from typing import Dict, Any
+
+MANIFEST = "manifest.json"
+
+
+def _kind(value) -> str:
+    """Classifies a namespace value as something worth persisting (or None)."""
+    import numpy as np
+    import pandas as pd
+
+    if isinstance(value, pd.DataFrame):
+        return "dataframe"
+    if isinstance(value, (pd.Series, np.ndarray)):
+        return "array"
+    # Fitted estimators (sklearn-style API), but not classes or modules
+    if (
+        not isinstance(value, (type, types.ModuleType))
+        and hasattr(value, "fit")
+        and (hasattr(value, "predict") or hasattr(value, "transform"))
+    ):
+        return "model"
+    return None
+
+
+def save_checkpoint(namespace: Dict[str, Any], checkpoint_dir: str) -> Dict[str, Any]:
+    """
+    Persists DataFrames (Parquet), arrays and fitted models (joblib) from the namespace.
+    The snapshot is written to a temp dir and swapped in atomically.
+    """
+    import joblib
+
+    start = time.time()
+    tmp_dir = checkpoint_dir + ".tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+
+    entries = []
+    for name, value in list(namespace.items()):
+        if name.startswith("_"):
+            continue
+        kind = _kind(value)
+        if kind is None:
+            continue
+
+        try:
+            if kind == "dataframe":
+                filename = f"{name}.parquet"
+                try:
+                    value.to_parquet(os.path.join(tmp_dir, filename))
+                except Exception:
+                    # Non-string column names, mixed object columns, ...
+                    filename = f"{name}.pkl"
+                    value.to_pickle(os.path.join(tmp_dir, filename))
+            else:
+                filename = f"{name}.joblib"
+                joblib.dump(value, os.path.join(tmp_dir, filename), compress=3)
+        except Exception as e:
+            print(f"Checkpoint skipped '{name}': {e}")
+            continue
+
+        entries.append(
+            {
+                "name": name,
+                "kind": kind,
+                "file": filename,
+                "bytes": os.path.getsize(os.path.join(tmp_dir, filename)),
+            }
+        )
+
+    with open(os.path.join(tmp_dir, MANIFEST), "w", encoding="utf-8") as f:
+        json.dump({"created": time.time(), "entries": entries}, f)
+
+    shutil.rmtree(checkpoint_dir, ignore_errors=True)
+    os.replace(tmp_dir, checkpoint_dir)
+
+    return {
+        "variables": [e["name"] for e in entries],
+        "bytes": sum(e["bytes"] for e in entries),
+        "seconds": round(time.time() - start, 3),
+    }
+
+
+def restore_checkpoint(
+    namespace: Dict[str, Any], checkpoint_dir: str
+) -> Dict[str, Any]:
+    """Loads every variable recorded in the manifest back into the namespace."""
+    import joblib
+    import pandas as pd
+
+    start = time.time()
+    manifest_path = os.path.join(checkpoint_dir, MANIFEST)
+    if not os.path.exists(manifest_path):
+        return {"error": "No checkpoint found"}
+
+    with open(manifest_path, "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+
+    restored = []
+    for entry in manifest["entries"]:
+        path = os.path.join(checkpoint_dir, entry["file"])
+        try:
+            if entry["file"].endswith(".parquet"):
+                namespace[entry["name"]] = pd.read_parquet(path)
+            elif entry["file"].endswith(".pkl"):
+                namespace[entry["name"]] = pd.read_pickle(path)
+            else:
+                namespace[entry["name"]] = joblib.load(path)
+            restored.append(entry["name"])
+        except Exception as e:
+            print(f"Restore skipped '{entry['name']}': {e}")
+
+    return {"variables": restored, "seconds": round(time.time() - start, 3)}
@@ -0,0 +1,188 @@
+"""
+Fast SHAP explanations, preloaded in every kernel as `explain_model`.
+Imported INSIDE the Jupyter kernel.
+"""
+
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Any
+
+from model_registry import dataset_hash
+
+CACHE_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "cache", "shap"
+)
+
+# In-process cache: key -> shap.Explanation
+_cache: Dict[str, Any] = {}
+
+
+class _PredictFn:
+    """Picklable model output used by KernelExplainer workers (last-class probability for classifiers)."""
+
+    def __init__(self, model):
+        self.model = model
+
+    def __call__(self, X):
+        if hasattr(self.model, "predict_proba"):
+            return self.model.predict_proba(X)[:, -1]
+        return self.model.predict(X)
+
+
+def _kernel_shap_chunk(model, background, chunk, nsamples):
+    import shap
+
+    explainer = shap.KernelExplainer(_PredictFn(model), background)
+    return explainer.shap_values(chunk, nsamples=nsamples, silent=True)
+
+
+def _single_output(values, base_values):
+    """
+    Multi-class outputs -> explain the last class (matches _PredictFn).
+    Older shap returns one (N, F) array per class; newer shap returns (N, F, C).
+    """
+    import numpy as np
+
+    if isinstance(values, list):
+        values = values[-1]
+    values = np.asarray(values)
+    base_values = np.asarray(base_values)
+    if values.ndim == 3:
+        values = values[:, :, -1]
+    if base_values.ndim >= 1 and base_values.shape[-1] > 1:
+        base_values = base_values[..., -1]
+    return values, base_values
+
+
+def _final_estimator(model, X, feature_names):
+    """
+    Pipelines (train_model saves encoder + estimator) are explained through their
+    last step, on the matrix their preprocessing steps produce from `X`.
+    Returns (estimator, X, feature_names).
+    """
+    import numpy as np
+
+    while hasattr(model, "steps"):
+        if len(model.steps) > 1:
+            preprocess = model[:-1]
+            X = preprocess.transform(X)
+            X = np.asarray(X.toarray() if hasattr(X, "toarray") else X)
+            # Steps that keep one column per input (TabularEncoder, scalers) keep names
+            if not feature_names or len(feature_names) != X.shape[1]:
+                try:
+                    feature_names = list(preprocess.get_feature_names_out())
+                except Exception:
+                    feature_names = None
+        model = model.steps[-1][1]
+    return model, X, feature_names
+
+
+def _exact_explanation(model, X, background):
+    """Tree / Linear explainers are exact and fast; returns (values, base, method) or None."""
+    import numpy as np
+    import shap
+
+    try:
+        explainer = shap.TreeExplainer(model)
+        method = "tree"
+    except Exception:
+        if not hasattr(model, "coef_"):
+            return None
+        try:
+            explainer = shap.LinearExplainer(model, background)
+            method = "linear"
+        except Exception:
+            return None
+
+    values, base = _single_output(explainer.shap_values(X), explainer.expected_value)
+    base = np.broadcast_to(base, (len(X),))
+    return values, base, method
+
+
+def explain_model(
+    model,
+    X,
+    max_rows: int = 1000,
+    background_size: int = 50,
+    nsamples: int = 200,
+    n_jobs: int = None,
+    plot: bool = True,
+):
+    """
+    Returns a shap.Explanation for `model` on (a sample of) `X` and draws a beeswarm plot.
+    - Tree / Linear models use the exact explainer on up to `max_rows` rows.
+    - Anything else uses KernelExplainer with a k-means summarized background,
+      spread over a process pool (`n_jobs`, default: all cores).
+    - Pipelines are explained through their final estimator, on transformed features.
+    Results are cached by model hash + data hash (memory and cache/shap/).
+    """
+    import joblib
+    import numpy as np
+    import pandas as pd
+    import shap
+
+    if len(X) > max_rows:
+        if hasattr(X, "sample"):
+            X = X.sample(max_rows, random_state=42)
+        else:
+            X = X[:max_rows]
+
+    key = f"{joblib.hash(model)}-{dataset_hash(X)}-{background_size}-{nsamples}"
+    cache_path = os.path.join(CACHE_DIR, f"{key}.joblib")
+    if key not in _cache and os.path.exists(cache_path):
+        _cache[key] = joblib.load(cache_path)
+
+    if key in _cache:
+        explanation = _cache[key]
+        print("SHAP: cache hit.")
+    else:
+        start = time.time()
+        feature_names = list(X.columns) if isinstance(X, pd.DataFrame) else None
+        estimator, X, feature_names = _final_estimator(model, X, feature_names)
+        X_values = X.to_numpy() if isinstance(X, pd.DataFrame) else np.asarray(X)
+
+        # The linear explainer only needs the feature means: X itself is the background
+        result = _exact_explanation(estimator, X, X_values)
+        if result is not None:
+            values, base, method = result
+        else:
+            method = "kernel"
+            background = shap.kmeans(X_values, min(background_size, len(X_values)))
+            n_jobs = n_jobs or os.cpu_count() or 1
+            chunks = np.array_split(X_values, max(1, min(n_jobs, len(X_values))))
+            with ProcessPoolExecutor(max_workers=len(chunks)) as pool:
+                parts = pool.map(
+                    _kernel_shap_chunk,
+                    [estimator] * len(chunks),
+                    [background] * len(chunks),
+                    chunks,
+                    [nsamples] * len(chunks),
+                )
+                values = np.vstack(list(parts))
+            expected = np.average(
+                _PredictFn(estimator)(background.data), weights=background.weights
+            )
+            base = np.full(len(X_values), expected)
+
+        explanation = shap.Explanation(
+            values=values,
+            base_values=base,
+            data=X_values,
+            feature_names=feature_names,
+        )
+        _cache[key] = explanation
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        joblib.dump(explanation, cache_path)
+        print(
+            f"SHAP: {method} explainer on {len(X_values)} rows in {time.time() - start:.1f}s."
+        )
+
+    if plot:
+        import matplotlib.pyplot as plt
+
+        plt.figure()
+        shap.plots.beeswarm(explanation, show=False)
+        plt.tight_layout()
+
+    return explanation
@@ -0,0 +1,26 @@
+"""
+Per-kernel memory cap.
+Imported INSIDE the Jupyter kernel: allocations far beyond the cap raise MemoryError in
+the offending cell instead of exhausting host RAM.
+"""
+
+# RLIMIT_DATA also counts private anonymous mappings that are reserved but never
+# touched (malloc arenas, BLAS thread buffers), so it sits well above the RSS budget.
+# The budget itself is enforced by the backend's RSS sampler (KernelManager).
+DATA_HEADROOM = 2.0
+
+
+def apply_memory_limit(limit_mb: float, headroom: float = DATA_HEADROOM):
+    """Caps the kernel's data segment (no-op where `resource` is unavailable, e.g. Windows)."""
+    if not limit_mb:
+        return
+    try:
+        import resource
+    except ImportError:
+        return
+
+    limit = int(limit_mb * headroom * 1024 * 1024)
+    try:
+        resource.setrlimit(resource.RLIMIT_DATA, (limit, limit))
+    except (ValueError, OSError) as e:
+        print(f"Memory limit not applied: {e}")
@@ -0,0 +1,89 @@
+"""
+Plot capture hook, installed once in every kernel.
+Imported INSIDE the Jupyter kernel; output is parsed by KernelManager.execute.
+"""
+
+import io
+import base64
+import hashlib
+
+# Fingerprint of the last emitted Plotly figure (see _plotly_fingerprint)
+_last_plotly = None
+
+
+def install(ip):
+    """Registers the capture as a post_run_cell hook (idempotent)."""
+    callbacks = ip.events.callbacks["post_run_cell"]
+    if _post_run_cell not in callbacks:
+        ip.events.register("post_run_cell", _post_run_cell)
+
+
+def _post_run_cell(result=None):
+    from IPython import get_ipython
+
+    emit_plots(get_ipython().user_ns)
+
+
+# Sequences longer than this are fingerprinted by identity and length, not content
+_INLINE_ITEMS = 100
+
+
+def _signature(value):
+    """Property tree with large arrays replaced by (id, shape): cheap to hash."""
+    if isinstance(value, dict):
+        return {key: _signature(item) for key, item in value.items()}
+    if hasattr(value, "shape"):
+        return ("array", id(value), value.shape)
+    if isinstance(value, (list, tuple)):
+        if len(value) > _INLINE_ITEMS:
+            return ("array", id(value), len(value))
+        return [_signature(item) for item in value]
+    return value
+
+
+def _plotly_fingerprint(fig):
+    """
+    Cheap identity of a Plotly figure: the object, plus its layout and the
+    properties of each trace with data arrays reduced to their identity and shape.
+    Reads the figure's own property dicts (to_plotly_json deep-copies the data).
+    """
+    props = {"layout": fig._layout, "data": fig._data}
+    digest = hashlib.sha1(repr(_signature(props)).encode("utf-8")).hexdigest()
+    return (id(fig), digest)
+
+
+def emit_plots(namespace):
+    """
+    Prints the Plotly `fig` (JSON) or open Matplotlib figures (PNG) between markers.
+    Only new or modified figures are emitted: a `fig` left over from an earlier cell
+    is skipped, and Matplotlib figures are closed once captured.
+    """
+    global _last_plotly
+    import matplotlib.pyplot as plt
+
+    fig = namespace.get("fig")
+
+    # Check for Plotly 'fig'
+    if fig is not None and hasattr(fig, "to_json"):
+        fingerprint = _plotly_fingerprint(fig)
+        if fingerprint != _last_plotly:
+            _last_plotly = fingerprint
+            print("PLOT_JSON_START")
+            print(fig.to_json())
+            print("PLOT_JSON_END")
+            return
+
+    # Check for Matplotlib
+    if plt.get_fignums():
+        try:
+            buf = io.BytesIO()
+            plt.savefig(buf, format="png", bbox_inches="tight")
+            buf.seek(0)
+            img_str = base64.b64encode(buf.read()).decode("utf-8")
+            print("PLOT_IMG_START")
+            print(img_str)
+            print("PLOT_IMG_END")
+        except Exception as e:
+            print(f"Plot Save Error: {e}")
+        finally:
+            plt.close("all")
@@ -0,0 +1,520 @@
+"""
+Scalable Path A training, preloaded in every kernel as `train_model`.
+Imported INSIDE the Jupyter kernel.
+
+1. A stratified test split is held out.
+2. Candidate models are compared on a stratified sample of the training rows, in
+   parallel worker processes.
+3. The winner is fitted on all training rows: in one go (loky processes for
+   estimators with n_jobs), with partial_fit over chunks for incremental learners,
+   or chunk by chunk with warm-started forests when the data is large.
+4. The fitted pipeline (encoder + model) is registered under backend/models/.
+
+Rows are addressed by position and only the rows a step needs are materialized, so
+the chunked fits never hold a second copy of the data. Polars LazyFrames (the
+out-of-core `df`) stay lazy: each chunk is read from the scan.
+
+The saved pipeline references `kernel_runtime.training.TabularEncoder`: to load a
+downloaded model outside AutoDS, put the repository's `backend/` directory on
+`sys.path` first (joblib imports the encoder's module when unpickling).
+
+Progress is reported as `AUTODS_PROGRESS <fraction> <message>` lines: the backend
+shows them in the chat and extends the cell's wall-time limit while they arrive.
+"""
+
+import os
+import time
+import threading
+from typing import Dict, Any, List
+
+import numpy as np
+import pandas as pd
+from sklearn.base import BaseEstimator, TransformerMixin, clone
+
+PROGRESS_MARKER = "AUTODS_PROGRESS"
+
+# Heartbeat interval while a single long fit runs
+HEARTBEAT_SECONDS = 5.0
+
+
+def report_progress(fraction: float, message: str = ""):
+    """Progress of the running cell (shown in the chat, keeps the cell alive)."""
+    fraction = max(0.0, min(1.0, fraction))
+    print(f"{PROGRESS_MARKER} {fraction:.4f} {message}", flush=True)
+
+
+class _Heartbeat:
+    """Repeats a progress report while a blocking call (e.g. `fit`) runs."""
+
+    def __init__(self, fraction: float, message: str):
+        self.fraction = fraction
+        self.message = message
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        start = time.time()
+        while not self._stop.wait(HEARTBEAT_SECONDS):
+            report_progress(
+                self.fraction, f"{self.message} ({time.time() - start:.0f}s)"
+            )
+
+    def __enter__(self):
+        report_progress(self.fraction, self.message)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+# --- FEATURES ---
+
+
+def _epoch_seconds(s: pd.Series) -> pd.Series:
+    if s.dt.tz is not None:
+        s = s.dt.tz_convert(None)
+    return (s - pd.Timestamp("1970-01-01")).dt.total_seconds()
+
+
+class TabularEncoder(BaseEstimator, TransformerMixin):
+    """
+    Turns any DataFrame into a float32 matrix: text/categorical columns become
+    category codes (unseen values -1), datetimes epoch seconds, missing numbers
+    the training median. Saved with the model, so it predicts on raw frames
+    (unpickling needs `kernel_runtime` importable, see the module docstring).
+    """
+
+    def fit(self, X, y=None):
+        X = pd.DataFrame(X)
+        self.columns_ = list(X.columns)
+        self.categories_ = {}
+        self.medians_ = {}
+        for col in self.columns_:
+            s = X[col]
+            if pd.api.types.is_datetime64_any_dtype(s):
+                s = _epoch_seconds(s)
+            elif not (
+                pd.api.types.is_numeric_dtype(s) or pd.api.types.is_bool_dtype(s)
+            ):
+                self.categories_[col] = pd.Index(s.dropna().astype(str).unique())
+                continue
+            median = pd.to_numeric(s, errors="coerce").astype("float64").median()
+            self.medians_[col] = 0.0 if pd.isna(median) else float(median)
+        return self
+
+    def transform(self, X):
+        X = pd.DataFrame(X)
+        out = np.empty((len(X), len(self.columns_)), dtype=np.float32)
+        for i, col in enumerate(self.columns_):
+            s = X[col]
+            if col in self.categories_:
+                out[:, i] = self.categories_[col].get_indexer(s.astype(str))
+                continue
+            if pd.api.types.is_datetime64_any_dtype(s):
+                s = _epoch_seconds(s)
+            values = pd.to_numeric(s, errors="coerce").astype("float64")
+            out[:, i] = values.fillna(self.medians_[col]).to_numpy()
+        return out
+
+
+# --- MODELS ---
+
+
+def _infer_task(y: pd.Series) -> str:
+    if pd.api.types.is_bool_dtype(y) or not pd.api.types.is_numeric_dtype(y):
+        return "classification"
+    # Integer labels become floats when the target had missing values
+    integral = pd.api.types.is_integer_dtype(y) or bool((y % 1 == 0).all())
+    if integral and y.nunique() <= 20:
+        return "classification"
+    return "regression"
+
+
+def default_candidates(task: str) -> Dict[str, Any]:
+    """Fast, robust baselines per task (the SGD ones can learn incrementally)."""
+    from sklearn.ensemble import (
+        HistGradientBoostingClassifier,
+        HistGradientBoostingRegressor,
+        RandomForestClassifier,
+        RandomForestRegressor,
+    )
+    from sklearn.linear_model import (
+        LogisticRegression,
+        Ridge,
+        SGDClassifier,
+        SGDRegressor,
+    )
+    from sklearn.pipeline import make_pipeline
+    from sklearn.preprocessing import StandardScaler
+
+    if task == "classification":
+        return {
+            "logistic_regression": make_pipeline(
+                StandardScaler(), LogisticRegression(max_iter=500)
+            ),
+            "sgd": make_pipeline(
+                StandardScaler(), SGDClassifier(loss="log_loss", random_state=42)
+            ),
+            "random_forest": RandomForestClassifier(n_estimators=200, random_state=42),
+            "hist_gradient_boosting": HistGradientBoostingClassifier(random_state=42),
+        }
+    return {
+        "ridge": make_pipeline(StandardScaler(), Ridge()),
+        "sgd": make_pipeline(StandardScaler(), SGDRegressor(random_state=42)),
+        "random_forest": RandomForestRegressor(n_estimators=200, random_state=42),
+        "hist_gradient_boosting": HistGradientBoostingRegressor(random_state=42),
+    }
+
+
+def _steps(model) -> List[Any]:
+    return [step for _, step in model.steps] if hasattr(model, "steps") else [model]
+
+
+def _is_incremental(model) -> bool:
+    """Every step supports partial_fit (e.g. StandardScaler + SGD)."""
+    return all(hasattr(step, "partial_fit") for step in _steps(model))
+
+
+def _is_forest(model) -> bool:
+    from sklearn.ensemble._forest import BaseForest
+
+    return isinstance(model, BaseForest)
+
+
+def _metrics(task: str, y_true, y_pred) -> Dict[str, float]:
+    from sklearn import metrics
+
+    if task == "classification":
+        return {
+            "accuracy": round(float(metrics.accuracy_score(y_true, y_pred)), 4),
+            "f1_macro": round(
+                float(metrics.f1_score(y_true, y_pred, average="macro")), 4
+            ),
+        }
+    return {
+        "r2": round(float(metrics.r2_score(y_true, y_pred)), 4),
+        "rmse": round(float(np.sqrt(metrics.mean_squared_error(y_true, y_pred))), 4),
+        "mae": round(float(metrics.mean_absolute_error(y_true, y_pred)), 4),
+    }
+
+
+def _selection_score(task: str, scores: Dict[str, float]) -> float:
+    return scores["f1_macro"] if task == "classification" else scores["r2"]
+
+
+def _evaluate(name, model, task, X_fit, y_fit, X_valid, y_valid) -> Dict[str, Any]:
+    """Fits one candidate on the selection sample (runs in a worker process)."""
+    start = time.time()
+    try:
+        model.fit(X_fit, y_fit)
+        scores = _metrics(task, y_valid, model.predict(X_valid))
+    except Exception as e:
+        return {"name": name, "error": f"{type(e).__name__}: {e}"}
+    return {"name": name, "seconds": round(time.time() - start, 2), **scores}
+
+
+# --- ROWS ---
+
+
+class _Rows:
+    """
+    Positional row access to the training data without copying it: pandas and
+    Polars frames are indexed in place, LazyFrames read only the requested rows.
+    """
+
+    def __init__(self, X):
+        self.data = X
+        if hasattr(X, "collect"):
+            self.kind = "lazy"
+            self.columns = list(X.collect_schema().names())
+        elif type(X).__module__.startswith("polars"):
+            self.kind = "polars"
+            self.columns = list(X.columns)
+        else:
+            self.kind = "pandas"
+            self.data = X if isinstance(X, pd.DataFrame) else pd.DataFrame(X)
+            self.columns = list(self.data.columns)
+
+    def __len__(self) -> int:
+        if self.kind == "lazy":
+            import polars as pl
+
+            return self.data.select(pl.len()).collect().item()
+        return len(self.data)
+
+    def take(self, positions) -> pd.DataFrame:
+        """The rows at `positions`, in that order, as a pandas DataFrame."""
+        positions = np.asarray(positions)
+        if self.kind == "pandas":
+            return self.data.iloc[positions]
+        if self.kind == "polars":
+            return self.data[positions].to_pandas()
+
+        import polars as pl
+
+        order = np.argsort(positions, kind="stable")
+        row = "__autods_row"
+        frame = (
+            self.data.with_row_index(row)
+            .filter(pl.col(row).is_in(positions[order].tolist()))
+            .drop(row)
+            .collect()
+            .to_pandas()
+        )
+        # Scanned in file order, put back in the requested order
+        return frame.iloc[np.argsort(order)].reset_index(drop=True)
+
+
+def _target(y) -> pd.Series:
+    if hasattr(y, "collect"):
+        y = y.collect()
+    if hasattr(y, "to_series"):
+        y = y.to_series()  # One-column Polars frame
+    if hasattr(y, "to_pandas"):
+        y = y.to_pandas()
+    if isinstance(y, pd.DataFrame):
+        y = y.iloc[:, 0]
+    if isinstance(y, pd.Series):
+        return y.reset_index(drop=True)
+    return pd.Series(np.asarray(y))
+
+
+# --- SAMPLING ---
+
+
+def _split_index(y: np.ndarray, size: int, stratify: bool, seed: int = 42):
+    """(rest, part) row positions, `part` has `size` rows; stratified when possible."""
+    from sklearn.model_selection import train_test_split
+
+    positions = np.arange(len(y))
+    if stratify:
+        try:
+            return train_test_split(
+                positions, test_size=size, stratify=y, random_state=seed
+            )
+        except ValueError:
+            pass  # A class is too small to be split
+    return train_test_split(positions, test_size=size, random_state=seed)
+
+
+def _chunks(n_rows: int, chunk_size: int, seed: int = 42) -> List[np.ndarray]:
+    """Shuffled row positions in chunks (each chunk is a random sample)."""
+    order = np.random.default_rng(seed).permutation(n_rows)
+    return np.array_split(order, max(1, -(-n_rows // chunk_size)))
+
+
+# --- FINAL FIT ---
+
+
+def _fit_incremental(model, rows, y, encoder, chunks, classes, epochs: int):
+    """
+    partial_fit over chunks (row positions into `rows`, target values in `y`):
+    transformers first (one pass), then the estimator.
+    """
+    steps = _steps(model)
+    for step in steps[:-1]:
+        for chunk, _ in chunks:
+            Xc = encoder.transform(rows.take(chunk))
+            for previous in steps[: steps.index(step)]:
+                Xc = previous.transform(Xc)
+            step.partial_fit(Xc)
+
+    estimator = steps[-1]
+    kwargs = {"classes": classes} if classes is not None else {}
+    total = len(chunks) * epochs
+    for epoch in range(epochs):
+        for i, (chunk, targets) in enumerate(chunks):
+            Xc = encoder.transform(rows.take(chunk))
+            for step in steps[:-1]:
+                Xc = step.transform(Xc)
+            estimator.partial_fit(Xc, y[targets], **kwargs)
+            done = epoch * len(chunks) + i + 1
+            report_progress(
+                0.4 + 0.5 * done / total,
+                f"partial_fit chunk {done}/{total} ({len(chunk):,} rows)",
+            )
+
+
+def _fit_forest_chunks(model, rows, y, encoder, chunks, n_jobs: int):
+    """Grows the forest chunk by chunk: each chunk adds trees trained on it."""
+    import joblib
+
+    per_chunk = max(1, model.n_estimators // len(chunks))
+    model.set_params(warm_start=True, n_estimators=0)
+    for i, (chunk, targets) in enumerate(chunks):
+        model.set_params(n_estimators=model.n_estimators + per_chunk)
+        with joblib.parallel_backend("loky", n_jobs=n_jobs):
+            model.fit(encoder.transform(rows.take(chunk)), y[targets])
+        report_progress(
+            0.4 + 0.5 * (i + 1) / len(chunks),
+            f"Forest chunk {i + 1}/{len(chunks)}: {model.n_estimators} trees",
+        )
+    model.set_params(warm_start=False)
+
+
+def train_model(
+    X,
+    y,
+    name: str,
+    task: str = None,
+    candidates: Dict[str, Any] = None,
+    sample_size: int = 20_000,
+    test_size: float = 0.2,
+    max_test_rows: int = 100_000,
+    incremental_above: int = None,
+    chunk_size: int = 100_000,
+    epochs: int = 1,
+    n_jobs: int = None,
+    save: bool = True,
+) -> Dict[str, Any]:
+    """
+    Selects, fits and registers a model on tabular data, with progress reports.
+    task: "classification" / "regression" (inferred from y by default).
+    candidates: {name: estimator} compared on `sample_size` stratified rows.
+    Above `incremental_above` training rows the final fit is chunked (partial_fit
+    or warm-started forests); other models are fitted on a sample of that size.
+    Returns model (encoder + estimator pipeline), task, strategy, selection
+    scores, test metrics and the registry entry.
+    """
+    import joblib
+    from sklearn.pipeline import Pipeline
+
+    start = time.time()
+    n_jobs = n_jobs or int(os.getenv("AUTODS_TRAIN_JOBS", os.cpu_count() or 1))
+    incremental_above = incremental_above or int(
+        os.getenv("AUTODS_TRAIN_INCREMENTAL_ROWS", "1000000")
+    )
+
+    report_progress(0.0, "Preparing data")
+    rows = _Rows(X)
+    y = _target(y)
+    if len(y) != len(rows):
+        raise ValueError(f"X has {len(rows):,} rows but y has {len(y):,}")
+    # Rows with a target, as positions into X (X itself is never copied)
+    labelled = np.flatnonzero(y.notna().to_numpy())
+    y = y.iloc[labelled].reset_index(drop=True)
+
+    task = task or _infer_task(y)
+    stratify = task == "classification"
+    y_values = y.to_numpy()
+
+    # 1. Held-out test rows (train_idx / test_idx index y_values and `labelled`)
+    test_rows = max(1, min(int(len(y) * test_size), max_test_rows))
+    train_idx, test_idx = _split_index(y_values, test_rows, stratify)
+    y_train = y_values[train_idx]
+    n_train = len(train_idx)
+
+    # The encoder is fitted on at most `incremental_above` training rows
+    encoder_idx = np.arange(n_train)
+    if n_train > incremental_above:
+        _, encoder_idx = _split_index(y_train, incremental_above, stratify)
+    encoder = TabularEncoder().fit(rows.take(labelled[train_idx[encoder_idx]]))
+
+    # 2. Model selection on a stratified sample, one worker process per candidate
+    candidates = candidates or default_candidates(task)
+    sample = np.arange(n_train)
+    if n_train > sample_size:
+        _, sample = _split_index(y_train, sample_size, stratify)
+    fit_pos, valid_pos = _split_index(
+        y_train[sample], max(1, len(sample) // 4), stratify
+    )
+    X_sample = encoder.transform(rows.take(labelled[train_idx[sample]]))
+    y_sample = y_train[sample]
+    with _Heartbeat(
+        0.1, f"Comparing {len(candidates)} models on {len(sample):,} sampled rows"
+    ):
+        scores = joblib.Parallel(n_jobs=min(n_jobs, len(candidates)), backend="loky")(
+            joblib.delayed(_evaluate)(
+                label,
+                clone(model),
+                task,
+                X_sample[fit_pos],
+                y_sample[fit_pos],
+                X_sample[valid_pos],
+                y_sample[valid_pos],
+            )
+            for label, model in candidates.items()
+        )
+    del X_sample
+    ranked = sorted(
+        (s for s in scores if "error" not in s),
+        key=lambda s: _selection_score(task, s),
+        reverse=True,
+    )
+    if not ranked:
+        raise RuntimeError(f"Every candidate failed: {scores}")
+    best = ranked[0]["name"]
+    best_score = _selection_score(task, ranked[0])
+    report_progress(0.35, f"Selected {best} (validation score {best_score:.4f})")
+
+    # 3. Final fit on all training rows. Chunks are (row positions in X, positions
+    # in y_train) pairs, read one at a time.
+    model = clone(candidates[best])
+    chunks = [(labelled[train_idx[c]], c) for c in _chunks(n_train, chunk_size)]
+    if n_train <= incremental_above:
+        strategy = "full"
+        with _Heartbeat(0.4, f"Fitting {best} on {n_train:,} rows"):
+            X_train = encoder.transform(rows.take(labelled[train_idx]))
+            with joblib.parallel_backend("loky", n_jobs=n_jobs):
+                model.fit(X_train, y_train)
+            del X_train
+    elif _is_incremental(model):
+        strategy = "incremental"
+        classes = np.unique(y_train) if task == "classification" else None
+        _fit_incremental(model, rows, y_train, encoder, chunks, classes, epochs)
+    elif _is_forest(model) and (
+        task == "regression"
+        or all(
+            len(np.unique(y_train[c])) == len(np.unique(y_train)) for _, c in chunks
+        )
+    ):
+        strategy = "chunked_forest"
+        _fit_forest_chunks(model, rows, y_train, encoder, chunks, n_jobs)
+    else:
+        strategy = "sampled"
+        fit_rows = encoder_idx  # Already a stratified sample of that size
+        with _Heartbeat(0.4, f"Fitting {best} on {len(fit_rows):,} sampled rows"):
+            X_fit = encoder.transform(rows.take(labelled[train_idx[fit_rows]]))
+            with joblib.parallel_backend("loky", n_jobs=n_jobs):
+                model.fit(X_fit, y_train[fit_rows])
+            del X_fit
+
+    pipeline = Pipeline([("encode", encoder), ("model", model)])
+
+    # 4. Test metrics and registration
+    report_progress(0.9, "Evaluating on held-out rows")
+    X_test = rows.take(labelled[test_idx])
+    metrics = _metrics(task, y_values[test_idx], pipeline.predict(X_test))
+    del X_test
+    seconds = round(time.time() - start, 2)
+
+    entry = None
+    if save:
+        from model_registry import ModelRegistry
+
+        report_progress(0.95, "Saving model")
+        # Only in-memory pandas data is hashed (hashing reads every row)
+        dataset = rows.data if rows.kind == "pandas" else None
+        entry = ModelRegistry().save(
+            pipeline, name, dataset=dataset, training_seconds=seconds
+        )
+    report_progress(1.0, "Done")
+
+    print(
+        f"Trained '{name}': {best} ({strategy}, {n_train:,} rows) in {seconds}s. "
+        f"Test metrics: {metrics}"
+    )
+    if entry:
+        print(f"Model '{name}' v{entry['version']} saved ({entry['size_bytes']} bytes)")
+    return {
+        "model": pipeline,
+        "task": task,
+        "best": best,
+        "strategy": strategy,
+        "selection": scores,
+        "metrics": metrics,
+        "entry": entry,
+        "seconds": seconds,
+    }
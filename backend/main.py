@@ -1,14 +1,28 @@
 import os
 import asyncio
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect, UploadFile, File
+import uuid
+from fastapi import (
+    FastAPI,
+    Query,
+    WebSocket,
+    WebSocketDisconnect,
+    UploadFile,
+    File,
+    Depends,
+    HTTPException,
+)
+from starlette.requests import HTTPConnection
 from fastapi.middleware.cors import CORSMiddleware
 from typing import List, Dict
-import pandas as pd
 import json
 from agent import AutoDSAgent
-from fastapi.responses import FileResponse, Response
-from notebook_generator import generate_notebook
+from session_manager import SessionManager, SessionLimitError
+from fastapi.responses import FileResponse, PlainTextResponse, JSONResponse
 from pydantic import BaseModel
+from job_queue import JobQueue, JobDispatcher, JobWatcher, JOBS_DIR
+from output_capture import OUTPUTS_DIR
+from data_loader import DatasetLoader
+import tracing
 
 app = FastAPI(title="AutoDS API")
 
@@ -27,8 +41,28 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Initialize Agent
-agent = AutoDSAgent()
+# Agents are addressed by session id (query `session_id` or `X-Session-Id` header).
+# Behind the coordinator, a session is always routed to the same worker process.
+# Nothing heavy happens at import time: the default session (kernel, vector store,
+# LLM client) is warmed up in the background once the server is up, see /ready.
+DEFAULT_SESSION = "default"
+sessions = SessionManager()
+
+
+def session_id_of(conn: HTTPConnection) -> str:
+    return (
+        conn.query_params.get("session_id")
+        or conn.headers.get("x-session-id")
+        or DEFAULT_SESSION
+    )
+
+
+def get_agent(conn: HTTPConnection) -> AutoDSAgent:
+    """Returns the agent of the caller's session, creating it on first use."""
+    try:
+        return sessions.get(session_id_of(conn))
+    except SessionLimitError as e:
+        raise HTTPException(status_code=503, detail=str(e))
 
 
 class DBConnectRequest(BaseModel):
@@ -44,16 +78,25 @@ class EDARequest(BaseModel):
     filename: str
 
 
+class JobRequest(BaseModel):
+    kind: str
+    payload: Dict
+    priority: int = 0
+
+
 class ConnectionManager:
     def __init__(self):
         self.active_connections: List[WebSocket] = []
+        self.session_of: Dict[WebSocket, str] = {}
 
-    async def connect(self, websocket: WebSocket):
+    async def connect(self, websocket: WebSocket, session_id: str = DEFAULT_SESSION):
         await websocket.accept()
         self.active_connections.append(websocket)
+        self.session_of[websocket] = session_id
 
     def disconnect(self, websocket: WebSocket):
         self.active_connections.remove(websocket)
+        self.session_of.pop(websocket, None)
 
     async def send_personal_message(self, message: str, websocket: WebSocket):
         await websocket.send_text(message)
@@ -66,14 +109,124 @@ class ConnectionManager:
 manager = ConnectionManager()
 
 
+async def broadcast_job(job: Dict):
+    """Pushes job progress/status changes to the clients of the job's session."""
+    message = json.dumps({"type": "job", "content": job})
+    session_id = job.get("session_id")
+    if not session_id:
+        return  # Not submitted from a session, nobody to notify
+    for connection in list(manager.active_connections):
+        if manager.session_of.get(connection) == session_id:
+            await manager.send_personal_message(message, connection)
+
+
+job_queue = JobQueue()
+job_dispatcher = JobDispatcher(job_queue, on_update=broadcast_job)
+
+
+@app.on_event("startup")
+async def start_job_dispatcher():
+    # With several workers, only one of them runs jobs (see coordinator.py), the
+    # others push the changes of their sessions' jobs from the job database
+    if os.getenv("AUTODS_RUN_JOBS", "1") == "1":
+        app.state.job_dispatcher_task = asyncio.create_task(job_dispatcher.run())
+    else:
+        watcher = JobWatcher(job_queue, on_update=broadcast_job)
+        app.state.job_watcher_task = asyncio.create_task(watcher.run())
+
+
+@app.on_event("startup")
+async def start_session_reaper():
+    app.state.session_reaper_task = asyncio.create_task(sessions.reap_forever())
+
+
+@app.on_event("startup")
+async def start_warm_up():
+    # AUTODS_WARM_ON_START=0 keeps everything lazy (created by the first request).
+    # Behind the coordinator, only the worker owning the default session creates
+    # it; the others only warm their kernel pool.
+    if os.getenv("AUTODS_WARM_ON_START", "1") == "1":
+        owns_default = os.getenv("AUTODS_OWNS_DEFAULT_SESSION", "1") == "1"
+        session_id = DEFAULT_SESSION if owns_default else None
+        app.state.warm_up_task = asyncio.create_task(
+            asyncio.to_thread(sessions.warm_up, session_id)
+        )
+    else:
+        sessions.readiness.update(ready=True, stage="lazy")
+
+
 @app.get("/")
 def read_root():
     return {"status": "AutoDS Backend Running"}
 
 
+@app.get("/ready")
+def readiness():
+    """200 once the warm-up (kernel, vector store) is done, 503 while it runs."""
+    status_code = 200 if sessions.readiness["ready"] else 503
+    return JSONResponse(dict(sessions.readiness), status_code=status_code)
+
+
+@app.get("/sessions")
+def session_stats():
+    return sessions.stats()
+
+
+@app.get("/metrics")
+def metrics():
+    """Latency histograms (spans, LLM time-to-first-token, tokens/sec) for Prometheus."""
+    return PlainTextResponse(
+        tracing.render_prometheus(), media_type="text/plain; version=0.0.4"
+    )
+
+
+@app.get("/traces")
+def traces(limit: int = 200, trace_id: str = None):
+    """Most recent spans, optionally only those of one chat turn."""
+    spans = tracing.recent_spans(tracing.MAX_SPANS)
+    if trace_id:
+        spans = [s for s in spans if s["trace_id"] == trace_id]
+    return {"spans": spans[-limit:]}
+
+
+@app.get("/history/search")
+async def search_history(
+    q: str,
+    limit: int = Query(10, ge=1, le=100),
+    session_id: str = Depends(session_id_of),
+):
+    """
+    Hybrid (BM25 + vector) search over the caller's past turns, code, errors and
+    schemas. Other sessions' history is never searched nor returned.
+    """
+    agent = sessions.peek(session_id)
+    if agent is None:
+        raise HTTPException(status_code=404, detail=f"Unknown session: {session_id}")
+    docs = await sessions.rag.search(q, agent.session_id, limit)
+    return {
+        "results": [
+            {"session_id": d["session_id"], "kind": d["kind"], "text": d["text"]}
+            for d in docs
+        ]
+    }
+
+
 @app.websocket("/ws/chat")
 async def websocket_endpoint(websocket: WebSocket):
-    await manager.connect(websocket)
+    # Every connection gets its own session unless it asks for an existing one
+    session_id = websocket.query_params.get("session_id") or uuid.uuid4().hex
+    try:
+        agent = await asyncio.to_thread(sessions.connect, session_id)
+    except SessionLimitError as e:
+        # Accepted first: a close code sent during the handshake becomes an HTTP 403
+        await websocket.accept()
+        await websocket.close(code=1013, reason=str(e))
+        return
+
+    await manager.connect(websocket, session_id)
+    await manager.send_personal_message(
+        json.dumps({"type": "session", "content": session_id}), websocket
+    )
     try:
         while True:
             data = await websocket.receive_text()
@@ -94,30 +247,45 @@ async def websocket_endpoint(websocket: WebSocket):
                     await manager.send_personal_message(json.dumps(update), websocket)
 
     except WebSocketDisconnect:
-        manager.disconnect(websocket)
         print("Client disconnected")
+    except Exception as e:
+        print(f"WebSocket error ({session_id}): {e}")
+    finally:
+        # Any exit releases the connection, otherwise the session never expires
+        manager.disconnect(websocket)
+        sessions.disconnect(session_id)
 
 
 @app.post("/upload")
-async def upload_file(file: UploadFile = File(...)):
-    file_location = f"uploads/{file.filename}"
-    os.makedirs("uploads", exist_ok=True)
-    with open(file_location, "wb+") as file_object:
-        # file.file is a SpooledTemporaryFile, read() is sync
-        file_object.write(file.file.read())
+async def upload_file(
+    file: UploadFile = File(...), agent: AutoDSAgent = Depends(get_agent)
+):
+    # Streamed to disk while hashing; identical content is stored (and analyzed) once
+    entry = await asyncio.to_thread(
+        sessions.catalog.store_upload, file.file, file.filename
+    )
+    if "error" in entry:
+        return entry
 
-    summary = await agent.analyze_file(file_location)
+    summary = await agent.analyze_file(entry["path"])
 
-    return {"info": f"file '{file.filename}' saved", "summary": summary}
+    return {
+        "info": f"file '{file.filename}' saved",
+        "summary": summary,
+        "deduplicated": entry["deduplicated"],
+    }
 
 
 @app.get("/files/{filename}")
-def get_file(filename: str):
-    file_path = f"uploads/{filename}"
-    if not os.path.exists(file_path):
+def get_file(filename: str, sheet: str = None):
+    entry = sessions.catalog.resolve(filename, category="dataset")
+    if entry is None:
         return {"error": "File not found"}
+    file_path = entry["path"]
 
     try:
+        import pandas as pd
+
         # LIMIT PREVIEW TO 100 ROWS FOR PERFORMANCE (AUTO DS uses full data)
         if filename.endswith(".csv"):
             df = pd.read_csv(file_path, nrows=100)
@@ -130,12 +298,16 @@ def get_file(filename: str):
                 "data": df.to_dict(orient="records"),
             }
         elif filename.endswith(".xlsx"):
-            df = pd.read_excel(file_path, nrows=100)
-            df = df.where(pd.notnull(df), None)
+            # Parquet cache of the loaded workbook, or only the preview rows
+            df, sheet_names = DatasetLoader().preview_excel(
+                file_path, 100, sheet, digest=entry.get("hash")
+            )
+            df = df.astype(object).where(pd.notnull(df), None)
             return {
                 "filename": filename,
                 "type": "xlsx",
-                "columns": list(df.columns),
+                "sheets": sheet_names,
+                "columns": [str(col) for col in df.columns],
                 "data": df.to_dict(orient="records"),
             }
         else:
@@ -145,73 +317,126 @@ def get_file(filename: str):
 
 
 @app.post("/reset_session")
-def reset_session():
-    result = agent.reset()
+def reset_session(restore: bool = False, agent: AutoDSAgent = Depends(get_agent)):
+    result = agent.reset(restore=restore)
     return result
 
 
 @app.post("/db/connect")
-def connect_db(request: DBConnectRequest):
+def connect_db(request: DBConnectRequest, agent: AutoDSAgent = Depends(get_agent)):
     result = agent.db_manager.connect(request.dict())
     return result
 
 
 @app.get("/db/schema")
-def get_db_schema():
+def get_db_schema(agent: AutoDSAgent = Depends(get_agent)):
     result = agent.db_manager.get_schema()
     return result
 
 
 @app.post("/generate_eda")
-async def generate_eda(request: EDARequest):
-    result = await agent.generate_eda(request.filename)
-    return result
+async def generate_eda(request: EDARequest, session_id: str = Depends(session_id_of)):
+    # Runs as a background job, progress is pushed over the session's WebSocket
+    return job_queue.submit(
+        "eda", {"filename": request.filename}, session_id=session_id
+    )
 
 
-@app.get("/download_notebook")
-def download_notebook():
-    notebook_json = generate_notebook(agent.session_history)
-    return Response(
-        content=notebook_json,
-        media_type="application/x-ipynb+json",
-        headers={"Content-Disposition": "attachment; filename=analysis.ipynb"},
+@app.post("/jobs")
+def submit_job(request: JobRequest, session_id: str = Depends(session_id_of)):
+    return job_queue.submit(
+        request.kind, request.payload, request.priority, session_id=session_id
     )
 
 
-@app.get("/list_files")
-def list_files():
-    """Returns all available files: Uploads, Models, and Generated Notebooks."""
-    files = []
+# Jobs are only visible to the session that submitted them
+def own_job(job_id: int, session_id: str = Depends(session_id_of)) -> int:
+    job = job_queue.get(job_id)
+    if not job or job["session_id"] != session_id:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job_id
 
-    # 1. Uploads
-    if os.path.exists("uploads"):
-        for f in os.listdir("uploads"):
-            files.append({"name": f, "type": f.split(".")[-1], "category": "dataset"})
 
-    # 2. Models
-    if os.path.exists("models"):
-        for f in os.listdir("models"):
-            files.append({"name": f, "type": "pkl", "category": "model"})
+@app.get("/jobs")
+def list_jobs(
+    status: str = None, limit: int = 50, session_id: str = Depends(session_id_of)
+):
+    return job_queue.list(status=status, limit=limit, session_id=session_id)
 
-    # 3. Root Notebooks (train.ipynb)
-    for f in os.listdir("."):
-        if f.endswith(".ipynb"):
-            files.append({"name": f, "type": "ipynb", "category": "notebook"})
 
-    return files
+@app.get("/jobs/{job_id}")
+def get_job(job_id: int = Depends(own_job)):
+    return job_queue.get(job_id)
 
 
-@app.get("/download/{filename}")
-def download_file(filename: str):
-    possible_paths = [
-        f"uploads/{filename}",
-        f"models/{filename}",
-        f"backend/cache/eda/{filename}",
-        filename,  # Root
+@app.post("/jobs/{job_id}/cancel")
+async def cancel_job(job_id: int = Depends(own_job)):
+    return await job_dispatcher.cancel(job_id)
+
+
+@app.post("/jobs/{job_id}/retry")
+def retry_job(job_id: int = Depends(own_job)):
+    return job_queue.retry(job_id)
+
+
+@app.get("/jobs/{job_id}/artifacts/{name}")
+def get_job_artifact(name: str, job_id: int = Depends(own_job)):
+    path = os.path.join(JOBS_DIR, str(job_id), os.path.basename(name))
+    if not os.path.exists(path):
+        return {"error": "Artifact not found"}
+    return FileResponse(path, filename=os.path.basename(name))
+
+
+@app.get("/download_notebook")
+def download_notebook(agent: AutoDSAgent = Depends(get_agent)):
+    # Maintained incrementally by the agent, streamed straight from disk
+    return FileResponse(
+        agent.notebook.path,
+        media_type="application/x-ipynb+json",
+        filename="analysis.ipynb",
+    )
+
+
+@app.get("/list_files")
+def list_files(
+    offset: int = Query(0, ge=0),
+    limit: int = Query(1000, ge=1, le=5000),
+    category: str = None,
+):
+    """
+    Uploads, models and generated notebooks, served from the file catalog index.
+    Paginated with offset/limit; the total count is in the X-Total-Count header.
+    """
+    entries, total = sessions.catalog.list(category, offset, limit)
+    files = [
+        {
+            "name": e["name"],
+            "type": e["type"],
+            "category": e["category"],
+            "size": e["size"],
+            **e["meta"],
+        }
+        for e in entries
     ]
+    return JSONResponse(files, headers={"X-Total-Count": str(total)})
+
+
+@app.get("/outputs/{output_id}")
+def get_output(output_id: str):
+    """Full text of an execution output that was truncated in the chat."""
+    if not output_id.isalnum():
+        return {"error": "Invalid output id"}
+    path = os.path.join(OUTPUTS_DIR, f"{output_id}.txt")
+    if not os.path.exists(path):
+        return {"error": "Output not found"}
+    return FileResponse(path, media_type="text/plain")
 
-    for path in possible_paths:
-        if os.path.exists(path):
-            return FileResponse(path, filename=filename)
 
-    return {"error": "File not found"}
+@app.get("/download/{filename}")
+def download_file(filename: str):
+    # One index lookup instead of probing every directory. FileResponse answers
+    # Range requests and uses the server's sendfile (pathsend) when available.
+    entry = sessions.catalog.resolve(filename)
+    if entry is None:
+        return {"error": "File not found"}
+    return FileResponse(entry["path"], filename=entry["download_name"])
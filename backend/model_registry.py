@@ -0,0 +1,179 @@
+import os
+import json
+import time
+import shutil
+import hashlib
+import tempfile
+from contextlib import contextmanager
+from typing import Dict, Any, List, Optional
+
+MODELS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "models")
+INDEX_FILE = "registry.json"
+
+
+def dataset_hash(data) -> Optional[str]:
+    """Stable content hash of a DataFrame / Series / array (None if not hashable)."""
+    if data is None:
+        return None
+    try:
+        import numpy as np
+        import pandas as pd
+
+        if isinstance(data, (pd.DataFrame, pd.Series)):
+            values = pd.util.hash_pandas_object(data, index=True).to_numpy()
+        else:
+            values = np.ascontiguousarray(np.asarray(data))
+        return hashlib.sha256(values.tobytes()).hexdigest()[:16]
+    except Exception as e:
+        print(f"Dataset hash skipped: {e}")
+        return None
+
+
+class ModelRegistry:
+    """
+    Content-addressed store for trained models.
+    Artifacts are joblib files under models/store/<sha256>.joblib (identical models are
+    stored once); models/registry.json maps names to versions and metadata.
+    Used from the backend (listing, downloads) and from the kernel (save / lazy load).
+    """
+
+    def __init__(self, root: str = MODELS_DIR):
+        self.root = root
+        self.store_dir = os.path.join(root, "store")
+        self.index_path = os.path.join(root, INDEX_FILE)
+        self._loaded = {}  # (name, hash) -> model, kernel-side cache
+
+    # --- INDEX ---
+
+    def _read_index(self) -> Dict[str, List[Dict[str, Any]]]:
+        if not os.path.exists(self.index_path):
+            return {}
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Model registry index unreadable: {e}")
+            return {}
+
+    @contextmanager
+    def _index_lock(self):
+        """
+        Exclusive lock around read-modify-write of the index: kernels, job workers
+        and backend workers all save models. Readers need no lock (the index is
+        replaced atomically). No-op where fcntl is unavailable (Windows).
+        """
+        try:
+            import fcntl
+        except ImportError:
+            yield
+            return
+        os.makedirs(self.root, exist_ok=True)
+        with open(self.index_path + ".lock", "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _write_index(self, index: Dict[str, List[Dict[str, Any]]]):
+        os.makedirs(self.root, exist_ok=True)
+        tmp_path = self.index_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(index, f, indent=2)
+        os.replace(tmp_path, self.index_path)
+
+    # --- SAVE ---
+
+    def save(
+        self,
+        model,
+        name: str,
+        dataset=None,
+        training_seconds: float = None,
+        compress=0,
+    ) -> Dict[str, Any]:
+        """
+        Serializes `model` with joblib and registers it under `name`.
+        compress=0 keeps NumPy arrays raw so they can be memory-mapped on load;
+        use e.g. 3 or ("lz4", 3) to trade load speed for disk space.
+        """
+        import joblib
+
+        os.makedirs(self.store_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.store_dir, suffix=".tmp")
+        os.close(fd)
+
+        start = time.time()
+        joblib.dump(model, tmp_path, compress=compress)
+        save_seconds = time.time() - start
+
+        sha = hashlib.sha256()
+        with open(tmp_path, "rb") as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                sha.update(block)
+        digest = sha.hexdigest()
+
+        artifact = os.path.join(self.store_dir, f"{digest}.joblib")
+        if os.path.exists(artifact):
+            os.remove(tmp_path)  # Identical model already stored
+        else:
+            shutil.move(tmp_path, artifact)
+
+        entry = {
+            "hash": digest,
+            "file": os.path.relpath(artifact, self.root),
+            "class": type(model).__name__,
+            "size_bytes": os.path.getsize(artifact),
+            "compress": compress if isinstance(compress, int) else list(compress),
+            "training_seconds": training_seconds,
+            "save_seconds": round(save_seconds, 3),
+            "dataset_hash": dataset_hash(dataset),
+            "created": time.time(),
+        }
+
+        with self._index_lock():
+            index = self._read_index()
+            versions = index.setdefault(name, [])
+            if not versions or versions[-1]["hash"] != digest:
+                versions.append(entry)
+            self._write_index(index)
+
+        return {"name": name, "version": len(versions), **entry}
+
+    # --- LIST / LOAD ---
+
+    def list(self) -> List[Dict[str, Any]]:
+        """Latest version of every model (metadata only, nothing is loaded)."""
+        return [
+            {"name": name, "version": len(versions), **versions[-1]}
+            for name, versions in self._read_index().items()
+            if versions
+        ]
+
+    def _entry(self, name: str, version: int = None) -> Dict[str, Any]:
+        versions = self._read_index().get(name)
+        if not versions:
+            raise KeyError(f"No model named '{name}' in the registry")
+        return versions[-1] if version is None else versions[version - 1]
+
+    def path(self, name: str, version: int = None) -> str:
+        return os.path.join(self.root, self._entry(name, version)["file"])
+
+    def load(self, name: str, version: int = None, mmap: bool = True):
+        """Loads a model; uncompressed artifacts memory-map their NumPy arrays."""
+        import joblib
+
+        entry = self._entry(name, version)
+        key = (name, entry["hash"])
+        if key not in self._loaded:
+            path = os.path.join(self.root, entry["file"])
+            mmap_mode = "r" if mmap and not entry["compress"] else None
+            self._loaded[key] = joblib.load(path, mmap_mode=mmap_mode)
+        return self._loaded[key]
+
+    def __getitem__(self, name: str):
+        """`model_registry["churn_rf"]` loads lazily, on first reference."""
+        return self.load(name)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._read_index()
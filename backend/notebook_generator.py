@@ -1,26 +1,85 @@
+import os
 import json
 import re
 from typing import List, Dict, Any
 
+NOTEBOOK_METADATA = {
+    "kernelspec": {
+        "display_name": "Python 3",
+        "language": "python",
+        "name": "python3",
+    },
+    "language_info": {
+        "codemirror_mode": {"name": "ipython", "version": 3},
+        "file_extension": ".py",
+        "mimetype": "text/x-python",
+        "name": "python",
+        "nbconvert_exporter": "python",
+        "pygments_lexer": "ipython3",
+        "version": "3.8.5",
+    },
+}
+
+TITLE_CELL = {
+    "cell_type": "markdown",
+    "metadata": {},
+    "source": [
+        "# AutoDS Analysis Notebook\n",
+        "This notebook was automatically generated by AutoDS Agent.",
+    ],
+}
+
+# Execution results the agent inlines into its response (replaced by real cell outputs)
+EXECUTION_RESULT_RE = re.compile(r"\n*\*\*Execution Result:\*\*\n```\n.*?\n```", re.DOTALL)
+
+
+def _split_cells(content: str) -> List[Dict[str, Any]]:
+    """Parses an assistant message into Text (Markdown) and Code cells."""
+    cells = []
+
+    # Split content by code blocks
+    # 're.split' with capturing group includes the delimiter (code block) in results
+    parts = re.split(r"(```python\s*.*?\s*```)", content, flags=re.DOTALL)
+
+    for part in parts:
+        if not part.strip():
+            continue
+
+        # Check if this part is a code block
+        code_match = re.match(r"```python\s*(.*?)\s*```", part, re.DOTALL)
+
+        if code_match:
+            # It's a code block -> Code Cell
+            code_content = code_match.group(1).strip()
+            cells.append(
+                {
+                    "cell_type": "code",
+                    "execution_count": None,
+                    "metadata": {},
+                    "outputs": [],
+                    "source": code_content.splitlines(keepends=True),
+                }
+            )
+        else:
+            # It's regular text -> Markdown Cell
+            cells.append(
+                {
+                    "cell_type": "markdown",
+                    "metadata": {},
+                    "source": part.strip().splitlines(keepends=True),
+                }
+            )
+
+    return cells
+
 
 def generate_notebook(session_history: List[Dict[str, Any]]) -> str:
     """
     Converts session history (list of message dicts) into a Jupyter Notebook JSON string.
     Skips 'user' messages. Parses 'assistant' messages into Text (Markdown) and Code cells.
     """
-    cells = []
-
     # Add a markdown cell for the title
-    cells.append(
-        {
-            "cell_type": "markdown",
-            "metadata": {},
-            "source": [
-                "# AutoDS Analysis Notebook\n",
-                "This notebook was automatically generated by AutoDS Agent.",
-            ],
-        }
-    )
+    cells = [TITLE_CELL]
 
     for message in session_history:
         # STRICT RULE: Skip User Queries
@@ -31,64 +90,95 @@ def generate_notebook(session_history: List[Dict[str, Any]]) -> str:
         if not content:
             continue
 
-        # Split content by code blocks
-        # 're.split' with capturing group includes the delimiter (code block) in results
-
-        # We want to identify code blocks vs text.
-        # Simple regex to find code blocks: ```python(.*?)```
-
-        parts = re.split(r"(```python\s*.*?\s*```)", content, flags=re.DOTALL)
-
-        for part in parts:
-            if not part.strip():
-                continue
-
-            # Check if this part is a code block
-            code_match = re.match(r"```python\s*(.*?)\s*```", part, re.DOTALL)
-
-            if code_match:
-                # It's a code block -> Code Cell
-                code_content = code_match.group(1).strip()
-                cells.append(
-                    {
-                        "cell_type": "code",
-                        "execution_count": None,
-                        "metadata": {},
-                        "outputs": [],
-                        "source": code_content.splitlines(keepends=True),
-                    }
-                )
-            else:
-                # It's regular text -> Markdown Cell
-                # Clean up any residual markers if necessary, but usually text is clean
-                cells.append(
-                    {
-                        "cell_type": "markdown",
-                        "metadata": {},
-                        "source": part.strip().splitlines(keepends=True),
-                    }
-                )
+        cells.extend(_split_cells(content))
 
     notebook = {
         "cells": cells,
-        "metadata": {
-            "kernelspec": {
-                "display_name": "Python 3",
-                "language": "python",
-                "name": "python3",
-            },
-            "language_info": {
-                "codemirror_mode": {"name": "ipython", "version": 3},
-                "file_extension": ".py",
-                "mimetype": "text/x-python",
-                "name": "python",
-                "nbconvert_exporter": "python",
-                "pygments_lexer": "ipython3",
-                "version": "3.8.5",
-            },
-        },
+        "metadata": NOTEBOOK_METADATA,
         "nbformat": 4,
         "nbformat_minor": 4,
     }
 
     return json.dumps(notebook, indent=2)
+
+
+def _cell_outputs(exec_result: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Converts a KernelManager.execute result into nbformat outputs."""
+    outputs = []
+
+    text = exec_result.get("output", "")
+    if text:
+        outputs.append(
+            {
+                "output_type": "stream",
+                "name": "stdout",
+                "text": text.splitlines(keepends=True),
+            }
+        )
+
+    plot = exec_result.get("plot")
+    if isinstance(plot, dict) and "image" in plot:
+        outputs.append(
+            {
+                "output_type": "display_data",
+                "metadata": {},
+                "data": {"image/png": plot["image"], "text/plain": ["<Figure>"]},
+            }
+        )
+    elif plot:
+        outputs.append(
+            {
+                "output_type": "display_data",
+                "metadata": {},
+                "data": {
+                    "application/vnd.plotly.v1+json": json.loads(plot),
+                    "text/plain": ["<Plotly Figure>"],
+                },
+            }
+        )
+
+    return outputs
+
+
+class NotebookWriter:
+    """
+    Maintains a session notebook on disk, appending cells as turns complete.
+    The file is always a valid .ipynb: each append overwrites only the closing
+    suffix, so the cost of a turn does not depend on the notebook size and the
+    download is served straight from disk.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        suffix = {"metadata": NOTEBOOK_METADATA, "nbformat": 4, "nbformat_minor": 4}
+        # '\n], "metadata": {...}, "nbformat": 4, "nbformat_minor": 4}\n'
+        self.suffix = ("\n], " + json.dumps(suffix)[1:] + "\n").encode("utf-8")
+
+        if not os.path.exists(self.path):
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(self.path, "wb") as f:
+                f.write(b'{"cells": [\n' + json.dumps(TITLE_CELL).encode("utf-8"))
+                f.write(self.suffix)
+
+    def append_cells(self, cells: List[Dict[str, Any]]):
+        if not cells:
+            return
+        payload = "".join(",\n" + json.dumps(cell) for cell in cells)
+        with open(self.path, "r+b") as f:
+            f.seek(-len(self.suffix), os.SEEK_END)
+            f.write(payload.encode("utf-8") + self.suffix)
+            f.truncate()
+
+    def append_turn(self, content: str, exec_results: Dict[str, Dict[str, Any]]):
+        """
+        Appends one assistant turn. `exec_results` maps executed code to its
+        KernelManager result, which becomes the code cell's outputs.
+        """
+        cells = _split_cells(EXECUTION_RESULT_RE.sub("", content))
+        for cell in cells:
+            if cell["cell_type"] != "code":
+                continue
+            result = exec_results.get("".join(cell["source"]))
+            if result:
+                cell["outputs"] = _cell_outputs(result)
+        self.append_cells(cells)
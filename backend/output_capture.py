@@ -0,0 +1,122 @@
+import os
+import uuid
+from collections import deque
+from typing import Dict, Any
+
+OUTPUTS_DIR = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "cache", "outputs"
+)
+
+# Bytes of output kept in memory per execution (split between head and tail)
+DEFAULT_BUDGET_BYTES = 16_000
+
+
+def _head_bytes(text: str, n: int) -> str:
+    return text.encode("utf-8")[:n].decode("utf-8", errors="ignore")
+
+
+def _tail_bytes(text: str, n: int) -> str:
+    return text.encode("utf-8")[-n:].decode("utf-8", errors="ignore") if n else ""
+
+
+def truncate_middle(text: str, max_bytes: int) -> str:
+    """Keeps the head and tail of `text` within `max_bytes` (used for LLM context)."""
+    size = len(text.encode("utf-8"))
+    if size <= max_bytes:
+        return text
+    half = max_bytes // 2
+    omitted = size - 2 * half
+    return (
+        _head_bytes(text, half)
+        + f"\n... [{omitted} bytes omitted] ...\n"
+        + _tail_bytes(text, half)
+    )
+
+
+class OutputCapture:
+    """
+    Accumulates the output of one kernel execution under a byte budget.
+    Within budget the output is kept as-is. Beyond it, only the head and tail stay
+    in memory and the complete output is spilled to a file that can be fetched
+    via /outputs/{output_id}.
+    """
+
+    def __init__(self, spill_dir: str, budget_bytes: int = DEFAULT_BUDGET_BYTES):
+        self.spill_dir = spill_dir
+        self.head_budget = budget_bytes // 2
+        self.tail_budget = budget_bytes - self.head_budget
+        self.budget_bytes = budget_bytes
+
+        self.total_bytes = 0
+        self.chunks = []  # Everything, until the budget is exceeded
+        self.head = ""
+        self.tail = deque()
+        self.tail_size = 0
+
+        self.output_id = None
+        self.spill_file = None
+
+    def write(self, text: str):
+        if not text:
+            return
+        size = len(text.encode("utf-8"))
+        self.total_bytes += size
+
+        if self.spill_file is None:
+            self.chunks.append(text)
+            if self.total_bytes > self.budget_bytes:
+                self._start_spill()
+            return
+
+        self.spill_file.write(text)
+        self.tail.append(text)
+        self.tail_size += size
+        # Drop whole chunks that fell out of the tail window
+        while len(self.tail) > 1 and self.tail_size - len(
+            self.tail[0].encode("utf-8")
+        ) >= self.tail_budget:
+            self.tail_size -= len(self.tail.popleft().encode("utf-8"))
+
+    def _start_spill(self):
+        os.makedirs(self.spill_dir, exist_ok=True)
+        self.output_id = uuid.uuid4().hex
+        self.spill_file = open(
+            os.path.join(self.spill_dir, f"{self.output_id}.txt"),
+            "w",
+            encoding="utf-8",
+        )
+
+        text = "".join(self.chunks)
+        self.chunks = []
+        self.spill_file.write(text)
+        self.head = _head_bytes(text, self.head_budget)
+        rest = text[len(self.head) :]
+        self.tail.append(rest)
+        self.tail_size = len(rest.encode("utf-8"))
+
+    def finish(self) -> Dict[str, Any]:
+        """Returns the (possibly truncated) text plus truncation metadata."""
+        if self.spill_file is None:
+            return {
+                "text": "".join(self.chunks),
+                "truncated": False,
+                "total_bytes": self.total_bytes,
+                "output_id": None,
+            }
+
+        self.spill_file.close()
+        tail = _tail_bytes("".join(self.tail), self.tail_budget)
+        omitted = self.total_bytes - len(self.head.encode("utf-8")) - len(
+            tail.encode("utf-8")
+        )
+        text = (
+            self.head
+            + f"\n... [{omitted} bytes truncated, full output: /outputs/{self.output_id}] ...\n"
+            + tail
+        )
+        return {
+            "text": text,
+            "truncated": True,
+            "total_bytes": self.total_bytes,
+            "output_id": self.output_id,
+        }
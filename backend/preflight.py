@@ -0,0 +1,480 @@
+"""
+Static pre-flight checks for generated code, run before it reaches the kernel.
+
+Catches the usual causes of self-correction retries without an LLM call:
+- near-miss column names on `df` (case, spacing, typos) are rewritten when the
+  intended column is unambiguous,
+- well-known library names used without an import get the import added,
+- imports of modules that are not installed, and syntax errors, are reported
+  without running the cell (cells with IPython magics are run unchecked),
+- `fig.show()` is dropped (the UI renders `fig`), other figures are bound to `fig`,
+- numeric / `.dt` operations on columns of the wrong dtype are flagged.
+"""
+
+import ast
+import re
+import difflib
+import importlib.util
+from typing import Dict, Any, List, Optional, Set, Tuple
+
+# Names bound in every kernel by kernel_runtime.prewarm and the bootstrap code
+KERNEL_NAMES = {"np", "pd", "plt", "px", "go", "model_registry", "explain_model"}
+KERNEL_NAMES |= {"submit_job", "df", "get_ipython", "display"}
+
+KNOWN_IMPORTS = {
+    "pl": "import polars as pl",
+    "sns": "import seaborn as sns",
+    "shap": "import shap",
+    "joblib": "import joblib",
+    "json": "import json",
+    "math": "import math",
+    "stats": "from scipy import stats",
+    "make_subplots": "from plotly.subplots import make_subplots",
+    "train_test_split": "from sklearn.model_selection import train_test_split",
+    "cross_val_score": "from sklearn.model_selection import cross_val_score",
+    "GridSearchCV": "from sklearn.model_selection import GridSearchCV",
+    "RandomForestClassifier": "from sklearn.ensemble import RandomForestClassifier",
+    "RandomForestRegressor": "from sklearn.ensemble import RandomForestRegressor",
+    "GradientBoostingClassifier": (
+        "from sklearn.ensemble import GradientBoostingClassifier"
+    ),
+    "GradientBoostingRegressor": (
+        "from sklearn.ensemble import GradientBoostingRegressor"
+    ),
+    "LogisticRegression": "from sklearn.linear_model import LogisticRegression",
+    "LinearRegression": "from sklearn.linear_model import LinearRegression",
+    "StandardScaler": "from sklearn.preprocessing import StandardScaler",
+    "LabelEncoder": "from sklearn.preprocessing import LabelEncoder",
+    "OneHotEncoder": "from sklearn.preprocessing import OneHotEncoder",
+    "accuracy_score": "from sklearn.metrics import accuracy_score",
+    "classification_report": "from sklearn.metrics import classification_report",
+    "confusion_matrix": "from sklearn.metrics import confusion_matrix",
+    "f1_score": "from sklearn.metrics import f1_score",
+    "roc_auc_score": "from sklearn.metrics import roc_auc_score",
+    "mean_squared_error": "from sklearn.metrics import mean_squared_error",
+    "mean_absolute_error": "from sklearn.metrics import mean_absolute_error",
+    "r2_score": "from sklearn.metrics import r2_score",
+}
+
+# Calls on `df` that return a frame with the same columns
+_SAME_COLUMNS = {
+    "groupby",
+    "copy",
+    "dropna",
+    "fillna",
+    "head",
+    "tail",
+    "sample",
+    "sort_values",
+    "drop_duplicates",
+    "query",
+    "nlargest",
+    "nsmallest",
+}
+# Keyword arguments of pandas methods on `df` that name columns (others, like
+# `color` of df.plot(), take literal values)
+_METHOD_COLUMN_KEYWORDS = {
+    "sort_values": {"by"},
+    "groupby": {"by"},
+    "dropna": {"subset"},
+    "drop_duplicates": {"subset"},
+    "duplicated": {"subset"},
+    "value_counts": {"subset"},
+    "nlargest": {"columns"},
+    "nsmallest": {"columns"},
+    "drop": {"columns"},
+    "set_index": {"keys"},
+    "pivot": {"index", "columns", "values"},
+    "pivot_table": {"index", "columns", "values"},
+    "melt": {"id_vars", "value_vars"},
+    "plot": {"x", "y"},
+    "hist": {"column", "by"},
+    "boxplot": {"column", "by"},
+}
+# Keyword arguments of plotly express calls that name columns
+_PLOTLY_COLUMN_KEYWORDS = {
+    "x",
+    "y",
+    "z",
+    "color",
+    "size",
+    "symbol",
+    "facet_col",
+    "facet_row",
+    "hover_name",
+    "hover_data",
+    "names",
+    "values",
+    "text",
+    "animation_frame",
+    "line_group",
+}
+_POSITIONAL_COLUMN = {"groupby", "sort_values", "set_index", "value_counts"}
+_NUMERIC_METHODS = {"mean", "sum", "std", "var", "median", "quantile", "skew"}
+
+
+def _normalize(name: str) -> str:
+    return re.sub(r"[\s_\-]+", "", name).lower()
+
+
+def _is_numeric(dtype: str) -> bool:
+    return dtype.lower().startswith(("int", "uint", "float", "bool", "decimal"))
+
+
+def _is_datetime(dtype: str) -> bool:
+    return "date" in dtype.lower() or "time" in dtype.lower()
+
+
+def _strings(node) -> List[ast.Constant]:
+    """String constants of a node that is a string or a list/tuple of strings."""
+    if isinstance(node, ast.Constant) and isinstance(node.value, str):
+        return [node]
+    if isinstance(node, (ast.List, ast.Tuple)):
+        return [n for elt in node.elts for n in _strings(elt)]
+    return []
+
+
+def _strings_of(nodes) -> List[ast.Constant]:
+    return [s for node in nodes for s in _strings(node)]
+
+
+def _is_df(node) -> bool:
+    """`df`, or a call chain on `df` that keeps its columns (df.groupby(...), ...)."""
+    if isinstance(node, ast.Name):
+        return node.id == "df"
+    if isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute):
+        return node.func.attr in _SAME_COLUMNS and _is_df(node.func.value)
+    if isinstance(node, ast.Attribute) and node.attr == "loc":
+        return _is_df(node.value)
+    return False
+
+
+def _root_name(node) -> Optional[str]:
+    while isinstance(node, (ast.Attribute, ast.Call, ast.Subscript)):
+        node = node.func if isinstance(node, ast.Call) else node.value
+    return node.id if isinstance(node, ast.Name) else None
+
+
+class PreflightChecker:
+    """Validates and repairs generated code; counts fixes and the retries they avoid."""
+
+    def __init__(self):
+        self.stats = {
+            "checked": 0,
+            "fixed": 0,
+            "blocked": 0,
+            "avoided_retries": 0,
+        }
+
+    def check(
+        self,
+        code: str,
+        columns: List[str],
+        dtypes: Dict[str, str] = None,
+        defined: Set[str] = frozenset(),
+    ) -> Dict[str, Any]:
+        """
+        `columns`/`dtypes` describe `df`; `defined` holds names and columns created
+        by earlier cells. Returns {"code", "fixes", "would_fail", "warnings", "error",
+        "defined"}: `error` is set when the cell must not run, `defined` are the
+        names and columns this cell creates.
+        """
+        self.stats["checked"] += 1
+        report = {
+            "code": code,
+            "fixes": [],
+            "would_fail": False,  # A fix removed a certain KeyError / NameError
+            "warnings": [],
+            "error": None,
+            "defined": set(),
+        }
+        try:
+            tree = ast.parse(code)
+        except SyntaxError as e:
+            python = self._without_magics(code)
+            try:
+                # IPython syntax (`!pip install`, `%matplotlib`) runs fine in the
+                # kernel; such cells are not checked, only their names recorded
+                tree = ast.parse(python) if python is not None else None
+            except SyntaxError:
+                tree = None
+            if tree is None:
+                report["error"] = f"SyntaxError: {e.msg} (line {e.lineno})"
+                self.stats["blocked"] += 1
+            else:
+                created, names = self._created_columns(tree), self._defined_names(tree)
+                report["defined"] = created | names
+            return report
+
+        dtypes = dtypes or {}
+        created = self._created_columns(tree)
+        names = self._defined_names(tree)
+        report["defined"] = created | names
+
+        missing = self._missing_modules(tree)
+        if missing:
+            report["error"] = f"ModuleNotFoundError: No module named '{missing}'"
+            self.stats["blocked"] += 1
+            return report
+
+        edits: List[Tuple[Tuple[int, int], Tuple[int, int], str]] = []
+        known = set(columns) | created | set(defined)
+        for node in self._column_references(tree):
+            name = node.value
+            if name in known:
+                continue
+            match = self._closest_column(name, columns)
+            if match is None:
+                report["warnings"].append(f"Unknown column '{name}'")
+                continue
+            edits.append(self._span(node, repr(match)))
+            report["fixes"].append(f"column '{name}' -> '{match}'")
+            report["would_fail"] = True
+
+        self._check_dtypes(tree, dtypes, created, report)
+        edits += self._fix_show(tree, report)
+
+        lines = code.splitlines(keepends=True)
+        for start, end, text in sorted(edits, reverse=True):
+            lines = self._replace(lines, start, end, text)
+        fixed = "".join(lines)
+
+        imports = self._missing_imports(tree, names, set(defined))
+        if imports:
+            fixed = "\n".join(imports) + "\n" + fixed
+            report["fixes"] += [f"added `{line}`" for line in imports]
+            report["would_fail"] = True
+
+        if report["fixes"]:
+            report["code"] = fixed.strip()
+            self.stats["fixed"] += 1
+        return report
+
+    def _without_magics(self, code: str) -> Optional[str]:
+        """The cell as plain Python (magics -> get_ipython() calls), if it changes."""
+        try:
+            from IPython.core.inputtransformer2 import TransformerManager
+        except ImportError:
+            return None
+        python = TransformerManager().transform_cell(code)
+        return python if python.strip() != code.strip() else None
+
+    # --- ANALYSIS ---
+
+    def _created_columns(self, tree) -> Set[str]:
+        """Columns the code adds or renames (never treated as typos)."""
+        created = set()
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Subscript) and isinstance(node.ctx, ast.Store):
+                created |= {s.value for s in _strings(node.slice)}
+                if isinstance(node.slice, ast.Tuple):  # df.loc[mask, "new"] = ...
+                    created |= {s.value for s in _strings(node.slice.elts[-1])}
+            elif isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute):
+                attr = node.func.attr
+                if attr in ("assign", "agg", "aggregate"):
+                    created |= {k.arg for k in node.keywords if k.arg}
+                for keyword in node.keywords:
+                    if keyword.arg == "columns" and isinstance(keyword.value, ast.Dict):
+                        created |= {s.value for s in _strings_of(keyword.value.values)}
+                    elif keyword.arg == "name" and attr == "reset_index":
+                        created |= {s.value for s in _strings(keyword.value)}
+                if attr == "insert" and len(node.args) >= 2:
+                    created |= {s.value for s in _strings(node.args[1])}
+                if attr == "to_frame" and node.args:
+                    created |= {s.value for s in _strings(node.args[0])}
+        return created
+
+    def _defined_names(self, tree) -> Set[str]:
+        names = set()
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Name) and not isinstance(node.ctx, ast.Load):
+                names.add(node.id)
+            elif isinstance(
+                node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)
+            ):
+                names.add(node.name)
+            elif isinstance(node, (ast.Import, ast.ImportFrom)):
+                for alias in node.names:
+                    names.add((alias.asname or alias.name).split(".")[0])
+            elif isinstance(node, ast.arg):
+                names.add(node.arg)
+            elif isinstance(node, ast.ExceptHandler) and node.name:
+                names.add(node.name)
+        return names
+
+    def _missing_modules(self, tree) -> Optional[str]:
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Import):
+                modules = [alias.name for alias in node.names]
+            elif isinstance(node, ast.ImportFrom) and not node.level and node.module:
+                modules = [node.module]
+            else:
+                continue
+            for module in modules:
+                top = module.split(".")[0]
+                try:
+                    if importlib.util.find_spec(top) is None:
+                        return top
+                except (ImportError, ValueError):
+                    return top
+        return None
+
+    def _missing_imports(self, tree, names: Set[str], defined: Set[str]) -> List[str]:
+        used = {
+            node.id
+            for node in ast.walk(tree)
+            if isinstance(node, ast.Name) and isinstance(node.ctx, ast.Load)
+        }
+        missing = used - names - defined - KERNEL_NAMES
+        return sorted({KNOWN_IMPORTS[n] for n in missing if n in KNOWN_IMPORTS})
+
+    def _column_references(self, tree) -> List[ast.Constant]:
+        """String constants that name a column of `df`."""
+        refs = []
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Subscript) and isinstance(node.ctx, ast.Load):
+                if _is_df(node.value):
+                    target = node.slice
+                    if isinstance(node.value, ast.Attribute):
+                        # df.loc[rows, cols]; a single key selects rows, not columns
+                        if not isinstance(target, ast.Tuple):
+                            continue
+                        target = target.elts[-1]
+                    refs += _strings(target)
+            elif isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute):
+                func = node.func
+                on_df = _is_df(func.value)
+                plotly = _root_name(func) == "px" and (
+                    (node.args and _is_df(node.args[0]))
+                    or any(
+                        k.arg == "data_frame" and _is_df(k.value) for k in node.keywords
+                    )
+                )
+                if not (on_df or plotly):
+                    continue
+                if on_df and func.attr in _POSITIONAL_COLUMN and node.args:
+                    refs += _strings(node.args[0])
+                if plotly:
+                    keywords = _PLOTLY_COLUMN_KEYWORDS
+                else:
+                    keywords = _METHOD_COLUMN_KEYWORDS.get(func.attr, ())
+                for keyword in node.keywords:
+                    if keyword.arg in keywords:
+                        refs += _strings(keyword.value)
+            elif (
+                isinstance(node, ast.Call)
+                and isinstance(node.func, ast.Attribute)
+                and node.func.attr == "col"
+                and _root_name(node.func) == "pl"
+            ):
+                refs += [s for arg in node.args for s in _strings(arg)]
+        return refs
+
+    def _closest_column(self, name: str, columns: List[str]) -> Optional[str]:
+        """The unambiguous intended column for a near-miss name, else None."""
+        wanted = _normalize(name)
+        exact = [c for c in columns if _normalize(str(c)) == wanted]
+        if len(exact) == 1:
+            return exact[0]
+        if exact:
+            return None
+
+        scored = sorted(
+            (
+                (difflib.SequenceMatcher(None, wanted, _normalize(str(c))).ratio(), c)
+                for c in columns
+            ),
+            key=lambda item: item[0],
+            reverse=True,
+        )
+        if not scored or scored[0][0] < 0.8:
+            return None
+        if len(scored) > 1 and scored[0][0] - scored[1][0] < 0.1:
+            return None  # Two plausible candidates
+        return scored[0][1]
+
+    def _check_dtypes(self, tree, dtypes, created, report):
+        for node in ast.walk(tree):
+            if not (
+                isinstance(node, ast.Attribute)
+                and isinstance(node.value, ast.Subscript)
+                and isinstance(node.value.value, ast.Name)
+                and node.value.value.id == "df"
+            ):
+                continue
+            cols = _strings(node.value.slice)
+            if len(cols) != 1 or cols[0].value in created:
+                continue
+            col = cols[0].value
+            dtype = dtypes.get(col)
+            if not dtype:
+                continue
+            if node.attr in _NUMERIC_METHODS and not _is_numeric(dtype):
+                report["warnings"].append(
+                    f"'{col}' is {dtype}, .{node.attr}() needs numeric values"
+                )
+            elif node.attr == "dt" and not _is_datetime(dtype):
+                report["warnings"].append(
+                    f"'{col}' is {dtype}, convert with pd.to_datetime() before .dt"
+                )
+
+    def _fix_show(self, tree, report):
+        """Drops `fig.show()`, other Plotly figures are bound to `fig` instead."""
+        figures = set()
+        for node in ast.walk(tree):
+            if (
+                isinstance(node, ast.Assign)
+                and len(node.targets) == 1
+                and isinstance(node.targets[0], ast.Name)
+                and _root_name(node.value) in ("px", "go", "make_subplots")
+            ):
+                figures.add(node.targets[0].id)
+
+        edits = []
+        for parent in ast.walk(tree):
+            for field in ("body", "orelse", "finalbody"):
+                body = getattr(parent, field, None)
+                if not isinstance(body, list):
+                    continue
+                for stmt in body:
+                    if not (
+                        isinstance(stmt, ast.Expr)
+                        and isinstance(stmt.value, ast.Call)
+                        and isinstance(stmt.value.func, ast.Attribute)
+                        and stmt.value.func.attr == "show"
+                        and isinstance(stmt.value.func.value, ast.Name)
+                    ):
+                        continue
+                    name = stmt.value.func.value.id
+                    if name == "fig":
+                        replacement = "pass" if len(body) == 1 else ""
+                        report["fixes"].append("removed fig.show()")
+                    elif name in figures:
+                        replacement = f"fig = {name}"
+                        report["fixes"].append(f"{name}.show() -> fig = {name}")
+                    else:
+                        continue
+                    edits.append(self._span(stmt, replacement))
+        return edits
+
+    # --- EDITING ---
+
+    def _span(self, node, text: str):
+        return (
+            (node.lineno, node.col_offset),
+            (node.end_lineno, node.end_col_offset),
+            text,
+        )
+
+    def _replace(self, lines: List[str], start, end, text: str) -> List[str]:
+        (start_line, start_col), (end_line, end_col) = start, end
+        first = lines[start_line - 1]
+        last = lines[end_line - 1]
+        # AST offsets are in UTF-8 bytes
+        before = first.encode("utf-8")[:start_col].decode("utf-8")
+        after = last.encode("utf-8")[end_col:].decode("utf-8")
+        if not text and not before.strip() and not after.strip():
+            replaced = []  # Whole statement line(s) removed
+        else:
+            replaced = [before + text + after]
+        return lines[: start_line - 1] + replaced + lines[end_line:]
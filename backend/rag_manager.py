@@ -1,80 +1,150 @@
 import os
-import chromadb
-from chromadb.utils import embedding_functions
-from openai import AsyncOpenAI
+from collections import OrderedDict
 from typing import List, Dict, Any
-import uuid
+
+from history_index import HistoryIndex, fuse
+import tracing
 
 
 class RAGManager:
     def __init__(self):
-        # Initialize ChromaDB (Persistent or Ephemeral)
-        # We use a local persistent path so data survives restarts if needed,
-        # but for now we might want to clear it on session start.
-        base_dir = os.path.dirname(os.path.abspath(__file__))
-        self.db_path = os.path.join(base_dir, "cache", "chroma_db")
-        os.makedirs(self.db_path, exist_ok=True)
-
-        self.client = chromadb.PersistentClient(path=self.db_path)
-
-        # Create or get collection
-        # We use a single collection but filter by session_id
-        self.collection = self.client.get_or_create_collection(name="autods_context")
-
-        # DeepInfra Client for Embeddings
-        api_key = os.getenv("DEEPINFRA_API_KEY")
-        self.aclient = AsyncOpenAI(
-            api_key=api_key or "missing_key",
-            base_url="https://api.deepinfra.com/v1/openai",
-        )
+        # Local hybrid index (SQLite FTS5/BM25 + vectors) over turns, code, errors
+        # and schemas. Keyword matches are answered locally; the embedding API is
+        # only called when they are not conclusive.
+        self.index = HistoryIndex()
         self.model_name = "Qwen/Qwen3-Embedding-4B-batch"  # User requested model
 
+        # The embedding client is created on first use (openai is slow to import)
+        self._aclient = None
+
+        # Identical texts (e.g. the schema of a re-uploaded dataset) are embedded once
+        self._embeddings: "OrderedDict[str, List[float]]" = OrderedDict()
+        self.embedding_cache_size = int(os.getenv("AUTODS_EMBEDDING_CACHE", "256"))
+
+        # Keyword hits must contain this share of the query terms to count as
+        # conclusive, and this many documents are embedded per vector lookup.
+        self.min_coverage = float(os.getenv("AUTODS_RAG_MIN_COVERAGE", "0.5"))
+        self.embed_batch = int(os.getenv("AUTODS_RAG_EMBED_BATCH", "32"))
+        self.stats = {"queries": 0, "local": 0, "vector": 0}
+
+    @property
+    def aclient(self):
+        """DeepInfra client for embeddings."""
+        if self._aclient is None:
+            from openai import AsyncOpenAI
+
+            api_key = os.getenv("DEEPINFRA_API_KEY")
+            self._aclient = AsyncOpenAI(
+                api_key=api_key or "missing_key",
+                base_url=os.getenv(
+                    "AUTODS_EMBEDDING_BASE_URL",
+                    os.getenv(
+                        "AUTODS_LLM_BASE_URL", "https://api.deepinfra.com/v1/openai"
+                    ),
+                ),
+            )
+        return self._aclient
+
     async def embed_text(self, text: str) -> List[float]:
         """Generate embedding using DeepInfra."""
+        if text in self._embeddings:
+            self._embeddings.move_to_end(text)
+            return self._embeddings[text]
         try:
-            response = await self.aclient.embeddings.create(
-                model=self.model_name, input=text, encoding_format="float"
-            )
-            return response.data[0].embedding
+            with tracing.span("rag.embed", chars=len(text)):
+                response = await self.aclient.embeddings.create(
+                    model=self.model_name, input=text, encoding_format="float"
+                )
+            embedding = response.data[0].embedding
+            self._embeddings[text] = embedding
+            while len(self._embeddings) > self.embedding_cache_size:
+                self._embeddings.popitem(last=False)
+            return embedding
         except Exception as e:
             print(f"Embedding Error: {e}")
             return []
 
+    async def embed_texts(self, texts: List[str]) -> List[List[float]]:
+        """Embeds several texts in one request."""
+        try:
+            chars = sum(map(len, texts))
+            with tracing.span("rag.embed", chars=chars, batch=len(texts)):
+                response = await self.aclient.embeddings.create(
+                    model=self.model_name, input=texts, encoding_format="float"
+                )
+            return [item.embedding for item in response.data]
+        except Exception as e:
+            print(f"Embedding Error: {e}")
+            return []
+
+    # --- INDEXING ---
+
     async def add_document(self, text: str, metadata: Dict[str, Any]):
-        """Embeds and adds a document to ChromaDB."""
-        embedding = await self.embed_text(text)
-        if not embedding:
-            return
+        """Indexes a document (metadata: session_id, source); embedded on demand."""
+        kind = metadata.get("source", "schema")
+        with tracing.span("rag.index_add", kind=kind):
+            self.index.add(metadata["session_id"], kind, text)
 
-        self.collection.add(
-            documents=[text],
-            embeddings=[embedding],
-            metadatas=[metadata],
-            ids=[str(uuid.uuid4())],
-        )
+    def index_history(self, path: str, session_id: str, messages: List[Dict]):
+        """Indexes the messages of a session history file added since last time."""
+        with tracing.span("rag.index_history"):
+            self.index.add_messages(path, session_id, messages)
+
+    def index_error(self, session_id: str, error: str, code: str):
+        self.index.add(session_id, "error", f"{error}\n{code}")
+
+    # --- RETRIEVAL ---
+
+    async def search(
+        self, query_text: str, session_id: str = None, n_results: int = 3
+    ) -> List[Dict[str, Any]]:
+        """
+        Hybrid retrieval. BM25 hits that cover most of the query are returned as is
+        (no network call); otherwise the query is embedded and the BM25 and vector
+        rankings are fused (reciprocal rank fusion).
+        """
+        self.stats["queries"] += 1
+        with tracing.span("rag.lexical") as attrs:
+            lexical = self.index.lexical(query_text, session_id)
+            attrs["hits"] = len(lexical)
+        # The prompt itself is indexed before retrieval runs
+        lexical = [h for h in lexical if h["text"] != query_text.strip()]
+        conclusive = [h for h in lexical if h["coverage"] >= self.min_coverage]
+        if len(conclusive) >= n_results:
+            self.stats["local"] += 1
+            return conclusive[:n_results]
 
-    async def query(
-        self, query_text: str, session_id: str, n_results: int = 3
-    ) -> List[str]:
-        """Queries the vector store for relevant context."""
         embedding = await self.embed_text(query_text)
         if not embedding:
-            return []
+            return lexical[:n_results]
+        if session_id:
+            await self._embed_missing(session_id)
+        with tracing.span("rag.vector"):
+            vector = self.index.vector(embedding, session_id)
+        self.stats["vector"] += 1
+        return fuse(lexical, vector, limit=n_results)
 
-        results = self.collection.query(
-            query_embeddings=[embedding],
-            n_results=n_results,
-            where={"session_id": session_id},  # Filter by session
-        )
+    async def _embed_missing(self, session_id: str):
+        """Embeds the session's newest documents that have no vector yet."""
+        missing = self.index.missing_embeddings(session_id, self.embed_batch)
+        if not missing:
+            return
+        vectors = await self.embed_texts([text for _, text in missing])
+        if len(vectors) == len(missing):
+            self.index.set_embeddings(
+                {doc_id: vector for (doc_id, _), vector in zip(missing, vectors)}
+            )
 
-        # Flatten results (list of lists)
-        if results["documents"]:
-            return results["documents"][0]
-        return []
+    async def query(
+        self, query_text: str, session_id: str, n_results: int = 3
+    ) -> List[str]:
+        """Queries the session's indexed history for relevant context."""
+        docs = await self.search(query_text, session_id, n_results)
+        return [doc["text"] for doc in docs]
 
     def clear_session(self, session_id: str):
-        """Removes documents for a specific session."""
+        """Removes the session's schema documents (its turns stay searchable)."""
         try:
-            self.collection.delete(where={"session_id": session_id})
-        except Exception:
-            pass
+            self.index.clear(session_id, kinds=("schema",))
+        except Exception as e:
+            print(f"History index clear error: {e}")
@@ -0,0 +1,235 @@
+import os
+import time
+import asyncio
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, Optional
+
+from agent import AutoDSAgent
+from kernel_manager import KernelManager
+from rag_manager import RAGManager
+from fix_memory import FixMemory
+from file_catalog import FileCatalog
+import tracing
+
+
+class SessionLimitError(Exception):
+    """Raised when every session slot is held by a connected client."""
+
+
+class SessionManager:
+    """
+    Lightweight per-connection sessions.
+    Each session owns an AutoDSAgent (history, kernel lease from the warm pool, DB
+    connection); the history index, LLM client, fix memory and file catalog are
+    shared, with RAG documents namespaced by the agent's session_id. Idle sessions
+    expire, and the number of live sessions is capped (least recently used idle
+    sessions are evicted first).
+    """
+
+    def __init__(self, max_sessions: int = None, idle_timeout: float = None):
+        self.max_sessions = max_sessions or int(
+            os.getenv("AUTODS_MAX_SESSIONS", "16")
+        )
+        self.idle_timeout = idle_timeout or float(
+            os.getenv("AUTODS_SESSION_IDLE_SECONDS", "1800")
+        )
+
+        self.sessions: "OrderedDict[str, AutoDSAgent]" = OrderedDict()  # LRU order
+        self.last_active: Dict[str, float] = {}
+        self.connections: Dict[str, int] = {}
+        self.lock = threading.Lock()
+        # Agents are built outside `lock` (a kernel lease can wait on the pool);
+        # one build per session at a time, in-flight builds count toward the cap
+        self._building: Dict[str, threading.Lock] = {}
+        self._pending = 0
+
+        # Shared across sessions
+        self.rag = RAGManager()
+        self.fix_memory = FixMemory()
+        self.catalog = FileCatalog()
+        self._client = None
+
+        # Progress of the startup warm-up (see warm_up, served by /ready)
+        self.readiness = {"ready": False, "stage": "starting", "error": None}
+
+    @property
+    def client(self):
+        """LLM client shared by all agents (openai is imported on first use)."""
+        if self._client is None:
+            from openai import AsyncOpenAI
+
+            api_key = os.getenv("DEEPINFRA_API_KEY")
+            self._client = AsyncOpenAI(
+                api_key=api_key or "missing_key",
+                base_url=os.getenv(
+                    "AUTODS_LLM_BASE_URL", "https://api.deepinfra.com/v1/openai"
+                ),
+            )
+        return self._client
+
+    def warm_up(self, session_id: Optional[str]):
+        """
+        Creates the session's agent (warm kernel, LLM client) and indexes history
+        files written since the last run, so the first request does not pay for it.
+        Without a session, only the kernel pool is started (no kernel is leased).
+        Runs in a background thread once the server accepts connections.
+        """
+        start = time.time()
+        try:
+            with tracing.span("startup.warm_up"):
+                self.readiness["stage"] = "kernel"
+                if session_id is not None:
+                    self.get(session_id)
+                else:
+                    KernelManager(lease=False)
+                self.readiness["stage"] = "history_index"
+                self.rag.index.sync()
+        except Exception as e:
+            print(f"Warm-up error: {e}")
+            self.readiness.update(stage="failed", error=str(e))
+            return
+        self.readiness.update(
+            ready=True, stage="ready", warm_up_s=round(time.time() - start, 2)
+        )
+        print(f"Backend ready ({self.readiness['warm_up_s']}s warm-up).")
+
+    def get(self, session_id: str) -> AutoDSAgent:
+        """Returns the session's agent, creating it on demand."""
+        with self.lock:
+            agent = self._touch(session_id)
+            if agent is not None:
+                return agent
+            building = self._building.setdefault(session_id, threading.Lock())
+
+        with building:
+            evicted = None
+            with self.lock:
+                agent = self._touch(session_id)
+                if agent is not None:
+                    return agent
+                if len(self.sessions) + self._pending >= self.max_sessions:
+                    try:
+                        evicted = self._evict_one()
+                    except SessionLimitError:
+                        self._building.pop(session_id, None)
+                        raise
+                self._pending += 1
+            if evicted is not None:
+                evicted.close()
+
+            built = None
+            try:
+                agent = AutoDSAgent(
+                    rag=self.rag,
+                    client=self.client,
+                    fix_memory=self.fix_memory,
+                    catalog=self.catalog,
+                )
+                # Jobs the kernel submits reach this session's clients
+                agent.kernel.bind_session(session_id)
+                built = agent
+            finally:
+                # Registered in the same step the build lock is dropped: a caller
+                # arriving in between would otherwise build a second agent
+                with self.lock:
+                    self._pending -= 1
+                    if built is not None:
+                        self.sessions[session_id] = built
+                        self._touch(session_id)
+                    self._building.pop(session_id, None)
+                    live = len(self.sessions)
+            print(f"Session created: {session_id} ({live} live)")
+            return agent
+
+    def _touch(self, session_id: str) -> Optional[AutoDSAgent]:
+        """Marks the session as used (caller holds the lock); None if it is not live."""
+        agent = self.sessions.get(session_id)
+        if agent is not None:
+            self.sessions.move_to_end(session_id)
+            self.last_active[session_id] = time.time()
+        return agent
+
+    def peek(self, session_id: str) -> Optional[AutoDSAgent]:
+        """Returns the agent without creating or touching the session."""
+        return self.sessions.get(session_id)
+
+    def connect(self, session_id: str) -> AutoDSAgent:
+        agent = self.get(session_id)
+        with self.lock:
+            self.connections[session_id] = self.connections.get(session_id, 0) + 1
+        return agent
+
+    def disconnect(self, session_id: str):
+        with self.lock:
+            count = self.connections.get(session_id, 0)
+            self.connections[session_id] = max(0, count - 1)
+            self.last_active[session_id] = time.time()
+
+    def _evict_one(self) -> AutoDSAgent:
+        """
+        Removes the least recently used session without a live connection (caller
+        holds the lock) and returns its agent, to be closed outside the lock.
+        """
+        for session_id in self.sessions:
+            if not self.connections.get(session_id):
+                return self._remove(session_id)
+        raise SessionLimitError(
+            f"All {self.max_sessions} sessions are in use. Try again later."
+        )
+
+    def _remove(self, session_id: str) -> AutoDSAgent:
+        agent = self.sessions.pop(session_id)
+        self.last_active.pop(session_id, None)
+        self.connections.pop(session_id, None)
+        print(f"Session closed: {session_id}")
+        return agent
+
+    def expire_idle(self) -> int:
+        """Closes sessions without connections that were idle for longer than the timeout."""
+        now = time.time()
+        with self.lock:
+            expired = [
+                session_id
+                for session_id in self.sessions
+                if not self.connections.get(session_id)
+                and now - self.last_active.get(session_id, now) > self.idle_timeout
+            ]
+            agents = [self._remove(session_id) for session_id in expired]
+        for agent in agents:
+            agent.close()
+        return len(expired)
+
+    async def reap_forever(self, interval: float = 60):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await asyncio.to_thread(self.expire_idle)
+            except Exception as e:
+                print(f"Session reaper error: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            agents = list(self.sessions.values())
+        fast_path = {"turns": 0, "short_circuited": 0}
+        preflight = {"checked": 0, "fixed": 0, "blocked": 0, "avoided_retries": 0}
+        memo = {"cells": 0, "hits": 0, "saved_seconds": 0.0}
+        for agent in agents:
+            fast_path["turns"] += agent.fast_path.stats["turns"]
+            fast_path["short_circuited"] += agent.fast_path.stats["short_circuited"]
+            for key in preflight:
+                preflight[key] += agent.preflight.stats[key]
+            for key in memo:
+                memo[key] += agent.kernel.memo_stats[key]
+        return {
+            "sessions": len(self.sessions),
+            "connected": sum(1 for n in self.connections.values() if n),
+            "max_sessions": self.max_sessions,
+            "idle_timeout": self.idle_timeout,
+            "fast_path": fast_path,
+            "preflight": preflight,
+            "fix_memory": self.fix_memory.summary(),
+            "catalog": self.catalog.stats,
+            "retrieval": self.rag.stats,
+            "memo": {**memo, "saved_seconds": round(memo["saved_seconds"], 3)},
+        }
@@ -0,0 +1,124 @@
+"""
+Lightweight latency tracing for the agent pipeline.
+
+Spans are kept in an in-process ring buffer (served by /traces), optionally appended
+to a JSON-lines file (AUTODS_TRACE_FILE), and aggregated into Prometheus-format
+histograms (served by /metrics).
+"""
+
+import os
+import json
+import time
+import uuid
+import threading
+import contextvars
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, Any, List, Tuple
+
+# Histogram buckets (seconds for durations; generic values for other metrics)
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+RATE_BUCKETS = (1, 5, 10, 25, 50, 100, 200, 500, 1000)
+
+_trace_id = contextvars.ContextVar("autods_trace_id", default=None)
+
+_lock = threading.Lock()
+MAX_SPANS = int(os.getenv("AUTODS_TRACE_BUFFER", "2000"))
+_buffer = deque(maxlen=MAX_SPANS)
+_trace_file = os.getenv("AUTODS_TRACE_FILE")
+
+# (metric, labels) -> [bucket counts..., +Inf count], sum
+_histograms: Dict[Tuple[str, Tuple], Dict[str, Any]] = {}
+_buckets: Dict[str, Tuple[float, ...]] = {}
+
+
+def start_trace() -> str:
+    """Starts a new trace (e.g. one chat turn); later spans in this context share its id."""
+    trace_id = uuid.uuid4().hex[:16]
+    _trace_id.set(trace_id)
+    return trace_id
+
+
+def observe(metric: str, value: float, buckets=DURATION_BUCKETS, **labels):
+    """Adds a value to the histogram `metric` with the given labels."""
+    key = (metric, tuple(sorted(labels.items())))
+    with _lock:
+        _buckets.setdefault(metric, tuple(buckets))
+        hist = _histograms.get(key)
+        if hist is None:
+            hist = {"counts": [0] * (len(_buckets[metric]) + 1), "sum": 0.0}
+            _histograms[key] = hist
+        for i, bound in enumerate(_buckets[metric]):
+            if value <= bound:
+                hist["counts"][i] += 1
+                break
+        else:
+            hist["counts"][-1] += 1
+        hist["sum"] += value
+
+
+def record(name: str, duration: float, **attrs):
+    """Stores a finished span and feeds the duration histogram."""
+    span = {
+        "name": name,
+        "trace_id": _trace_id.get(),
+        "start": time.time() - duration,
+        "duration_ms": round(duration * 1000, 3),
+        **attrs,
+    }
+    with _lock:
+        _buffer.append(span)
+    observe("autods_span_duration_seconds", duration, span=name)
+
+    if _trace_file:
+        try:
+            with open(_trace_file, "a", encoding="utf-8") as f:
+                f.write(json.dumps(span, default=str) + "\n")
+        except OSError as e:
+            print(f"Trace export error: {e}")
+
+
+@contextmanager
+def span(name: str, **attrs):
+    """Times the enclosed block. Yields a dict to which attributes can be added."""
+    start = time.perf_counter()
+    error = None
+    try:
+        yield attrs
+    except Exception as e:
+        error = type(e).__name__
+        raise
+    finally:
+        if error:
+            attrs["error"] = error
+        record(name, time.perf_counter() - start, **attrs)
+
+
+def recent_spans(limit: int = 200) -> List[Dict[str, Any]]:
+    with _lock:
+        return list(_buffer)[-limit:]
+
+
+def render_prometheus() -> str:
+    """All histograms in the Prometheus text exposition format."""
+    lines = []
+    with _lock:
+        metrics = sorted({metric for metric, _ in _histograms})
+        for metric in metrics:
+            lines.append(f"# TYPE {metric} histogram")
+            for (name, labels), hist in sorted(_histograms.items()):
+                if name != metric:
+                    continue
+                label_str = ",".join(f'{k}="{v}"' for k, v in labels)
+                prefix = label_str + "," if label_str else ""
+                cumulative = 0
+                for bound, count in zip(_buckets[metric], hist["counts"]):
+                    cumulative += count
+                    lines.append(
+                        f'{metric}_bucket{{{prefix}le="{bound}"}} {cumulative}'
+                    )
+                cumulative += hist["counts"][-1]
+                lines.append(f'{metric}_bucket{{{prefix}le="+Inf"}} {cumulative}')
+                lines.append(f"{metric}_sum{{{label_str}}} {hist['sum']}")
+                lines.append(f"{metric}_count{{{label_str}}} {cumulative}")
+    return "\n".join(lines) + "\n"
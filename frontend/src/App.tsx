@@ -6,6 +6,7 @@ import type { Message } from "./components/ChatInterface";
 import { StatusTerminal } from "./components/StatusTerminal";
 import { FileText, BarChart, FileCode, Database, Download } from "lucide-react";
 import { DatabaseModal } from "./components/DatabaseModal";
+import { apiUrl } from "./session";
 
 // Mock WebSockets disabled
 const USE_MOCK_WS = false;
@@ -49,7 +50,7 @@ function App() {
       handleFileClick(file.name);
     } else {
       // Download for models/notebooks
-      window.open(`http://127.0.0.1:8000/download/${file.name}`, "_blank");
+      window.open(apiUrl(`/download/${file.name}`), "_blank");
     }
   };
 
@@ -75,7 +76,7 @@ function App() {
       }
 
       try {
-        const socket = new WebSocket("ws://127.0.0.1:8000/ws/chat");
+        const socket = new WebSocket(apiUrl("/ws/chat", "ws"));
 
         socket.onopen = () => {
           addLog("Connected to AutoDS Backend", "success");
@@ -229,7 +230,7 @@ function App() {
   /* FILE SYSTEM: SYNC WITH SERVER */
   const fetchFiles = async () => {
     try {
-      const res = await fetch("http://127.0.0.1:8000/list_files");
+      const res = await fetch(apiUrl("/list_files"));
       const data = await res.json();
       if (Array.isArray(data)) {
         setFiles(data);
@@ -255,7 +256,7 @@ function App() {
     addLog(`Uploading ${file.name}...`, "info");
 
     try {
-      const response = await fetch("http://127.0.0.1:8000/upload", {
+      const response = await fetch(apiUrl("/upload"), {
         method: "POST",
         body: formData,
       });
@@ -275,7 +276,7 @@ function App() {
   const handleFileClick = async (filename: string) => {
     addLog(`Opening ${filename}...`, "info");
     try {
-      const response = await fetch(`http://127.0.0.1:8000/files/${filename}`);
+      const response = await fetch(apiUrl(`/files/${filename}`));
       const result = await response.json();
 
       if (result.error) {
@@ -305,7 +306,7 @@ function App() {
 
   const handleConnectDB = async (config: any) => {
     addLog("Connecting to Database...", "system");
-    const res = await fetch("http://127.0.0.1:8000/db/connect", {
+    const res = await fetch(apiUrl("/db/connect"), {
       method: "POST",
       headers: { "Content-Type": "application/json" },
       body: JSON.stringify(config),
@@ -315,7 +316,7 @@ function App() {
     if (data.status === "success") {
       addLog(data.message, "success");
       // Fetch Schema
-      const schemaRes = await fetch("http://127.0.0.1:8000/db/schema");
+      const schemaRes = await fetch(apiUrl("/db/schema"));
       const schemaData = await schemaRes.json();
       if (!schemaData.error) {
         setDbTables(schemaData);
@@ -372,7 +373,7 @@ function App() {
               onClick={(e) => {
                 e.stopPropagation();
                 const link = document.createElement("a");
-                link.href = `http://127.0.0.1:8000/download/${f.name}`;
+                link.href = apiUrl(`/download/${f.name}`);
                 link.download = f.name;
                 document.body.appendChild(link);
                 link.click();
@@ -422,7 +423,7 @@ function App() {
 
     addLog("Initiating New Session...", "system");
     try {
-      const res = await fetch("http://127.0.0.1:8000/reset_session", {
+      const res = await fetch(apiUrl("/reset_session"), {
         method: "POST",
       });
       const data = await res.json();
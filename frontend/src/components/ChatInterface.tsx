@@ -18,6 +18,7 @@ import { Prism as SyntaxHighlighter } from "react-syntax-highlighter";
 import { vscDarkPlus } from "react-syntax-highlighter/dist/esm/styles/prism";
 
 import { InteractivePlot } from "./InteractivePlot";
+import { apiUrl } from "../session";
 
 // --- Types ---
 export interface Message {
@@ -329,7 +330,7 @@ export const ChatInterface: React.FC<ChatInterfaceProps> = ({
 
   const handleDownloadNotebook = async () => {
     try {
-      const response = await fetch("http://127.0.0.1:8000/download_notebook");
+      const response = await fetch(apiUrl("/download_notebook"));
       if (!response.ok) throw new Error("Download failed");
 
       const blob = await response.blob();
@@ -1,5 +1,6 @@
 import React, { useState } from "react";
 import { X, FileSpreadsheet, Activity } from "lucide-react";
+import { apiUrl } from "../session";
 
 interface DataViewerProps {
   filename: string;
@@ -16,26 +17,53 @@ export const DataViewer: React.FC<DataViewerProps> = ({
 }) => {
   const [isGenerating, setIsGenerating] = useState(false);
 
+  // The report is built by a background job: follow it, then open its artifact
+  const waitForJob = async (jobId: number) => {
+    while (true) {
+      await new Promise((resolve) => setTimeout(resolve, 1000));
+      const response = await fetch(apiUrl(`/jobs/${jobId}`));
+      const job = await response.json();
+      if (!response.ok || !job.status) {
+        throw new Error(job.detail || job.error || "Job not found");
+      }
+      if (job.status === "succeeded") return job;
+      if (job.status === "failed" || job.status === "cancelled") {
+        throw new Error(job.error || `Job ${job.status}`);
+      }
+    }
+  };
+
   const handleGenerateReport = async () => {
     setIsGenerating(true);
     try {
-      const response = await fetch("http://127.0.0.1:8000/generate_eda", {
+      const response = await fetch(apiUrl("/generate_eda"), {
         method: "POST",
         headers: { "Content-Type": "application/json" },
         body: JSON.stringify({ filename }),
       });
-      const result = await response.json();
+      const submitted = await response.json();
+      if (submitted.error || submitted.id === undefined) {
+        alert("Error generating report: " + (submitted.error || "Unknown error"));
+        return;
+      }
 
-      if (result.html) {
-        // Open HTML in new tab by creating a blob
-        const blob = new Blob([result.html], { type: "text/html" });
-        const url = URL.createObjectURL(blob);
-        window.open(url, "_blank");
-      } else {
-        alert("Error generating report: " + (result.error || "Unknown error"));
+      const job = await waitForJob(submitted.id);
+      const report = job.result?.report;
+      const artifact =
+        report &&
+        (await fetch(
+          apiUrl(`/jobs/${job.id}/artifacts/${encodeURIComponent(report)}`),
+        ));
+      if (!artifact || !artifact.ok) {
+        alert("Error generating report: report not found");
+        return;
       }
+      // Open HTML in new tab by creating a blob
+      const blob = new Blob([await artifact.text()], { type: "text/html" });
+      const url = URL.createObjectURL(blob);
+      window.open(url, "_blank");
     } catch (e) {
-      alert("Failed to connect to server for EDA.");
+      alert("Error generating report: " + (e instanceof Error ? e.message : e));
     } finally {
       setIsGenerating(false);
     }
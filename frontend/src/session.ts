@@ -0,0 +1,22 @@
+// One AutoDS session per browser tab (kept across reloads of that tab).
+// The backend keys history, kernel and DB connection by this id.
+const SESSION_KEY = "autods_session_id";
+
+function loadSessionId(): string {
+  const existing = sessionStorage.getItem(SESSION_KEY);
+  if (existing) return existing;
+  const created = crypto.randomUUID().replace(/-/g, "");
+  sessionStorage.setItem(SESSION_KEY, created);
+  return created;
+}
+
+export const SESSION_ID = loadSessionId();
+
+export const API_BASE = "http://127.0.0.1:8000";
+
+// Backend URL for `path`, tagged with this tab's session id
+export function apiUrl(path: string, protocol: "http" | "ws" = "http"): string {
+  const base = protocol === "ws" ? API_BASE.replace(/^http/, "ws") : API_BASE;
+  const sep = path.includes("?") ? "&" : "?";
+  return `${base}${path}${sep}session_id=${encodeURIComponent(SESSION_ID)}`;
+}
@@ -3,15 +3,23 @@ import threading
 import time
 import os
 import sys
+import argparse
 
 
-def run_backend():
-    print("🚀 Starting Backend (Port 8000)...")
+def run_backend(prod=False, workers=None):
     # Use sys.executable to ensure the current Python environment is used
-    # --reload is crucial for auto-reloading on code changes
-    cmd = (
-        f'"{sys.executable}" -m uvicorn main:app --reload --host 127.0.0.1 --port 8000'
-    )
+    if prod:
+        # Multi-worker mode: coordinator routes each session to a fixed worker
+        workers = workers or os.cpu_count() or 1
+        print(f"🚀 Starting Backend (Port 8000, {workers} workers)...")
+        cmd = f'"{sys.executable}" coordinator.py --workers {workers} --port 8000'
+    else:
+        print("🚀 Starting Backend (Port 8000)...")
+        # --reload is crucial for auto-reloading on code changes
+        cmd = (
+            f'"{sys.executable}" -m uvicorn main:app --reload '
+            "--host 127.0.0.1 --port 8000"
+        )
     subprocess.run(cmd, cwd="backend", shell=True)
 
 
@@ -22,13 +30,25 @@ def run_frontend():
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="AutoDS runner")
+    parser.add_argument(
+        "--prod", action="store_true", help="Multi-worker backend, no reload"
+    )
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
     print("🤖 AutoDS System Startup")
     print("========================")
-    print("ℹ️  Both Backend and Frontend are running in RELOAD mode.")
-    print("ℹ️  Edits to files will automatically update the app.")
+    if args.prod:
+        print("ℹ️  Backend is running in PRODUCTION mode (multi-worker).")
+    else:
+        print("ℹ️  Both Backend and Frontend are running in RELOAD mode.")
+        print("ℹ️  Edits to files will automatically update the app.")
 
     # Start Backend in a separate thread
-    backend_thread = threading.Thread(target=run_backend)
+    backend_thread = threading.Thread(
+        target=run_backend, kwargs={"prod": args.prod, "workers": args.workers}
+    )
     backend_thread.daemon = True
     backend_thread.start()
 